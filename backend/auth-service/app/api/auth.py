@@ -5,13 +5,16 @@ API endpoints для аутентификации.
 
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 
 from app.db.database import get_db
+from app.db.user_cache import invalidate_user
 from app.models.user import User
 from app.schemas.user import UserCreate, UserLogin, UserResponse, Token
-from app.core.security import get_password_hash, verify_password, create_access_token
+from app.core.security import create_access_token
+from app.core.password_pool import password_pool
 from app.core.config import settings
 from app.api.deps import get_current_user
 
@@ -23,7 +26,7 @@ router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """
     Регистрация нового пользователя.
     
@@ -40,7 +43,7 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
     logger.info(f"Попытка регистрации пользователя: {user_data.email}")
     
     # Проверка существования пользователя
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await db.scalar(select(User).where(User.email == user_data.email))
     if existing_user:
         logger.warning(f"Email уже зарегистрирован: {user_data.email}")
         raise HTTPException(
@@ -48,23 +51,29 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
             detail="Пользователь с таким email уже существует"
         )
     
+    # bcrypt нагружает CPU, поэтому хеширование выполняется в пуле процессов
+    hashed_password = await password_pool.hash(user_data.password)
+    
     # Создание нового пользователя
     new_user = User(
         email=user_data.email,
         display_name=user_data.display_name,
-        hashed_password=get_password_hash(user_data.password)
+        hashed_password=hashed_password
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    
+    # id мог попасть в кэш как неизвестный (токен, выданный до пересоздания БД)
+    await invalidate_user(new_user.id)
     
     logger.info(f"Пользователь успешно зарегистрирован: {new_user.id}")
     return new_user
 
 
 @router.post("/login", response_model=Token)
-def login(credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(credentials: UserLogin, db: AsyncSession = Depends(get_db)):
     """
     Аутентификация пользователя и выдача JWT токена.
     
@@ -81,9 +90,12 @@ def login(credentials: UserLogin, db: Session = Depends(get_db)):
     logger.info(f"Попытка входа пользователя: {credentials.email}")
     
     # Поиск пользователя
-    user = db.query(User).filter(User.email == credentials.email).first()
+    user = await db.scalar(select(User).where(User.email == credentials.email))
     
-    if not user or not verify_password(credentials.password, user.hashed_password):
+    password_valid = user is not None and await password_pool.verify(
+        credentials.password, user.hashed_password
+    )
+    if not password_valid:
         logger.warning(f"Неудачная попытка входа: {credentials.email}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -113,7 +125,7 @@ def login(credentials: UserLogin, db: Session = Depends(get_db)):
 
 
 @router.get("/me", response_model=UserResponse)
-def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: UserResponse = Depends(get_current_user)):
     """
     Получение информации о текущем авторизованном пользователе.
     
@@ -127,7 +139,7 @@ def get_me(current_user: User = Depends(get_current_user)):
 
 
 @router.get("/validate")
-def validate_token(current_user: User = Depends(get_current_user)):
+async def validate_token(current_user: UserResponse = Depends(get_current_user)):
     """
     Проверка валидности токена.
     Используется gateway для проверки авторизации.
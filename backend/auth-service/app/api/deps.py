@@ -3,26 +3,39 @@
 Включает функции для извлечения текущего пользователя из токена.
 """
 
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from app.db.database import get_db
+from app.db.database import SessionLocal
+from app.db.user_cache import get_cached_user
 from app.core.security import decode_token
 from app.models.user import User
+from app.schemas.user import UserResponse
 
 # Схема Bearer токена
 security = HTTPBearer()
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
+async def load_user(user_id: int) -> Optional[UserResponse]:
+    """Загрузка профиля пользователя из БД"""
+    async with SessionLocal() as db:
+        user = await db.get(User, user_id)
+    
+    if user is None:
+        return None
+    
+    return UserResponse.model_validate(user)
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> UserResponse:
     """
     Получение текущего авторизованного пользователя.
     
     Извлекает JWT токен из заголовка Authorization,
-    декодирует его и возвращает объект пользователя.
+    декодирует его и возвращает профиль пользователя. Профиль
+    берется из кэша, в БД запрос идет только при промахе.
     
     Raises:
         HTTPException: Если токен недействителен или пользователь не найден
@@ -48,7 +61,7 @@ def get_current_user(
     except (ValueError, TypeError):
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await get_cached_user(user_id, load_user)
     if user is None:
         raise credentials_exception
     
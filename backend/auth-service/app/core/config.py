@@ -4,7 +4,7 @@
 """
 
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -20,17 +20,43 @@ class Settings(BaseSettings):
     POSTGRES_USER: str = "cloudmeet"
     POSTGRES_PASSWORD: str = "cloudmeet_secret"
     POSTGRES_DB: str = "cloudmeet_auth"
+    DB_POOL_SIZE: int = 10  # Постоянные соединения пула
+    DB_MAX_OVERFLOW: int = 20  # Дополнительные соединения при пиковой нагрузке
     
     # JWT настройки
-    JWT_SECRET_KEY: str = "super-secret-key-change-in-production"
-    JWT_ALGORITHM: str = "HS256"
+    JWT_SECRET_KEY: str = "super-secret-key-change-in-production"  # Только для HS256
+    JWT_ALGORITHM: str = "RS256"  # RS256 - ключи из JWT_KEYS_DIR, HS256 - общий секрет
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    JWT_KEYS_DIR: str = "keys"  # Каталог приватных ключей подписи ({kid}.pem)
+    JWT_ACTIVE_KID: Optional[str] = None  # Ключ для подписи (по умолчанию - первый по имени, самый старый)
+    JWT_ACCEPT_HS256: bool = False  # Только на время перехода на RS256: принимать ранее выданные токены HS256
+    
+    # Redis для кэша профилей (необязателен: без него кэш только в памяти процесса)
+    REDIS_HOST: Optional[str] = None
+    REDIS_PORT: int = 6379
+    REDIS_DB: int = 1
+    
+    # Кэш профилей пользователей для /me и /validate
+    USER_CACHE_TTL_SECONDS: int = 60  # Срок жизни профиля в кэше
+    USER_CACHE_NEGATIVE_TTL_SECONDS: int = 5  # Срок жизни записи о неизвестном id
+    USER_CACHE_MAX_ENTRIES: int = 10000  # Профилей в памяти процесса (0 - отключен)
+    
+    # Пул процессов для bcrypt
+    PASSWORD_HASH_WORKERS: Optional[int] = None  # Количество процессов (по умолчанию - число ядер)
+    PASSWORD_HASH_MAX_QUEUE: int = 100  # Максимум операций в очереди, остальные получают 503
+    
+    # Распределенная трассировка (OpenTelemetry)
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATIO: float = 0.01  # Доля записываемых трасс, начатых в этом сервисе
+    TRACING_EXPORTER: Literal["file", "otlp"] = "file"  # file - JSON Lines, otlp - OTLP/HTTP коллектор
+    TRACING_FILE_PATH: str = "traces/auth-service.jsonl"
+    TRACING_OTLP_ENDPOINT: str = "http://otel-collector:4318/v1/traces"
     
     @property
     def DATABASE_URL(self) -> str:
         """Формирование строки подключения к БД"""
         return (
-            f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
+            f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
             f"@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
         )
     
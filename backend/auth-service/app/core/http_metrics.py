@@ -0,0 +1,82 @@
+"""
+ASGI middleware метрик HTTP запросов.
+
+Время запроса записывается в момент отправки заголовков ответа с
+меткой шаблона маршрута (например, /api/rooms/{room_id}), а не
+фактического пути, чтобы число временных рядов не зависело от ID
+в URL. Запросы, не попавшие ни в один маршрут, получают метку
+UNMATCHED_ROUTE.
+
+scope текущего запроса доступен через request_labels(), чтобы
+метрики нижних слоев (например, SQL запросы) получали те же метки.
+"""
+
+import time
+from contextvars import ContextVar
+from typing import Optional, Tuple
+
+from app.core.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT
+
+# Метка запросов без маршрута (404 на неизвестные пути)
+UNMATCHED_ROUTE = "unmatched"
+
+# Метка работы вне HTTP запросов (фоновые задачи)
+BACKGROUND_ROUTE = "background"
+
+# scope обрабатываемого HTTP запроса; маршрут записывается
+# в него роутером уже после входа в middleware
+_current_scope: ContextVar[Optional[dict]] = ContextVar("current_scope", default=None)
+
+
+def _route(scope: dict) -> str:
+    """Шаблон маршрута запроса"""
+    # Маршрут записывается в scope роутером FastAPI
+    return getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+
+
+def request_labels() -> Tuple[str, str]:
+    """Метод и шаблон маршрута текущего HTTP запроса"""
+    scope = _current_scope.get()
+    if scope is None:
+        return "", BACKGROUND_ROUTE
+    return scope["method"], _route(scope)
+
+
+class HTTPMetricsMiddleware:
+    """Гистограмма времени ответа по маршрутам и число запросов в обработке"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        started = time.perf_counter()
+        observed = False
+        
+        def observe(status_code: int) -> None:
+            nonlocal observed
+            if observed:
+                return
+            observed = True
+            HTTP_REQUEST_DURATION.labels(scope["method"], _route(scope), str(status_code)).observe(
+                time.perf_counter() - started
+            )
+        
+        async def send_with_metrics(message):
+            if message["type"] == "http.response.start":
+                observe(message["status"])
+            await send(message)
+        
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        token = _current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        except Exception:
+            observe(500)
+            raise
+        finally:
+            _current_scope.reset(token)
+            HTTP_REQUESTS_IN_FLIGHT.dec()
@@ -0,0 +1,128 @@
+"""
+Ключи подписи JWT и их публикация в формате JWKS.
+
+Приватные ключи RSA хранятся в каталоге JWT_KEYS_DIR, по одному PEM
+файлу на ключ; имя файла без расширения - идентификатор ключа (kid).
+Токены подписываются активным ключом, а в JWKS публикуются открытые
+части всех ключей каталога, поэтому токены, выданные старым ключом,
+проверяются до истечения срока.
+
+Без JWT_ACTIVE_KID активен первый по имени (самый старый) ключ:
+имена generate_kid начинаются с даты создания, поэтому добавленный
+ключ не начинает подписывать токены до явного переключения.
+
+Ротация без одновременного перезапуска сервисов:
+1. положить новый ключ в каталог и перезапустить auth-service -
+   ключ появится в JWKS, но подписывать будет прежний активный ключ;
+2. дождаться обновления кэша JWKS в gateway и conference-service
+   (JWKS_REFRESH_SECONDS);
+3. сделать новый ключ активным (JWT_ACTIVE_KID) и перезапустить
+   auth-service;
+4. удалить старый ключ после истечения выданных им токенов - новый
+   ключ станет первым по имени, и JWT_ACTIVE_KID можно убрать.
+"""
+
+import logging
+import os
+import secrets
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk
+
+logger = logging.getLogger(__name__)
+
+# Размер генерируемых ключей RSA
+RSA_KEY_SIZE = 2048
+
+
+def generate_kid() -> str:
+    """Идентификатор нового ключа: дата создания упорядочивает ключи по имени"""
+    return f"{time.strftime('%Y%m%d%H%M%S')}-{secrets.token_hex(4)}"
+
+
+def generate_private_key_pem() -> str:
+    """Генерация приватного ключа RSA в формате PEM (PKCS#8)"""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=RSA_KEY_SIZE)
+    return private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    ).decode()
+
+
+class KeyStore:
+    """Набор ключей подписи с выделенным активным ключом"""
+    
+    def __init__(self):
+        self._private_keys: Dict[str, str] = {}
+        self._public_keys: Dict[str, jwk.Key] = {}
+        self._jwks: List[dict] = []
+        self.active_kid: Optional[str] = None
+    
+    def load(self, keys_dir: str, algorithm: str, active_kid: Optional[str] = None) -> None:
+        """
+        Загрузка ключей из каталога.
+        Если каталог пуст, в нем создается первый ключ.
+        
+        Args:
+            keys_dir: Каталог с PEM файлами приватных ключей
+            algorithm: Алгоритм подписи (RS256)
+            active_kid: Ключ для подписи (по умолчанию - первый по имени)
+        
+        Raises:
+            ValueError: Если активный ключ не найден в каталоге
+        """
+        path = Path(keys_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        
+        files = sorted(path.glob("*.pem"))
+        if not files:
+            kid = generate_kid()
+            key_file = path / f"{kid}.pem"
+            key_file.write_text(generate_private_key_pem())
+            os.chmod(key_file, 0o600)
+            logger.warning(f"Ключи подписи не найдены, создан новый ключ {kid}")
+            files = [key_file]
+        
+        private_keys: Dict[str, str] = {}
+        public_keys: Dict[str, jwk.Key] = {}
+        jwks: List[dict] = []
+        for key_file in files:
+            kid = key_file.stem
+            pem = key_file.read_text()
+            public_key = jwk.construct(pem, algorithm).public_key()
+            
+            private_keys[kid] = pem
+            public_keys[kid] = public_key
+            jwks.append({**public_key.to_dict(), "kid": kid, "use": "sig"})
+        
+        active_kid = active_kid or files[0].stem
+        if active_kid not in private_keys:
+            raise ValueError(f"Активный ключ подписи {active_kid} не найден в {keys_dir}")
+        
+        self._private_keys = private_keys
+        self._public_keys = public_keys
+        self._jwks = jwks
+        self.active_kid = active_kid
+        logger.info(f"Загружено ключей подписи: {len(files)}, активный ключ: {active_kid}")
+    
+    @property
+    def signing_key(self) -> str:
+        """Приватный ключ (PEM) для подписи новых токенов"""
+        return self._private_keys[self.active_kid]
+    
+    def public_key(self, kid: Optional[str]) -> Optional[jwk.Key]:
+        """Открытый ключ по идентификатору"""
+        return self._public_keys.get(kid) if kid else None
+    
+    def jwks(self) -> dict:
+        """Открытые ключи в формате JWK Set (RFC 7517)"""
+        return {"keys": self._jwks}
+
+
+# Ключи процесса сервиса, загружаются при старте
+key_store = KeyStore()
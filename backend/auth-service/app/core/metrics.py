@@ -0,0 +1,115 @@
+"""
+Метрики Prometheus для Auth Service.
+"""
+
+from typing import Callable, Dict
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+# Операции хеширования паролей, ожидающие свободного воркера
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    "auth_password_hash_queue_depth",
+    "Операции bcrypt, ожидающие свободного воркера"
+)
+
+# Операции хеширования паролей, выполняемые воркерами
+PASSWORD_HASH_IN_FLIGHT = Gauge(
+    "auth_password_hash_in_flight",
+    "Операции bcrypt, выполняемые в пуле процессов"
+)
+
+PASSWORD_HASH_DURATION = Histogram(
+    "auth_password_hash_duration_seconds",
+    "Время операции bcrypt в воркере, включая передачу между процессами",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+)
+
+PASSWORD_HASH_WAIT = Histogram(
+    "auth_password_hash_wait_seconds",
+    "Время ожидания свободного воркера",
+    ["operation"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+PASSWORD_HASH_REJECTED = Counter(
+    "auth_password_hash_rejected_total",
+    "Операции bcrypt, отклоненные из-за переполнения очереди",
+    ["operation"]
+)
+
+# Обращения к кэшу профилей по уровням: l1 (память процесса) и redis
+USER_CACHE_REQUESTS = Counter(
+    "auth_user_cache_requests_total",
+    "Обращения к кэшу профилей по уровню и результату (hit/miss/error)",
+    ["layer", "result"]
+)
+
+# HTTP запросы к сервису: время до отправки заголовков ответа по
+# шаблону маршрута
+HTTP_REQUEST_DURATION = Histogram(
+    "auth_http_request_duration_seconds",
+    "Время обработки HTTP запроса по маршруту",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "auth_http_requests_in_flight",
+    "HTTP запросы в процессе обработки"
+)
+
+# Пул соединений SQLAlchemy
+DB_POOL_CHECKOUT_DURATION = Histogram(
+    "auth_db_pool_checkout_seconds",
+    "Время получения соединения из пула, включая ожидание и открытие нового",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+
+DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+    "auth_db_pool_checkout_timeouts_total",
+    "Запросы, не дождавшиеся свободного соединения в пуле"
+)
+
+# SQL запросы по HTTP запросу, в котором они выполнены
+# (route="background" - фоновые задачи вне запросов)
+DB_QUERIES = Counter(
+    "auth_db_queries_total",
+    "SQL запросы по методу и шаблону маршрута HTTP запроса",
+    ["method", "route"]
+)
+
+
+class DatabasePoolCollector:
+    """
+    Коллектор состояния пула соединений с БД.
+    Значения снимаются в момент запроса /metrics.
+    """
+    
+    def __init__(self, stats_provider: Callable[[], Dict[str, int]]):
+        self._stats_provider = stats_provider
+    
+    def collect(self):
+        connections = GaugeMetricFamily(
+            "auth_db_pool_connections",
+            "Соединения пула по состоянию (checked_out/idle)",
+            labels=["state"]
+        )
+        overflow = GaugeMetricFamily(
+            "auth_db_pool_overflow",
+            "Соединения сверх постоянного размера пула"
+        )
+        size = GaugeMetricFamily(
+            "auth_db_pool_size",
+            "Постоянный размер пула"
+        )
+        
+        stats = self._stats_provider()
+        connections.add_metric(["checked_out"], stats["checked_out"])
+        connections.add_metric(["idle"], stats["idle"])
+        overflow.add_metric([], stats["overflow"])
+        size.add_metric([], stats["size"])
+        
+        yield connections
+        yield overflow
+        yield size
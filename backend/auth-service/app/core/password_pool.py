@@ -0,0 +1,128 @@
+"""
+Пул процессов для хеширования и проверки паролей.
+
+bcrypt намеренно медленный и занимает CPU на сотни миллисекунд.
+Операции выполняются в отдельных процессах, поэтому не блокируют
+event loop и пул потоков, а дешевые запросы (/me, /validate) не
+ждут за волной логинов. Число одновременных операций ограничено
+размером пула, лишние запросы ждут в очереди ограниченной длины,
+а при ее переполнении сразу получают отказ.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+from app.core.metrics import (
+    PASSWORD_HASH_DURATION,
+    PASSWORD_HASH_IN_FLIGHT,
+    PASSWORD_HASH_QUEUE_DEPTH,
+    PASSWORD_HASH_REJECTED,
+    PASSWORD_HASH_WAIT,
+)
+from app.core.security import get_password_hash, verify_password
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordPoolOverloaded(Exception):
+    """Очередь операций хеширования переполнена"""
+
+
+def _noop() -> None:
+    """Пустая задача для запуска процессов пула"""
+
+
+class PasswordPool:
+    """
+    Ограниченный пул процессов для bcrypt.
+    
+    Процессы запускаются через spawn: fork процесса с работающим
+    event loop и открытыми соединениями небезопасен.
+    """
+    
+    def __init__(self, workers: Optional[int] = None, max_queue: int = 100):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+    
+    async def start(self) -> None:
+        """Запуск процессов пула"""
+        if self._executor is not None:
+            return
+        
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        self._semaphore = asyncio.Semaphore(self.workers)
+        
+        # Процессы стартуют заранее, а не на первом логине
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self._executor, _noop) for _ in range(self.workers)
+        ))
+        logger.info(f"Пул хеширования паролей запущен: {self.workers} процессов")
+    
+    async def stop(self) -> None:
+        """Остановка процессов пула"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            self._semaphore = None
+    
+    async def hash(self, password: str) -> str:
+        """Хеширование пароля"""
+        return await self._run("hash", get_password_hash, password)
+    
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Проверка пароля по хешу"""
+        return await self._run("verify", verify_password, plain_password, hashed_password)
+    
+    async def _run(self, operation: str, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Выполнение операции в пуле с ограничением параллельности.
+        
+        Raises:
+            PasswordPoolOverloaded: Если очередь ожидания переполнена
+        """
+        if self._executor is None:
+            await self.start()
+        
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            PASSWORD_HASH_REJECTED.labels(operation).inc()
+            raise PasswordPoolOverloaded()
+        
+        queued_at = time.perf_counter()
+        self._waiting += 1
+        PASSWORD_HASH_QUEUE_DEPTH.inc()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+            PASSWORD_HASH_QUEUE_DEPTH.dec()
+        
+        started = time.perf_counter()
+        PASSWORD_HASH_WAIT.labels(operation).observe(started - queued_at)
+        PASSWORD_HASH_IN_FLIGHT.inc()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            PASSWORD_HASH_IN_FLIGHT.dec()
+            PASSWORD_HASH_DURATION.labels(operation).observe(time.perf_counter() - started)
+            self._semaphore.release()
+
+
+# Глобальный пул процесса сервиса
+password_pool = PasswordPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE
+)
@@ -7,6 +7,10 @@ from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.core.config import settings
+from app.core.keys import key_store
+
+# Алгоритм устаревших токенов, подписанных общим секретом
+LEGACY_ALGORITHM = "HS256"
 
 # Контекст для хеширования паролей
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -43,10 +47,16 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         )
     
     to_encode.update({"exp": expire})
+    
+    if settings.JWT_ALGORITHM == LEGACY_ALGORITHM:
+        return jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=LEGACY_ALGORITHM)
+    
+    # Идентификатор ключа позволяет проверяющим сервисам выбрать ключ из JWKS
     encoded_jwt = jwt.encode(
         to_encode, 
-        settings.JWT_SECRET_KEY, 
-        algorithm=settings.JWT_ALGORITHM
+        key_store.signing_key, 
+        algorithm=settings.JWT_ALGORITHM,
+        headers={"kid": key_store.active_kid}
     )
     
     return encoded_jwt
@@ -63,9 +73,22 @@ def decode_token(token: str) -> Optional[dict]:
         Декодированные данные или None при ошибке
     """
     try:
+        header = jwt.get_unverified_header(token)
+        
+        # Алгоритм проверки выбирается явно: открытый ключ
+        # никогда не используется как HMAC секрет
+        if header.get("alg") == LEGACY_ALGORITHM:
+            if settings.JWT_ALGORITHM != LEGACY_ALGORITHM and not settings.JWT_ACCEPT_HS256:
+                return None
+            return jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[LEGACY_ALGORITHM])
+        
+        key = key_store.public_key(header.get("kid"))
+        if key is None:
+            return None
+        
         payload = jwt.decode(
             token, 
-            settings.JWT_SECRET_KEY, 
+            key, 
             algorithms=[settings.JWT_ALGORITHM]
         )
         return payload
@@ -0,0 +1,155 @@
+"""
+Распределенная трассировка запросов (OpenTelemetry).
+
+Контекст трассы передается между сервисами в заголовке W3C traceparent:
+gateway добавляет его в запросы к сервисам, сервис извлекает его из
+входящего запроса (FastAPIInstrumentor), поэтому спаны всех сервисов
+одного запроса собираются в одну трассу. Запросы SQLAlchemy и команды
+Redis получают собственные спаны.
+
+Решение о записи трассы принимается один раз - в сервисе, где трасса
+началась (доля TRACING_SAMPLE_RATIO), остальные следуют флагу sampled
+из traceparent. Трасса начинается только входящим запросом: команды
+Redis и запросы к БД фоновых задач без родительского спана не
+записываются. При выключенной трассировке провайдер не настраивается,
+и вызовы API OpenTelemetry ничего не делают.
+
+Экспорт спанов выполняется пачками в отдельном потоке:
+- file - JSON Lines в TRACING_FILE_PATH (локальная отладка);
+- otlp - OTLP/HTTP на TRACING_OTLP_ENDPOINT (коллектор, Jaeger, Tempo).
+"""
+
+import logging
+import os
+import threading
+from typing import Optional, Sequence
+
+from fastapi import FastAPI
+from opentelemetry import trace
+from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+from opentelemetry.instrumentation.redis import RedisInstrumentor
+from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.sdk.trace.sampling import (
+    Decision,
+    ParentBased,
+    Sampler,
+    SamplingResult,
+    TraceIdRatioBased,
+)
+from opentelemetry.trace import SpanKind
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Имя сервиса в трассах
+SERVICE = "auth-service"
+
+# Служебные endpoints не трассируются
+EXCLUDED_URLS = "/health,/metrics"
+
+# Трассер для спанов, создаваемых вручную
+tracer = trace.get_tracer(__name__)
+
+# Провайдер, настроенный setup_tracing
+_provider: Optional[TracerProvider] = None
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Запись спанов в файл, по одному JSON объекту на строку"""
+    
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+    
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+        try:
+            with self._lock:
+                self._file.write(lines)
+                self._file.flush()
+        except OSError as e:
+            logger.error(f"Ошибка записи спанов в файл: {e}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+    
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class RequestRootSampler(Sampler):
+    """
+    Выборка трасс, начинающихся входящим запросом.
+    Корневые спаны другого вида (Redis, БД фоновых задач) не записываются.
+    """
+    
+    def __init__(self, ratio: float):
+        self._ratio = TraceIdRatioBased(ratio)
+    
+    def should_sample(
+        self,
+        parent_context,
+        trace_id,
+        name,
+        kind=None,
+        attributes=None,
+        links=None,
+        trace_state=None
+    ) -> SamplingResult:
+        if kind != SpanKind.SERVER:
+            return SamplingResult(Decision.DROP)
+        return self._ratio.should_sample(
+            parent_context, trace_id, name, kind, attributes, links, trace_state
+        )
+    
+    def get_description(self) -> str:
+        return f"RequestRootSampler{{{self._ratio.get_description()}}}"
+
+
+def _exporter() -> SpanExporter:
+    """Экспортер спанов по настройке TRACING_EXPORTER"""
+    if settings.TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+    return JsonLinesSpanExporter(settings.TRACING_FILE_PATH)
+
+
+def setup_tracing(app: FastAPI, engine: AsyncEngine) -> None:
+    """
+    Настройка трассировки приложения, запросов к БД и команд Redis.
+    Вызывается при создании приложения, до первого запроса.
+    """
+    global _provider
+    
+    if not settings.TRACING_ENABLED or _provider is not None:
+        return
+    
+    _provider = TracerProvider(
+        resource=Resource.create({SERVICE_NAME: SERVICE}),
+        sampler=ParentBased(RequestRootSampler(settings.TRACING_SAMPLE_RATIO))
+    )
+    _provider.add_span_processor(BatchSpanProcessor(_exporter()))
+    trace.set_tracer_provider(_provider)
+    
+    FastAPIInstrumentor.instrument_app(app, tracer_provider=_provider, excluded_urls=EXCLUDED_URLS)
+    SQLAlchemyInstrumentor().instrument(engine=engine.sync_engine, tracer_provider=_provider)
+    RedisInstrumentor().instrument(tracer_provider=_provider)
+    
+    logger.info(
+        f"Трассировка включена: выборка {settings.TRACING_SAMPLE_RATIO}, "
+        f"экспорт {settings.TRACING_EXPORTER}"
+    )
+
+
+def shutdown_tracing() -> None:
+    """Отправка накопленных спанов при остановке сервиса"""
+    if _provider is not None:
+        _provider.shutdown()
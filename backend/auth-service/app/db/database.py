@@ -1,40 +1,89 @@
 """
 Настройка подключения к базе данных PostgreSQL.
-Использует SQLAlchemy для ORM.
+Использует асинхронный SQLAlchemy (драйвер asyncpg).
 """
 
-from sqlalchemy import create_engine
+import time
+from typing import AsyncIterator, Dict
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
+from app.core.http_metrics import request_labels
+from app.core.metrics import DB_POOL_CHECKOUT_DURATION, DB_POOL_CHECKOUT_TIMEOUTS, DB_QUERIES
 
-# Создание движка SQLAlchemy
-engine = create_engine(
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, измеряющий время получения соединения"""
+    
+    def _do_get(self):
+        # _do_get ждет свободное соединение в очереди пула
+        # или открывает новое в пределах max_overflow
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            DB_POOL_CHECKOUT_TIMEOUTS.inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT_DURATION.observe(time.perf_counter() - started)
+
+
+def count_queries(async_engine: AsyncEngine) -> None:
+    """Подсчет SQL запросов движка по маршрутам HTTP запросов"""
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        DB_QUERIES.labels(*request_labels()).inc()
+
+
+# Создание асинхронного движка SQLAlchemy
+engine = create_async_engine(
     settings.DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
     pool_pre_ping=True,  # Проверка соединения перед использованием
-    pool_size=10,
-    max_overflow=20
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW
 )
 
-# Фабрика сессий
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Счетчик SQL запросов для метрик
+count_queries(engine)
+
+# Фабрика сессий. Объекты не сбрасываются после commit, потому что
+# ленивая подгрузка атрибутов в асинхронной сессии невозможна
+SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
 
 # Базовый класс для моделей
 Base = declarative_base()
 
 
-def get_db():
+async def get_db() -> AsyncIterator[AsyncSession]:
     """
     Генератор сессии базы данных.
     Используется как зависимость в FastAPI endpoints.
     """
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-def create_tables():
+async def create_tables():
     """Создание всех таблиц в базе данных"""
-    Base.metadata.create_all(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def close_engine():
+    """Закрытие пула соединений с базой данных"""
+    await engine.dispose()
+
+
+def get_pool_stats() -> Dict[str, int]:
+    """Состояние пула соединений для метрик"""
+    pool = engine.sync_engine.pool
+    return {
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "size": pool.size(),
+    }
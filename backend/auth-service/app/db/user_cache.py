@@ -0,0 +1,297 @@
+"""
+Кэш профилей пользователей для /me и /validate.
+
+Профиль ищется в памяти процесса (L1), затем в Redis (если задан
+REDIS_HOST), и только потом в таблице users. Неизвестные id
+кэшируются на короткое время (USER_CACHE_NEGATIVE_TTL_SECONDS),
+чтобы поток запросов с токенами удаленных пользователей не доходил
+до БД.
+
+Любое изменение профиля или is_active должно сопровождаться вызовом
+invalidate_user: запись удаляется из Redis, версия профиля
+USER_VERSION_KEY увеличивается, а реплики получают инвалидацию L1
+через pub/sub канал USER_INVALIDATION_CHANNEL. Загруженный из БД
+профиль записывается в Redis, только если версия не изменилась с
+начала загрузки, поэтому инвалидация во время загрузки не
+перезаписывается устаревшим профилем.
+Изменения в обход сервиса (например, вручную в БД) видны после
+истечения USER_CACHE_TTL_SECONDS.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+from app.core.metrics import USER_CACHE_REQUESTS
+from app.schemas.user import UserResponse
+
+logger = logging.getLogger(__name__)
+
+# Ключ профиля в Redis, его версия и канал рассылки инвалидаций (сообщение - id)
+USER_CACHE_KEY = "auth:user:{user_id}"
+USER_VERSION_KEY = "auth:user:{user_id}:version"
+USER_INVALIDATION_CHANNEL = "auth:user:invalidate"
+INVALIDATION_RECONNECT_DELAY_SECONDS = 1.0
+
+# Значение неизвестного пользователя в Redis
+MISSING_USER = "null"
+
+# Запись профиля, если версия не изменилась с начала загрузки
+SET_IF_VERSION_SCRIPT = """
+if (redis.call("get", KEYS[2]) or "0") ~= ARGV[1] then
+    return 0
+end
+redis.call("set", KEYS[1], ARGV[2], "EX", ARGV[3])
+return 1
+"""
+
+# Глобальный клиент Redis (None - кэш только в памяти процесса)
+redis_client: Optional[aioredis.Redis] = None
+
+# Фоновая подписка на инвалидации и признак ее активности
+_invalidation_task: Optional[asyncio.Task] = None
+_invalidation_subscribed = False
+
+
+class UserProfileCache:
+    """LRU кэш профилей в памяти процесса со сроком жизни записей"""
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, Tuple[float, Optional[UserResponse]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Счетчик инвалидаций: загрузка, начавшаяся до инвалидации,
+        # не должна вернуть в кэш устаревший профиль
+        self.generation = 0
+    
+    def get(self, user_id: int) -> Tuple[bool, Optional[UserResponse]]:
+        """
+        Returns:
+            (найдено ли значение, профиль или None для неизвестного id)
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return False, None
+            
+            expires_at, user = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return False, None
+            
+            self._entries.move_to_end(user_id)
+            return True, user
+    
+    def set(
+        self,
+        user_id: int,
+        user: Optional[UserResponse],
+        ttl: float,
+        generation: Optional[int] = None
+    ) -> None:
+        """Сохранение профиля, если с начала загрузки не было инвалидаций"""
+        if self.max_entries <= 0 or ttl <= 0:
+            return
+        
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            
+            self._entries[user_id] = (time.monotonic() + ttl, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def delete(self, user_id: int) -> None:
+        """Удаление профиля"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self.generation += 1
+    
+    def clear(self) -> None:
+        """Удаление всех профилей"""
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+
+# Кэш профилей процесса
+local_users = UserProfileCache(max_entries=settings.USER_CACHE_MAX_ENTRIES)
+
+
+def get_redis_client() -> Optional[aioredis.Redis]:
+    """Клиент Redis или None, если Redis не настроен"""
+    global redis_client
+    
+    if redis_client is None and settings.REDIS_HOST:
+        redis_client = aioredis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            decode_responses=True
+        )
+    
+    return redis_client
+
+
+async def close_redis_client() -> None:
+    """Закрытие соединений с Redis"""
+    global redis_client
+    
+    if redis_client is not None:
+        await redis_client.aclose()
+        redis_client = None
+
+
+def _ttl(user: Optional[UserResponse]) -> float:
+    """Время жизни записи: неизвестные id хранятся недолго"""
+    if user is None:
+        return settings.USER_CACHE_NEGATIVE_TTL_SECONDS
+    return settings.USER_CACHE_TTL_SECONDS
+
+
+async def get_cached_user(
+    user_id: int,
+    loader: Callable[[int], Awaitable[Optional[UserResponse]]]
+) -> Optional[UserResponse]:
+    """
+    Профиль пользователя из кэша или из БД.
+    
+    Args:
+        user_id: ID пользователя
+        loader: Загрузка профиля из БД (None - пользователь не найден)
+    
+    Returns:
+        Профиль или None, если пользователя нет
+    """
+    client = get_redis_client()
+    key = USER_CACHE_KEY.format(user_id=user_id)
+    version_key = USER_VERSION_KEY.format(user_id=user_id)
+    
+    # С Redis L1 согласован только при активной подписке на инвалидации
+    use_local = client is None or _invalidation_subscribed
+    if use_local:
+        found, user = local_users.get(user_id)
+        if found:
+            USER_CACHE_REQUESTS.labels("l1", "hit").inc()
+            return user
+        USER_CACHE_REQUESTS.labels("l1", "miss").inc()
+    
+    generation = local_users.generation
+    version = None
+    
+    if client is not None:
+        try:
+            cached, version = await client.mget(key, version_key)
+        except Exception as e:
+            USER_CACHE_REQUESTS.labels("redis", "error").inc()
+            logger.error(f"Ошибка чтения профиля {user_id} из Redis: {e}")
+            cached = None
+        
+        if cached is not None:
+            USER_CACHE_REQUESTS.labels("redis", "hit").inc()
+            user = None if cached == MISSING_USER else UserResponse.model_validate_json(cached)
+            if use_local:
+                local_users.set(user_id, user, _ttl(user), generation)
+            return user
+        USER_CACHE_REQUESTS.labels("redis", "miss").inc()
+    
+    user = await loader(user_id)
+    if use_local:
+        local_users.set(user_id, user, _ttl(user), generation)
+    
+    # Профиль, инвалидированный во время загрузки (этой или другой
+    # репликой), в Redis не записывается
+    if client is not None and local_users.generation == generation:
+        value = MISSING_USER if user is None else user.model_dump_json()
+        try:
+            await client.eval(
+                SET_IF_VERSION_SCRIPT, 2, key, version_key,
+                version or "0", value, max(1, int(_ttl(user)))
+            )
+        except Exception as e:
+            logger.error(f"Ошибка записи профиля {user_id} в Redis: {e}")
+    
+    return user
+
+
+async def invalidate_user(user_id: int) -> None:
+    """
+    Удаление профиля из кэша всех реплик.
+    Вызывается после commit изменения профиля или is_active.
+    """
+    local_users.delete(user_id)
+    
+    client = get_redis_client()
+    if client is None:
+        return
+    
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.delete(USER_CACHE_KEY.format(user_id=user_id))
+            # Версия должна жить дольше любой незавершенной загрузки
+            pipe.incr(USER_VERSION_KEY.format(user_id=user_id))
+            pipe.expire(USER_VERSION_KEY.format(user_id=user_id), settings.USER_CACHE_TTL_SECONDS)
+            pipe.publish(USER_INVALIDATION_CHANNEL, user_id)
+            await pipe.execute()
+    except Exception as e:
+        logger.error(f"Ошибка инвалидации профиля {user_id}: {e}")
+
+
+async def _listen_user_invalidations() -> None:
+    """Удаление из L1 профилей, инвалидированных любой репликой"""
+    global _invalidation_subscribed
+    
+    while True:
+        pubsub = None
+        try:
+            pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(USER_INVALIDATION_CHANNEL)
+            # Пока подписки не было, рассылки могли быть пропущены
+            local_users.clear()
+            _invalidation_subscribed = True
+            logger.info("Подписка на инвалидации профилей установлена")
+            
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    local_users.delete(int(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка подписки на инвалидации профилей: {e}")
+            await asyncio.sleep(INVALIDATION_RECONNECT_DELAY_SECONDS)
+        finally:
+            _invalidation_subscribed = False
+            local_users.clear()
+            if pubsub is not None:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+
+def start_user_invalidation_listener() -> None:
+    """Запуск фоновой подписки на инвалидации (только при наличии Redis)"""
+    global _invalidation_task
+    
+    if _invalidation_task is None and get_redis_client() is not None:
+        _invalidation_task = asyncio.create_task(_listen_user_invalidations())
+
+
+async def stop_user_invalidation_listener() -> None:
+    """Остановка фоновой подписки на инвалидации"""
+    global _invalidation_task
+    
+    if _invalidation_task is not None:
+        _invalidation_task.cancel()
+        try:
+            await _invalidation_task
+        except asyncio.CancelledError:
+            pass
+        _invalidation_task = None
@@ -5,11 +5,24 @@ FastAPI приложение для аутентификации пользов
 
 import logging
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from prometheus_client import REGISTRY, CONTENT_TYPE_LATEST, generate_latest
 
 from app.core.config import settings
-from app.db.database import create_tables
+from app.core.http_metrics import HTTPMetricsMiddleware
+from app.core.tracing import setup_tracing, shutdown_tracing
+from app.core.metrics import DatabasePoolCollector
+from app.core.keys import key_store
+from app.core.security import LEGACY_ALGORITHM
+from app.core.password_pool import password_pool, PasswordPoolOverloaded
+from app.db.database import create_tables, close_engine, engine, get_pool_stats
+from app.db.user_cache import (
+    close_redis_client,
+    start_user_invalidation_listener,
+    stop_user_invalidation_listener,
+)
 from app.api.auth import router as auth_router
 
 # Настройка логирования
@@ -30,14 +43,29 @@ async def lifespan(app: FastAPI):
     
     # Создание таблиц при старте
     try:
-        create_tables()
+        await create_tables()
         logger.info("Таблицы базы данных созданы/проверены")
     except Exception as e:
         logger.error(f"Ошибка при создании таблиц: {e}")
     
+    # Ключи подписи токенов
+    if settings.JWT_ALGORITHM != LEGACY_ALGORITHM:
+        key_store.load(settings.JWT_KEYS_DIR, settings.JWT_ALGORITHM, settings.JWT_ACTIVE_KID)
+    
+    # Запуск процессов для хеширования паролей
+    await password_pool.start()
+    
+    # Инвалидации кэша профилей от других реплик
+    start_user_invalidation_listener()
+    
     yield
     
     logger.info("Остановка Auth Service...")
+    await stop_user_invalidation_listener()
+    await close_redis_client()
+    await password_pool.stop()
+    await close_engine()
+    shutdown_tracing()
 
 
 # Создание FastAPI приложения
@@ -45,7 +73,9 @@ app = FastAPI(
     title=settings.APP_NAME,
     description="Сервис аутентификации для платформы CloudMeet Lite",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # Ответы сериализуются orjson вместо json.dumps
+    default_response_class=ORJSONResponse
 )
 
 # Настройка CORS
@@ -57,10 +87,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Метрики HTTP запросов (внешний слой, учитывает и ответы CORS)
+app.add_middleware(HTTPMetricsMiddleware)
+
+# Трассировка запросов, БД и Redis (при TRACING_ENABLED)
+setup_tracing(app, engine)
+
+# Метрики пула соединений с БД
+REGISTRY.register(DatabasePoolCollector(get_pool_stats))
+
 # Подключение роутеров
 app.include_router(auth_router)
 
 
+@app.exception_handler(PasswordPoolOverloaded)
+async def password_pool_overloaded_handler(request: Request, exc: PasswordPoolOverloaded):
+    """Отказ при переполнении очереди хеширования паролей"""
+    return ORJSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Сервис перегружен, повторите попытку позже"},
+        headers={"Retry-After": "1"}
+    )
+
+
 @app.get("/health")
 def health_check():
     """
@@ -70,6 +119,21 @@ def health_check():
     return {"status": "healthy", "service": "auth-service"}
 
 
+@app.get("/.well-known/jwks.json", include_in_schema=False)
+def jwks():
+    """
+    Открытые ключи проверки токенов (JWK Set).
+    Используется gateway и conference-service для локальной проверки JWT.
+    """
+    return key_store.jwks()
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Метрики в формате Prometheus"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/")
 def root():
     """Корневой endpoint"""
@@ -0,0 +1,98 @@
+"""
+Бенчмарк пропускной способности проверки паролей на ядро.
+
+Проверка bcrypt - самая дорогая часть POST /api/auth/login, поэтому
+пропускная способность логина ограничена пулом хеширования. Бенчмарк
+запускает PasswordPool с разным числом процессов, держит очередь
+проверок заполненной и печатает операции в секунду всего и на ядро.
+Параллельно измеряется задержка дешевой задачи в event loop, чтобы
+убедиться, что bcrypt его не блокирует.
+
+Запуск из каталога сервиса:
+    python -m benchmarks.bench_login_throughput --workers 1 2 4 --duration 10
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import List
+
+from app.core.password_pool import PasswordPool
+from app.core.security import get_password_hash
+
+PASSWORD = "benchmark-password"
+
+# Интервал проверки отзывчивости event loop
+LOOP_PROBE_INTERVAL_SECONDS = 0.01
+
+
+async def probe_loop_lag(stop: asyncio.Event, lags: List[float]) -> None:
+    """Измерение задержки пробуждения event loop"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(LOOP_PROBE_INTERVAL_SECONDS)
+        lags.append(time.perf_counter() - started - LOOP_PROBE_INTERVAL_SECONDS)
+
+
+async def run_level(workers: int, hashed: str, duration: float) -> dict:
+    """Нагрузка пула с заданным числом процессов"""
+    pool = PasswordPool(workers=workers, max_queue=workers * 4)
+    await pool.start()
+    
+    completed = 0
+    deadline = time.perf_counter() + duration
+    
+    async def client() -> None:
+        nonlocal completed
+        while time.perf_counter() < deadline:
+            if not await pool.verify(PASSWORD, hashed):
+                raise RuntimeError("Проверка пароля не прошла")
+            completed += 1
+    
+    stop = asyncio.Event()
+    lags: List[float] = []
+    probe = asyncio.create_task(probe_loop_lag(stop, lags))
+    
+    started = time.perf_counter()
+    # Клиентов вдвое больше процессов, чтобы очередь не пустела
+    await asyncio.gather(*(client() for _ in range(workers * 2)))
+    elapsed = time.perf_counter() - started
+    
+    stop.set()
+    await probe
+    await pool.stop()
+    
+    return {
+        "workers": workers,
+        "ops": completed / elapsed,
+        "ops_per_core": completed / elapsed / workers,
+        "max_loop_lag_ms": max(lags, default=0.0) * 1000,
+    }
+
+
+async def run(args: argparse.Namespace) -> int:
+    hashed = get_password_hash(PASSWORD)
+    
+    print(f"CPU cores: {os.cpu_count()}")
+    print(f"{'workers':>7} {'logins/s':>9} {'per core':>9} {'loop lag ms':>12}")
+    for workers in args.workers:
+        result = await run_level(workers, hashed, args.duration)
+        print(
+            f"{result['workers']:>7} {result['ops']:>9.1f} "
+            f"{result['ops_per_core']:>9.1f} {result['max_loop_lag_ms']:>12.1f}"
+        )
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--duration", type=float, default=10.0, help="Секунд на уровень")
+    args = parser.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,12 +7,13 @@ from fastapi import Depends, HTTPException, status, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from typing import Optional
+from urllib.parse import unquote
 from app.db.database import get_db
-from app.core.security import decode_token
+from app.core.security import decode_token, verify_identity_signature
 from pydantic import BaseModel
 
-# Схема Bearer токена
-security = HTTPBearer()
+# Схема Bearer токена (необязательна при подписанных заголовках gateway)
+security = HTTPBearer(auto_error=False)
 
 
 class CurrentUser(BaseModel):
@@ -22,38 +23,29 @@ class CurrentUser(BaseModel):
     display_name: Optional[str] = None
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> CurrentUser:
+def get_user_from_token(token: str) -> Optional[CurrentUser]:
     """
-    Получение данных текущего пользователя из JWT токена.
+    Получение данных пользователя из JWT токена.
     
-    Raises:
-        HTTPException: Если токен недействителен
+    Returns:
+        Данные пользователя или None, если токен недействителен
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Не удалось подтвердить учетные данные",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    token = credentials.credentials
     payload = decode_token(token)
     
     if payload is None:
-        raise credentials_exception
+        return None
     
     user_id = payload.get("sub")
     email = payload.get("email")
     display_name = payload.get("display_name") or email
     
     if user_id is None:
-        raise credentials_exception
+        return None
     
     try:
         user_id_int = int(user_id)
     except (ValueError, TypeError):
-        raise credentials_exception
+        return None
     
     return CurrentUser(
         user_id=user_id_int,
@@ -63,16 +55,68 @@ def get_current_user(
 
 
 def get_current_user_from_header(
-    x_user_id: int = Header(..., alias="X-User-ID"),
-    x_user_email: str = Header(..., alias="X-User-Email"),
-    x_user_name: str = Header(None, alias="X-User-Name")
-) -> CurrentUser:
+    x_user_id: Optional[str] = Header(None, alias="X-User-ID"),
+    x_user_email: Optional[str] = Header(None, alias="X-User-Email"),
+    x_user_name: Optional[str] = Header(None, alias="X-User-Name"),
+    x_user_timestamp: Optional[str] = Header(None, alias="X-User-Timestamp"),
+    x_user_signature: Optional[str] = Header(None, alias="X-User-Signature")
+) -> Optional[CurrentUser]:
     """
     Получение данных пользователя из заголовков запроса.
-    Используется когда gateway передает данные пользователя.
+    Используется когда gateway уже проверил токен и передает данные
+    пользователя с подписью общим секретом.
+    
+    Returns:
+        Данные пользователя или None, если заголовков нет или подпись неверна
     """
+    if x_user_id is None or x_user_signature is None:
+        return None
+    
+    values = "\n".join([x_user_id, x_user_email or "", x_user_name or "", x_user_timestamp or ""])
+    if not verify_identity_signature(values, x_user_timestamp, x_user_signature):
+        return None
+    
+    try:
+        user_id = int(x_user_id)
+    except ValueError:
+        return None
+    
+    email = unquote(x_user_email or "")
     return CurrentUser(
-        user_id=x_user_id,
-        email=x_user_email,
-        display_name=x_user_name or x_user_email
+        user_id=user_id,
+        email=email,
+        display_name=unquote(x_user_name or "") or email
+    )
+
+
+def get_current_user(
+    header_user: Optional[CurrentUser] = Depends(get_current_user_from_header),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
+) -> CurrentUser:
+    """
+    Получение данных текущего пользователя.
+    
+    Запросы через gateway несут подписанные заголовки X-User-*,
+    и JWT не декодируется. Прямые запросы проверяются по JWT токену.
+    
+    Raises:
+        HTTPException: Если пользователь не подтвержден
+    """
+    if header_user is not None:
+        return header_user
+    
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Не удалось подтвердить учетные данные",
+        headers={"WWW-Authenticate": "Bearer"},
     )
+    
+    if credentials is None:
+        raise credentials_exception
+    
+    current_user = get_user_from_token(credentials.credentials)
+    
+    if current_user is None:
+        raise credentials_exception
+    
+    return current_user
@@ -0,0 +1,192 @@
+"""
+Endpoints для доставки событий комнаты в реальном времени:
+WebSocket и Server-Sent Events (для клиентов за прокси без WebSocket).
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, WebSocket, status
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.api.deps import get_user_from_token, CurrentUser
+from app.services.events import broker, parse_event_id, read_room_events_since, EVENT_RESYNC
+from app.services.room_access import get_room_access
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+# Создание роутера
+router = APIRouter(prefix="/api/rooms", tags=["events"])
+
+# EventSource в браузере не передает заголовки, поэтому токен
+# может прийти как в Authorization, так и в query параметре
+optional_security = HTTPBearer(auto_error=False)
+
+
+async def room_exists(room_id: int) -> bool:
+    """Проверка существования активной комнаты"""
+    async with SessionLocal() as db:
+        access = await get_room_access(db, room_id)
+        return access is not None and access.is_active
+
+
+@router.websocket("/{room_id}/ws")
+async def room_events(
+    websocket: WebSocket,
+    room_id: int,
+    token: Optional[str] = Query(None, description="JWT токен доступа")
+):
+    """
+    Поток событий комнаты: новые сообщения, вход и выход участников.
+    
+    Браузер не может передать заголовок Authorization при открытии
+    WebSocket, поэтому токен передается в query параметре token.
+    События отправляются как JSON: {"type", "room_id", "data"}.
+    """
+    current_user = get_user_from_token(token) if token else None
+    if current_user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    if not await room_exists(room_id):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    logger.info(f"Пользователь {current_user.user_id} подписался на события комнаты {room_id}")
+    
+    async with broker.subscribe(room_id) as queue:
+        async def send_events() -> None:
+            while True:
+                event = await queue.get()
+                await websocket.send_json(event)
+        
+        async def receive_messages() -> None:
+            # Входящие сообщения клиента не обрабатываются,
+            # чтение нужно только для обнаружения отключения
+            while True:
+                await websocket.receive_text()
+        
+        tasks = [
+            asyncio.create_task(send_events()),
+            asyncio.create_task(receive_messages()),
+        ]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    logger.info(f"Пользователь {current_user.user_id} отключился от событий комнаты {room_id}")
+
+
+def get_stream_user(
+    token: Optional[str] = Query(None, description="JWT токен доступа"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> CurrentUser:
+    """
+    Получение пользователя для потока событий.
+    Токен берется из заголовка Authorization или query параметра token.
+    """
+    raw_token = credentials.credentials if credentials else token
+    current_user = get_user_from_token(raw_token) if raw_token else None
+    
+    if current_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Не удалось подтвердить учетные данные",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    return current_user
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Форматирование события в формате text/event-stream"""
+    data = json.dumps(event, default=str, ensure_ascii=False)
+    if event.get("id"):
+        return f"id: {event['id']}\ndata: {data}\n\n"
+    return f"data: {data}\n\n"
+
+
+@router.get("/{room_id}/events")
+async def room_events_stream(
+    room_id: int,
+    request: Request,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    last_event_id_param: Optional[str] = Query(None, alias="last_event_id"),
+    current_user: CurrentUser = Depends(get_stream_user)
+):
+    """
+    Поток событий комнаты в формате Server-Sent Events.
+    
+    При переподключении браузер передает заголовок Last-Event-ID,
+    и поток продолжается с события, следующего за ним, без повторной
+    загрузки истории. Если часть событий уже вытеснена из истории,
+    клиент получает событие resync.
+    """
+    if not await room_exists(room_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Комната не найдена или неактивна"
+        )
+    
+    resume_from = last_event_id or last_event_id_param
+    logger.info(f"Пользователь {current_user.user_id} открыл SSE поток комнаты {room_id}")
+    
+    async def event_stream() -> AsyncIterator[str]:
+        # Подписка оформляется до чтения истории, чтобы не потерять
+        # события, опубликованные между чтением истории и подпиской
+        async with broker.subscribe(room_id) as queue:
+            # События с ID не новее горизонта уже есть в прочитанной истории:
+            # запись в поток монотонна, поэтому все, что добавлено после
+            # чтения истории, получит больший ID
+            replay_horizon = parse_event_id(resume_from) if resume_from else None
+            
+            if resume_from:
+                # Ответ уже начат, поэтому ошибка Redis не прерывает поток:
+                # клиент перезагружает данные по resync и получает новые события
+                try:
+                    replay = await read_room_events_since(room_id, resume_from)
+                except RedisError as e:
+                    logger.error(f"Ошибка чтения истории событий комнаты {room_id}: {e}")
+                    replay = [{"type": EVENT_RESYNC, "room_id": room_id, "data": {}}]
+                
+                for event in replay:
+                    yield format_sse(event)
+                    replay_horizon = parse_event_id(event.get("id", "")) or replay_horizon
+            
+            # Рекомендуемая задержка переподключения для EventSource
+            yield "retry: 3000\n\n"
+            
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                
+                event_id = parse_event_id(event.get("id", ""))
+                if replay_horizon and event_id and event_id <= replay_horizon:
+                    continue
+                
+                yield format_sse(event)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Отключение буферизации ответа в nginx
+            "X-Accel-Buffering": "no",
+        }
+    )
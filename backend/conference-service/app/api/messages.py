@@ -2,20 +2,27 @@
 API endpoints для сообщений чата в комнатах.
 """
 
+import asyncio
 import logging
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+import time
+from contextlib import nullcontext
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
+from redis.exceptions import RedisError
 
 from app.db.database import get_db
-from app.db.redis import cache_get, cache_set, cache_delete, cache_delete_pattern
-from app.models.room import Room
-from app.models.participant import RoomParticipant, ParticipantStatus
+from app.db.redis import cache_get_or_set, cache_key, cache_invalidate_namespace
 from app.models.message import Message
 from app.schemas.message import MessageCreate, MessageResponse, MessagesListResponse
 from app.api.deps import get_current_user, CurrentUser
 from app.core.config import settings
+from app.core.http_metrics import mark_long_poll
+from app.services import message_ingest, room_versions
+from app.services.room_access import get_room_access
+from app.services.events import broker, publish_room_event, EVENT_MESSAGE, EVENT_ROOM_CLOSED
 
 # Настройка логгера
 logger = logging.getLogger(__name__)
@@ -24,11 +31,33 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/rooms", tags=["messages"])
 
 
+async def wait_for_message(events: asyncio.Queue, deadline: float) -> bool:
+    """
+    Ожидание события нового сообщения комнаты до deadline (time.monotonic).
+    
+    Returns:
+        True - пришло новое сообщение, False - таймаут или комната закрыта
+    """
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        try:
+            event = await asyncio.wait_for(events.get(), remaining)
+        except asyncio.TimeoutError:
+            return False
+        
+        if event["type"] == EVENT_MESSAGE:
+            return True
+        if event["type"] == EVENT_ROOM_CLOSED:
+            return False
+
+
 @router.post("/{room_id}/messages", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
-def send_message(
+async def send_message(
     room_id: int,
     message_data: MessageCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: CurrentUser = Depends(get_current_user)
 ):
     """
@@ -45,70 +74,130 @@ def send_message(
     """
     logger.info(f"Отправка сообщения в комнату {room_id} от пользователя {current_user.user_id}")
     
-    # Проверка существования комнаты
-    room = db.query(Room).filter(Room.id == room_id, Room.is_active == True).first()
-    if not room:
+    # Активность комнаты, ее владелец и присутствие отправителя
+    # проверяются по снимку в Redis без запросов к БД
+    try:
+        access = await get_room_access(db, room_id, member_id=current_user.user_id)
+    except RedisError as e:
+        logger.error(f"Ошибка чтения присутствия участников комнаты {room_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Сервис временно недоступен"
+        )
+    
+    if access is None or not access.is_active:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Комната не найдена или неактивна"
         )
     
-    # Проверка, что пользователь является участником комнаты
-    participant = db.query(RoomParticipant).filter(
-        RoomParticipant.room_id == room_id,
-        RoomParticipant.user_id == current_user.user_id,
-        RoomParticipant.status != ParticipantStatus.OFFLINE.value
-    ).first()
-    
-    if not participant:
+    if not access.is_member:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Вы не являетесь участником этой комнаты"
         )
     
-    # Создание сообщения
-    new_message = Message(
-        room_id=room_id,
-        user_id=current_user.user_id,
-        user_display_name=current_user.display_name or current_user.email,
-        content=message_data.content
-    )
+    display_name = current_user.display_name or current_user.email
     
-    db.add(new_message)
-    db.commit()
-    db.refresh(new_message)
+    if message_ingest.is_buffered():
+        # ID и время выдаются сразу, запись в БД выполняется фоном пачками
+        try:
+            new_message = await message_ingest.enqueue(
+                room_id, current_user.user_id, display_name, message_data.content
+            )
+        except RedisError as e:
+            logger.error(f"Ошибка записи сообщения в буфер комнаты {room_id}: {e}")
+            new_message = None
+        
+        if new_message is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервис временно недоступен"
+            )
+    else:
+        # Создание сообщения
+        new_message = Message(
+            room_id=room_id,
+            user_id=current_user.user_id,
+            user_display_name=display_name,
+            content=message_data.content
+        )
+        
+        db.add(new_message)
+        await db.commit()
+        await db.refresh(new_message)
     
-    # Инвалидация кэша сообщений (удаляем все ключи messages:{room_id}:*)
-    cache_delete_pattern(f"messages:{room_id}:*")
+    # Инвалидация кэша и новая версия сообщений комнаты
+    await cache_invalidate_namespace(f"messages:{room_id}")
+    await room_versions.bump(room_id, room_versions.VERSION_MESSAGES)
     
     logger.info(f"Сообщение {new_message.id} отправлено в комнату {room_id}")
     
-    return MessageResponse(
+    response = MessageResponse(
         id=new_message.id,
         room_id=new_message.room_id,
         user_id=new_message.user_id,
         user_display_name=new_message.user_display_name,
-        is_owner=(new_message.user_id == room.owner_id),
+        is_owner=access.is_owner(new_message.user_id),
         content=new_message.content,
         created_at=new_message.created_at
     )
+    
+    # Доставка сообщения подписчикам комнаты
+    await publish_room_event(room_id, EVENT_MESSAGE, response.model_dump())
+    
+    return response
 
 
 @router.get("/{room_id}/messages", response_model=MessagesListResponse)
-def get_messages(
+async def get_messages(
     room_id: int,
-    skip: int = Query(0, ge=0, description="Пропустить записей"),
+    request: Request,
+    after_id: Optional[int] = Query(None, ge=0, description="Только сообщения новее сообщения с этим ID"),
+    before_id: Optional[int] = Query(None, ge=1, description="Только сообщения старше сообщения с этим ID"),
+    skip: Optional[int] = Query(None, ge=0, description="Пропустить записей (устаревшая offset-пагинация)"),
     limit: int = Query(50, ge=1, le=200, description="Количество записей"),
-    db: Session = Depends(get_db),
+    include_total: bool = Query(False, description="Посчитать общее количество сообщений"),
+    wait: int = Query(
+        0, ge=0, le=settings.MESSAGES_WAIT_MAX_SECONDS,
+        description="Сколько секунд ждать новых сообщений после after_id (длинный опрос)"
+    ),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
     current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Получение истории сообщений комнаты.
     
+    Режимы выборки (сообщения всегда возвращаются от старых к новым):
+    - after_id: сообщения новее указанного (для опроса новых сообщений);
+    - before_id: страница сообщений перед указанным (прокрутка истории назад);
+    - skip: offset-пагинация с начала истории (для совместимости);
+    - без параметров: последние limit сообщений.
+    
+    Курсорные режимы используют индекс (room_id, id) и не зависят
+    от глубины истории.
+    
+    Ответ содержит ETag версии сообщений комнаты. Если он совпадает с
+    If-None-Match (опрос комнаты без новых сообщений), возвращается
+    304 без тела и без запросов к БД.
+    
+    Длинный опрос (after_id и wait): если новых сообщений нет, запрос
+    ждет до wait секунд события нового сообщения из pub/sub комнаты
+    (его публикует send_message) и отвечает сразу после него. По
+    таймауту возвращается пустой список (или 304 при совпадении ETag).
+    На время ожидания соединение с БД возвращается в пул.
+    
     Args:
         room_id: ID комнаты
+        request: Входящий запрос
+        after_id: Курсор новых сообщений
+        before_id: Курсор старых сообщений
         skip: Количество записей для пропуска
         limit: Максимальное количество записей
+        include_total: Нужно ли считать общее количество сообщений
+        wait: Максимальное ожидание новых сообщений (секунды)
+        if_none_match: ETag ранее полученного ответа
         db: Сессия базы данных
         current_user: Текущий авторизованный пользователь
     
@@ -116,49 +205,126 @@ def get_messages(
         Список сообщений
     """
     # Проверка существования комнаты
-    room = db.query(Room).filter(Room.id == room_id).first()
-    if not room:
+    access = await get_room_access(db, room_id)
+    if access is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Комната не найдена"
         )
     
-    # Проверка кэша для последних сообщений
-    cache_key = f"messages:{room_id}:{skip}:{limit}"
-    cached_messages = cache_get(cache_key)
-    
-    if cached_messages:
-        logger.debug(f"Сообщения комнаты {room_id} получены из кэша")
+    async def load_messages() -> dict:
+        query = select(Message).where(Message.room_id == room_id)
+        
+        if after_id is not None:
+            query = query.where(Message.id > after_id)
+        if before_id is not None:
+            query = query.where(Message.id < before_id)
+        
+        # Без after_id и skip выбираются последние сообщения перед
+        # курсором (или в конце истории)
+        newest_first = after_id is None and skip is None
+        
+        # Лишняя запись нужна только для определения has_more
+        if newest_first:
+            query = query.order_by(Message.id.desc()).limit(limit + 1)
+        else:
+            query = query.order_by(Message.id.asc()).offset(skip or 0).limit(limit + 1)
+        messages = (await db.scalars(query)).all()
+        
+        # Последние сообщения могут быть еще не записаны из буфера в БД.
+        # При offset-пагинации они учитываются приблизительно: как
+        # следующие за записанными
+        if message_ingest.is_buffered():
+            try:
+                pending = await message_ingest.get_pending(
+                    room_id, after_id, before_id, limit + 1, newest_first
+                )
+            except RedisError as e:
+                logger.error(f"Ошибка чтения буфера сообщений комнаты {room_id}: {e}")
+                pending = []
+            messages = message_ingest.merge(messages, pending, newest_first)[:limit + 1]
+        
+        has_more = len(messages) > limit
+        messages = list(messages[:limit])
+        if newest_first:
+            messages.reverse()
+        
+        # Подсчет общего количества - полный проход по сообщениям комнаты,
+        # поэтому только по явному запросу
+        total = None
+        if include_total:
+            total = await db.scalar(
+                select(func.count(Message.id)).where(Message.room_id == room_id)
+            )
+            if message_ingest.is_buffered():
+                try:
+                    pending_ids = [msg.id for msg in await message_ingest.get_pending(room_id)]
+                except RedisError as e:
+                    logger.error(f"Ошибка чтения буфера сообщений комнаты {room_id}: {e}")
+                    pending_ids = []
+                if pending_ids:
+                    # Записанные, но еще не удаленные из буфера сообщения
+                    stored = await db.scalar(
+                        select(func.count(Message.id)).where(
+                            Message.room_id == room_id, Message.id.in_(pending_ids)
+                        )
+                    )
+                    total += len(pending_ids) - stored
+        
+        # Страница проверяется схемой один раз при загрузке и кэшируется
+        # в JSON-представлении, которое отдается клиенту без изменений
         return MessagesListResponse(
-            messages=[MessageResponse(**msg) for msg in cached_messages["messages"]],
-            total=cached_messages["total"]
-        )
+            messages=[{
+                "id": msg.id,
+                "room_id": msg.room_id,
+                "user_id": msg.user_id,
+                "user_display_name": msg.user_display_name,
+                "is_owner": access.is_owner(msg.user_id),
+                "content": msg.content,
+                "created_at": msg.created_at,
+            } for msg in messages],
+            total=total,
+            has_more=has_more
+        ).model_dump(mode="json")
     
-    # Подсчет общего количества сообщений
-    total = db.query(func.count(Message.id)).filter(Message.room_id == room_id).scalar()
-    
-    # Получение сообщений
-    messages = db.query(Message).filter(
-        Message.room_id == room_id
-    ).order_by(Message.created_at.asc()).offset(skip).limit(limit).all()
-    
-    result = MessagesListResponse(
-        messages=[MessageResponse(
-            id=msg.id,
-            room_id=msg.room_id,
-            user_id=msg.user_id,
-            user_display_name=msg.user_display_name,
-            is_owner=(msg.user_id == room.owner_id),
-            content=msg.content,
-            created_at=msg.created_at
-        ) for msg in messages],
-        total=total
-    )
+    deadline = time.monotonic() + wait
+    
+    # Подписка до чтения версии и сообщений: сообщение, отправленное
+    # между чтением и ожиданием, все равно разбудит запрос
+    subscription = nullcontext()
+    if wait and after_id is not None:
+        mark_long_poll(request.scope)
+        subscription = broker.subscribe(room_id)
+    
+    async with subscription as events:
+        while True:
+            # Версия читается до загрузки сообщений (см. get_room)
+            etag = None
+            version = await room_versions.get_version(room_id, room_versions.VERSION_MESSAGES)
+            if version is not None:
+                etag = room_versions.make_etag(room_id, room_versions.VERSION_MESSAGES, version)
+            
+            modified = etag is None or not room_versions.etag_matches(if_none_match, etag)
+            if modified:
+                # Очень короткий TTL для чата; после его истечения выборку
+                # повторяет один запрос, а остальные опрашивающие клиенты ждут его.
+                # Ключ включает поколение кэша, которое меняет новое сообщение
+                key = await cache_key(f"messages:{room_id}", after_id, before_id, skip, limit, include_total)
+                result = await cache_get_or_set(key, load_messages, ttl=2)
+                if result["messages"]:
+                    break
+            
+            # Новых сообщений нет: длинный опрос ждет их, не занимая
+            # соединение с БД
+            if events is None:
+                break
+            await db.close()
+            if not await wait_for_message(events, deadline):
+                break
     
-    # Сохранение в кэш (очень короткий TTL для чата)
-    cache_set(cache_key, {
-        "messages": [m.model_dump() for m in result.messages],
-        "total": total
-    }, ttl=2)  # 2 секунды для чата
+    if not modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=room_versions.cache_headers(etag))
     
-    return result
+    # Кэшированная страница уже проверена схемой: ответ без повторного
+    # создания моделей и валидации response_model
+    return ORJSONResponse(result, headers=room_versions.cache_headers(etag) if etag is not None else None)
@@ -4,20 +4,27 @@ API endpoints для управления комнатами видеоконф
 
 import logging
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from redis.exceptions import RedisError
 
 from app.db.database import get_db
-from app.db.redis import cache_get, cache_set, cache_delete, cache_delete_pattern
+from app.db.redis import cache_get_or_set, cache_key, cache_invalidate_namespace
 from app.models.room import Room
-from app.models.participant import RoomParticipant, ParticipantStatus
+from app.models.participant import ParticipantStatus
 from app.schemas.room import (
-    RoomCreate, RoomResponse, RoomDetail, 
+    RoomCreate, RoomResponse, RoomDetail, HeartbeatResponse,
     JoinRoomResponse, LeaveRoomResponse, ParticipantResponse
 )
 from app.api.deps import get_current_user, CurrentUser
 from app.core.config import settings
+from app.services import presence, room_versions
+from app.services.room_access import get_room_access, store_room_access
+from app.services.events import (
+    publish_room_event, EVENT_PARTICIPANT_JOINED, EVENT_PARTICIPANT_LEFT, EVENT_ROOM_CLOSED
+)
 
 # Настройка логгера
 logger = logging.getLogger(__name__)
@@ -26,10 +33,19 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/rooms", tags=["rooms"])
 
 
+def presence_unavailable(error: Exception) -> HTTPException:
+    """Ошибка изменения состава комнаты при недоступном Redis"""
+    logger.error(f"Ошибка Redis при изменении состава комнаты: {error}")
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Сервис временно недоступен"
+    )
+
+
 @router.post("", response_model=RoomResponse, status_code=status.HTTP_201_CREATED)
-def create_room(
+async def create_room(
     room_data: RoomCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: CurrentUser = Depends(get_current_user)
 ):
     """
@@ -52,11 +68,12 @@ def create_room(
     )
     
     db.add(new_room)
-    db.commit()
-    db.refresh(new_room)
+    await db.commit()
+    await db.refresh(new_room)
     
     # Инвалидация кэша списка комнат
-    cache_delete_pattern("rooms:*")
+    await cache_invalidate_namespace("rooms")
+    await store_room_access(new_room.id, new_room.owner_id, is_active=True)
     
     logger.info(f"Комната создана: ID={new_room.id}")
     
@@ -71,11 +88,11 @@ def create_room(
 
 
 @router.get("", response_model=List[RoomResponse])
-def get_rooms(
+async def get_rooms(
     skip: int = Query(0, ge=0, description="Пропустить записей"),
     limit: int = Query(20, ge=1, le=100, description="Количество записей"),
     only_active: bool = Query(True, description="Только активные комнаты"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: CurrentUser = Depends(get_current_user)
 ):
     """
@@ -91,63 +108,89 @@ def get_rooms(
     Returns:
         Список комнат
     """
-    cache_key = f"rooms:list:{skip}:{limit}:{only_active}"
-    
-    # Проверка кэша
-    cached_rooms = cache_get(cache_key)
-    if cached_rooms:
-        logger.debug("Список комнат получен из кэша")
-        return [RoomResponse(**room) for room in cached_rooms]
-    
-    # Запрос к БД
-    query = db.query(Room)
-    
-    if only_active:
-        query = query.filter(Room.is_active == True)
-    
-    rooms = query.order_by(Room.created_at.desc()).offset(skip).limit(limit).all()
-    
-    # Формирование ответа с подсчетом участников
-    result = []
-    for room in rooms:
-        participants_count = db.query(func.count(RoomParticipant.id)).filter(
-            RoomParticipant.room_id == room.id,
-            RoomParticipant.status != ParticipantStatus.OFFLINE.value
-        ).scalar()
+    async def load_rooms() -> List[dict]:
+        # Запрос к БД
+        query = select(Room)
+        
+        if only_active:
+            query = query.where(Room.is_active == True)
+        
+        query = query.order_by(Room.created_at.desc()).offset(skip).limit(limit)
+        rooms = (await db.scalars(query)).all()
         
-        result.append(RoomResponse(
-            id=room.id,
-            name=room.name,
-            owner_id=room.owner_id,
-            is_active=room.is_active,
-            created_at=room.created_at,
-            participants_count=participants_count
-        ))
-    
-    # Сохранение в кэш
-    cache_set(cache_key, [r.model_dump() for r in result], ttl=settings.CACHE_TTL_SECONDS)
-    
-    return result
+        return [
+            RoomResponse(
+                id=room.id,
+                name=room.name,
+                owner_id=room.owner_id,
+                is_active=room.is_active,
+                created_at=room.created_at
+            ).model_dump()
+            for room in rooms
+        ]
+    
+    # При промахе кэша список пересчитывает только один запрос,
+    # остальные получают его результат
+    key = await cache_key("rooms", "list", skip, limit, only_active)
+    rooms = await cache_get_or_set(key, load_rooms, ttl=settings.CACHE_TTL_SECONDS)
+    
+    # Количество участников меняется часто, поэтому не кэшируется
+    # вместе со списком, а читается из присутствия в Redis
+    try:
+        counts = await presence.count_participants([room["id"] for room in rooms])
+    except RedisError as e:
+        logger.error(f"Ошибка чтения присутствия участников: {e}")
+        counts = {}
+    
+    return [
+        RoomResponse(**{**room, "participants_count": counts.get(room["id"], 0)})
+        for room in rooms
+    ]
 
 
 @router.get("/{room_id}", response_model=RoomDetail)
-def get_room(
+async def get_room(
     room_id: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
     current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Получение детальной информации о комнате.
     
+    Ответ содержит ETag версии комнаты. Если он совпадает с
+    If-None-Match, возвращается 304 без тела и без запросов к БД:
+    существование комнаты проверяется по снимку в Redis.
+    
     Args:
         room_id: ID комнаты
+        response: Ответ (заголовки ETag и Cache-Control)
+        if_none_match: ETag ранее полученного ответа
         db: Сессия базы данных
         current_user: Текущий авторизованный пользователь
     
     Returns:
         Детальная информация о комнате с участниками
     """
-    room = db.query(Room).filter(Room.id == room_id).first()
+    access = await get_room_access(db, room_id)
+    
+    if access is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Комната не найдена"
+        )
+    
+    # Версия читается до загрузки данных: изменение во время загрузки
+    # меняет версию, и следующий запрос получит данные заново
+    version = await room_versions.get_version(room_id, room_versions.VERSION_ROOM)
+    if version is not None:
+        etag = room_versions.make_etag(room_id, room_versions.VERSION_ROOM, version)
+        if room_versions.etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=room_versions.cache_headers(etag))
+        response.headers.update(room_versions.cache_headers(etag))
+    
+    room = await db.get(Room, room_id)
     
     if not room:
         raise HTTPException(
@@ -155,11 +198,12 @@ def get_room(
             detail="Комната не найдена"
         )
     
-    # Получение активных участников
-    participants = db.query(RoomParticipant).filter(
-        RoomParticipant.room_id == room_id,
-        RoomParticipant.status != ParticipantStatus.OFFLINE.value
-    ).all()
+    # Участники, подтверждающие присутствие heartbeat запросами
+    try:
+        participants = await presence.get_participants(room_id)
+    except RedisError as e:
+        logger.error(f"Ошибка чтения присутствия участников комнаты {room_id}: {e}")
+        participants = []
     
     return RoomDetail(
         id=room.id,
@@ -169,21 +213,20 @@ def get_room(
         created_at=room.created_at,
         participants_count=len(participants),
         participants=[ParticipantResponse(
-            id=p.id,
+            id=p.user_id,
             user_id=p.user_id,
             user_display_name=p.user_display_name,
             status=p.status,
             is_owner=(p.user_id == room.owner_id),
-            join_time=p.join_time,
-            leave_time=p.leave_time
+            join_time=p.join_time
         ) for p in participants]
     )
 
 
 @router.post("/{room_id}/join", response_model=JoinRoomResponse)
-def join_room(
+async def join_room(
     room_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: CurrentUser = Depends(get_current_user)
 ):
     """
@@ -200,67 +243,79 @@ def join_room(
     logger.info(f"Пользователь {current_user.user_id} присоединяется к комнате {room_id}")
     
     # Проверка существования комнаты
-    room = db.query(Room).filter(Room.id == room_id, Room.is_active == True).first()
-    if not room:
+    access = await get_room_access(db, room_id)
+    if access is None or not access.is_active:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Комната не найдена или неактивна"
         )
     
-    # Проверка, не присоединен ли уже пользователь
-    existing_participant = db.query(RoomParticipant).filter(
-        RoomParticipant.room_id == room_id,
-        RoomParticipant.user_id == current_user.user_id,
-        RoomParticipant.status != ParticipantStatus.OFFLINE.value
-    ).first()
-    
-    if existing_participant:
-        # Обновляем статус на in_call
-        existing_participant.status = ParticipantStatus.IN_CALL.value
-        db.commit()
-        
-        return JoinRoomResponse(
-            message="Вы уже в комнате",
-            participant_id=existing_participant.id,
-            room_id=room_id
-        )
-    
-    # Создание записи участника
-    participant = RoomParticipant(
-        room_id=room_id,
-        user_id=current_user.user_id,
-        user_display_name=current_user.display_name or current_user.email,
-        status=ParticipantStatus.IN_CALL.value
-    )
-    
-    db.add(participant)
-    db.commit()
-    db.refresh(participant)
+    display_name = current_user.display_name or current_user.email
+    try:
+        joined = await presence.join(room_id, current_user.user_id, display_name)
+    except RedisError as e:
+        raise presence_unavailable(e)
     
-    # Инвалидация кэша
-    cache_delete_pattern(f"rooms:*")
+    await publish_room_event(room_id, EVENT_PARTICIPANT_JOINED, {
+        "user_id": current_user.user_id,
+        "user_display_name": display_name,
+        "status": ParticipantStatus.IN_CALL.value
+    })
     
-    logger.info(f"Пользователь {current_user.user_id} присоединился к комнате {room_id}")
+    if joined:
+        logger.info(f"Пользователь {current_user.user_id} присоединился к комнате {room_id}")
     
     return JoinRoomResponse(
-        message="Вы успешно присоединились к комнате",
-        participant_id=participant.id,
-        room_id=room_id
+        message="Вы успешно присоединились к комнате" if joined else "Вы уже в комнате",
+        participant_id=current_user.user_id,
+        room_id=room_id,
+        heartbeat_interval=settings.PRESENCE_HEARTBEAT_SECONDS
     )
 
 
+@router.post("/{room_id}/heartbeat", response_model=HeartbeatResponse)
+async def heartbeat(
+    room_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Подтверждение присутствия участника в комнате.
+    Участник без heartbeat дольше PRESENCE_TIMEOUT_SECONDS
+    удаляется из комнаты.
+    
+    Args:
+        room_id: ID комнаты
+        db: Сессия базы данных
+        current_user: Текущий авторизованный пользователь
+    
+    Returns:
+        Статус присутствия
+    """
+    try:
+        if await presence.heartbeat(room_id, current_user.user_id):
+            return HeartbeatResponse(status="ok")
+    except RedisError as e:
+        raise presence_unavailable(e)
+    
+    # Участник удален по таймауту (например, после сна устройства) -
+    # возвращаем его в комнату, если она еще открыта
+    await join_room(room_id, db=db, current_user=current_user)
+    return HeartbeatResponse(status="rejoined")
+
+
 @router.post("/{room_id}/leave", response_model=LeaveRoomResponse)
-def leave_room(
+async def leave_room(
     room_id: int,
-    db: Session = Depends(get_db),
     current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Выход из комнаты видеоконференции.
+    Состав комнаты меняется в Redis, история выхода
+    записывается в БД в фоне.
     
     Args:
         room_id: ID комнаты
-        db: Сессия базы данных
         current_user: Текущий авторизованный пользователь
     
     Returns:
@@ -268,12 +323,10 @@ def leave_room(
     """
     logger.info(f"Пользователь {current_user.user_id} выходит из комнаты {room_id}")
     
-    # Поиск участника
-    participant = db.query(RoomParticipant).filter(
-        RoomParticipant.room_id == room_id,
-        RoomParticipant.user_id == current_user.user_id,
-        RoomParticipant.status != ParticipantStatus.OFFLINE.value
-    ).first()
+    try:
+        participant = await presence.leave(room_id, current_user.user_id)
+    except RedisError as e:
+        raise presence_unavailable(e)
     
     if not participant:
         raise HTTPException(
@@ -281,14 +334,10 @@ def leave_room(
             detail="Вы не находитесь в этой комнате"
         )
     
-    # Обновление статуса
-    from datetime import datetime
-    participant.status = ParticipantStatus.OFFLINE.value
-    participant.leave_time = datetime.utcnow()
-    db.commit()
-    
-    # Инвалидация кэша
-    cache_delete_pattern(f"rooms:*")
+    await publish_room_event(room_id, EVENT_PARTICIPANT_LEFT, {
+        "user_id": current_user.user_id,
+        "user_display_name": participant.user_display_name
+    })
     
     logger.info(f"Пользователь {current_user.user_id} вышел из комнаты {room_id}")
     
@@ -296,9 +345,9 @@ def leave_room(
 
 
 @router.delete("/{room_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_room(
+async def delete_room(
     room_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: CurrentUser = Depends(get_current_user)
 ):
     """
@@ -310,7 +359,7 @@ def delete_room(
         db: Сессия базы данных
         current_user: Текущий авторизованный пользователь
     """
-    room = db.query(Room).filter(Room.id == room_id).first()
+    room = await db.get(Room, room_id)
     
     if not room:
         raise HTTPException(
@@ -325,9 +374,17 @@ def delete_room(
         )
     
     room.is_active = False
-    db.commit()
+    await db.commit()
     
     # Инвалидация кэша
-    cache_delete_pattern(f"rooms:*")
+    await cache_invalidate_namespace("rooms")
+    await store_room_access(room_id, room.owner_id, is_active=False)
+    
+    try:
+        await presence.clear_room(room_id)
+    except RedisError as e:
+        logger.error(f"Ошибка очистки присутствия комнаты {room_id}: {e}")
+    
+    await publish_room_event(room_id, EVENT_ROOM_CLOSED, {"room_id": room_id})
     
     logger.info(f"Комната {room_id} деактивирована пользователем {current_user.user_id}")
@@ -4,7 +4,7 @@
 """
 
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -20,24 +20,75 @@ class Settings(BaseSettings):
     POSTGRES_USER: str = "cloudmeet"
     POSTGRES_PASSWORD: str = "cloudmeet_secret"
     POSTGRES_DB: str = "cloudmeet_conference"
+    DB_POOL_SIZE: int = 10  # Постоянные соединения пула
+    DB_MAX_OVERFLOW: int = 20  # Дополнительные соединения при пиковой нагрузке
     
     # Redis для кэширования
     REDIS_HOST: str = "redis"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
     
-    # JWT настройки (для валидации токенов)
-    JWT_SECRET_KEY: str = "super-secret-key-change-in-production"
-    JWT_ALGORITHM: str = "HS256"
+    # JWT настройки (токены проверяются открытыми ключами auth-service)
+    JWKS_URL: str = "http://auth-service:8000/.well-known/jwks.json"
+    JWKS_REFRESH_SECONDS: int = 300  # Плановое обновление ключей
+    JWKS_MIN_REFRESH_SECONDS: int = 10  # Минимальный интервал внеочередного обновления
+    JWT_ALGORITHM: str = "RS256"
+    JWT_SECRET_KEY: str = "super-secret-key-change-in-production"  # Для устаревших токенов HS256
+    JWT_ACCEPT_HS256: bool = False  # Только на время перехода на RS256: принимать ранее выданные токены HS256
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000  # Кэш проверенных токенов (0 - отключен)
+    
+    # Заголовки X-User-*, подписанные gateway (общий секрет)
+    INTERNAL_AUTH_SECRET: str = "internal-secret-change-in-production"
+    IDENTITY_MAX_AGE_SECONDS: int = 60  # Срок действия подписи заголовков
     
     # Настройки кэширования
     CACHE_TTL_SECONDS: int = 300  # 5 минут
+    CACHE_STALE_TTL_SECONDS: int = 0  # Сколько отдавать устаревшее значение на время пересчета (0 - не отдавать)
+    CACHE_LOCK_TIMEOUT_SECONDS: float = 5.0  # Блокировка пересчета ключа и максимальное ожидание результата
+    L1_CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # Размер локального кэша процесса (0 - отключен)
+    L1_CACHE_TTL_SECONDS: float = 30.0  # Максимальное время жизни записи в локальном кэше
+    
+    # События комнат в реальном времени
+    EVENTS_QUEUE_SIZE: int = 100  # Буфер событий на одного подписчика
+    EVENTS_HISTORY_SIZE: int = 1000  # Событий в истории комнаты для возобновления SSE
+    EVENTS_HISTORY_TTL_SECONDS: int = 86400  # Время жизни истории неактивной комнаты
+    SSE_KEEPALIVE_SECONDS: int = 15  # Интервал keep-alive комментариев в SSE
+    
+    # Присутствие участников (Redis) и история входов/выходов (PostgreSQL)
+    PRESENCE_HEARTBEAT_SECONDS: int = 15  # Интервал heartbeat клиента
+    PRESENCE_TIMEOUT_SECONDS: int = 45  # Участник без heartbeat дольше считается ушедшим
+    PRESENCE_REAP_INTERVAL_SECONDS: int = 10  # Период удаления участников без heartbeat
+    PRESENCE_RECONCILE_INTERVAL_SECONDS: int = 300  # Период сверки счетчиков участников
+    PRESENCE_HISTORY_QUEUE_SIZE: int = 10000  # Буфер событий истории до записи в БД
+    
+    # Снимок комнаты (активность и владелец) для проверок доступа к сообщениям
+    ROOM_ACCESS_TTL_SECONDS: int = 3600  # Время жизни снимка существующей комнаты
+    ROOM_ACCESS_MISSING_TTL_SECONDS: int = 30  # Время жизни отметки о несуществующей комнате
+    ROOM_VERSION_TTL_SECONDS: int = 86400  # Время жизни версий неактивной комнаты (ETag ответов)
+    
+    # Длинный опрос сообщений (GET /messages?after_id=...&wait=...)
+    MESSAGES_WAIT_MAX_SECONDS: int = 30  # Максимальное ожидание нового сообщения
+    
+    # Запись сообщений чата: direct - INSERT и commit на каждое сообщение,
+    # buffered - через Redis Stream с пакетной записью в БД
+    MESSAGE_INGEST_MODE: Literal["direct", "buffered"] = "direct"
+    MESSAGE_FLUSH_BATCH_SIZE: int = 500  # Максимум сообщений в одном INSERT
+    MESSAGE_FLUSH_INTERVAL_MS: int = 50  # Максимальное ожидание заполнения пачки
+    MESSAGE_INGEST_MAX_BACKLOG: int = 100000  # Незаписанных сообщений, после которых отправка получает 503
+    MESSAGE_CLAIM_IDLE_SECONDS: int = 30  # Через сколько сообщения упавшей реплики забирает другая
+    
+    # Распределенная трассировка (OpenTelemetry)
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATIO: float = 0.01  # Доля записываемых трасс, начатых в этом сервисе
+    TRACING_EXPORTER: Literal["file", "otlp"] = "file"  # file - JSON Lines, otlp - OTLP/HTTP коллектор
+    TRACING_FILE_PATH: str = "traces/conference-service.jsonl"
+    TRACING_OTLP_ENDPOINT: str = "http://otel-collector:4318/v1/traces"
     
     @property
     def DATABASE_URL(self) -> str:
         """Формирование строки подключения к БД"""
         return (
-            f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
+            f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
             f"@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
         )
     
@@ -0,0 +1,128 @@
+"""
+Метрики Prometheus для Conference Service.
+"""
+
+from typing import Callable, Dict
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+# Обращения к кэшу по уровням: l1 (память процесса) и redis
+CACHE_REQUESTS = Counter(
+    "conference_cache_requests_total",
+    "Обращения к кэшу по уровню и результату (hit/miss/error)",
+    ["layer", "result"]
+)
+
+# Заполненность локального кэша
+LOCAL_CACHE_BYTES = Gauge(
+    "conference_cache_l1_bytes",
+    "Оценка размера локального кэша в байтах"
+)
+
+LOCAL_CACHE_ENTRIES = Gauge(
+    "conference_cache_l1_entries",
+    "Количество записей в локальном кэше"
+)
+
+# Проверки JWT через кэш проверенных токенов
+TOKEN_CACHE_REQUESTS = Counter(
+    "conference_token_cache_requests_total",
+    "Проверки JWT токенов по результату обращения к кэшу (hit/miss)",
+    ["result"]
+)
+
+# Присутствие участников
+PRESENCE_REAPED = Counter(
+    "conference_presence_reaped_total",
+    "Участники, удаленные из комнат из-за отсутствия heartbeat"
+)
+
+PRESENCE_HISTORY_QUEUE_DEPTH = Gauge(
+    "conference_presence_history_queue_depth",
+    "События входа и выхода, ожидающие записи в БД"
+)
+
+PRESENCE_COUNTER_DRIFT = Counter(
+    "conference_presence_counter_drift_total",
+    "Суммарное расхождение счетчиков участников, исправленное сверкой"
+)
+
+# Буферизованная запись сообщений
+MESSAGE_INGEST_FLUSHED = Counter(
+    "conference_message_ingest_flushed_total",
+    "Сообщения, записанные в БД из буфера"
+)
+
+MESSAGE_INGEST_BACKLOG = Gauge(
+    "conference_message_ingest_backlog",
+    "Сообщения в буфере, ожидающие записи в БД"
+)
+
+# HTTP запросы к сервису: время до отправки заголовков ответа по
+# шаблону маршрута (SSE и потоковые ответы не растягивают гистограмму)
+HTTP_REQUEST_DURATION = Histogram(
+    "conference_http_request_duration_seconds",
+    "Время обработки HTTP запроса по маршруту",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "conference_http_requests_in_flight",
+    "HTTP запросы в процессе обработки"
+)
+
+# Пул соединений SQLAlchemy
+DB_POOL_CHECKOUT_DURATION = Histogram(
+    "conference_db_pool_checkout_seconds",
+    "Время получения соединения из пула, включая ожидание и открытие нового",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+
+DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+    "conference_db_pool_checkout_timeouts_total",
+    "Запросы, не дождавшиеся свободного соединения в пуле"
+)
+
+# SQL запросы по HTTP запросу, в котором они выполнены
+# (route="background" - фоновые задачи вне запросов)
+DB_QUERIES = Counter(
+    "conference_db_queries_total",
+    "SQL запросы по методу и шаблону маршрута HTTP запроса",
+    ["method", "route"]
+)
+
+
+class DatabasePoolCollector:
+    """
+    Коллектор состояния пула соединений с БД.
+    Значения снимаются в момент запроса /metrics.
+    """
+    
+    def __init__(self, stats_provider: Callable[[], Dict[str, int]]):
+        self._stats_provider = stats_provider
+    
+    def collect(self):
+        connections = GaugeMetricFamily(
+            "conference_db_pool_connections",
+            "Соединения пула по состоянию (checked_out/idle)",
+            labels=["state"]
+        )
+        overflow = GaugeMetricFamily(
+            "conference_db_pool_overflow",
+            "Соединения сверх постоянного размера пула"
+        )
+        size = GaugeMetricFamily(
+            "conference_db_pool_size",
+            "Постоянный размер пула"
+        )
+        
+        stats = self._stats_provider()
+        connections.add_metric(["checked_out"], stats["checked_out"])
+        connections.add_metric(["idle"], stats["idle"])
+        overflow.add_metric([], stats["overflow"])
+        size.add_metric([], stats["size"])
+        
+        yield connections
+        yield overflow
+        yield size
@@ -1,15 +1,27 @@
 """
-Модуль безопасности - декодирование JWT токенов.
+Модуль безопасности - декодирование JWT токенов
+и проверка подписанных gateway данных пользователя.
 """
 
+import hashlib
+import hmac
+import time
 from typing import Optional
 from jose import JWTError, jwt
 from app.core.config import settings
+from app.core.jwks import jwks_cache
+from app.core.metrics import TOKEN_CACHE_REQUESTS
+from app.core.token_cache import token_cache
+from app.core.tracing import tracer
+
+# Алгоритм устаревших токенов, подписанных общим секретом
+LEGACY_ALGORITHM = "HS256"
 
 
 def decode_token(token: str) -> Optional[dict]:
     """
-    Декодирование JWT токена.
+    Декодирование и проверка JWT токена.
+    Повторная проверка того же токена берется из кэша до его истечения.
     
     Args:
         token: JWT токен
@@ -17,12 +29,71 @@ def decode_token(token: str) -> Optional[dict]:
     Returns:
         Декодированные данные или None при ошибке
     """
+    payload = token_cache.get(token)
+    if payload is not None:
+        TOKEN_CACHE_REQUESTS.labels("hit").inc()
+        return payload
+    
+    TOKEN_CACHE_REQUESTS.labels("miss").inc()
+    with tracer.start_as_current_span("jwt.verify"):
+        payload = verify_token(token)
+    if payload is not None:
+        token_cache.set(token, payload)
+    return payload
+
+
+def verify_token(token: str) -> Optional[dict]:
+    """
+    Проверка подписи и срока JWT токена.
+    Ключ выбирается по kid из кэша JWKS, без сетевых запросов.
+    """
     try:
+        header = jwt.get_unverified_header(token)
+        
+        # Алгоритм проверки выбирается явно: открытый ключ
+        # никогда не используется как HMAC секрет
+        if header.get("alg") == LEGACY_ALGORITHM:
+            if not settings.JWT_ACCEPT_HS256:
+                return None
+            return jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[LEGACY_ALGORITHM])
+        
+        key = jwks_cache.get_key(header.get("kid"))
+        if key is None:
+            return None
+        
         payload = jwt.decode(
             token, 
-            settings.JWT_SECRET_KEY, 
+            key, 
             algorithms=[settings.JWT_ALGORITHM]
         )
         return payload
     except JWTError:
         return None
+
+
+def verify_identity_signature(values: str, timestamp: str, signature: str) -> bool:
+    """
+    Проверка подписи заголовков X-User-*, выставленных gateway.
+    
+    Args:
+        values: Значения заголовков в порядке подписи, через перевод строки
+        timestamp: Метка времени подписи (X-User-Timestamp)
+        signature: Подпись (X-User-Signature)
+    
+    Returns:
+        True если подпись верна и не устарела
+    """
+    try:
+        age = time.time() - int(timestamp)
+    except (TypeError, ValueError):
+        return False
+    
+    if abs(age) > settings.IDENTITY_MAX_AGE_SECONDS:
+        return False
+    
+    expected = hmac.new(
+        settings.INTERNAL_AUTH_SECRET.encode(),
+        values.encode(),
+        hashlib.sha256
+    ).hexdigest()
+    return hmac.compare_digest(expected, signature)
@@ -0,0 +1,80 @@
+"""
+Кэш проверенных JWT токенов.
+
+Клиент опрашивает API каждые несколько секунд с одним и тем же
+токеном, поэтому проверка подписи повторяется тысячи раз в час.
+Результат проверки хранится до истечения срока токена (exp) в
+ограниченном LRU кэше. Ключ записи - SHA-256 токена, сам токен в
+памяти не хранится.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+
+
+def token_digest(token: str) -> bytes:
+    """Ключ записи кэша для токена"""
+    return hashlib.sha256(token.encode()).digest()
+
+
+class TokenCache:
+    """LRU кэш декодированных данных токенов со сроком жизни до exp"""
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, tuple[float, dict]]" = OrderedDict()
+        # Зависимости FastAPI выполняются в пуле потоков
+        self._lock = threading.Lock()
+    
+    def get(self, token: str) -> Optional[dict]:
+        """Данные проверенного токена или None, если токена нет или он истек"""
+        if self.max_entries <= 0:
+            return None
+        
+        digest = token_digest(token)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            
+            expires_at, payload = entry
+            if expires_at <= time.time():
+                del self._entries[digest]
+                return None
+            
+            self._entries.move_to_end(digest)
+            return payload
+    
+    def set(self, token: str, payload: dict) -> None:
+        """Сохранение данных проверенного токена до его истечения"""
+        expires_at = payload.get("exp")
+        # Токен без срока действия не кэшируется: отозвать его можно
+        # только сменой ключа, и кэш не должен это откладывать
+        if self.max_entries <= 0 or not isinstance(expires_at, (int, float)):
+            return
+        if expires_at <= time.time():
+            return
+        
+        digest = token_digest(token)
+        with self._lock:
+            self._entries[digest] = (float(expires_at), payload)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Очистка кэша (например, при отзыве ключа подписи)"""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Глобальный кэш процесса
+token_cache = TokenCache(max_entries=settings.TOKEN_CACHE_MAX_ENTRIES)
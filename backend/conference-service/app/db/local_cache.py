@@ -0,0 +1,129 @@
+"""
+Локальный (in-process) кэш первого уровня перед Redis.
+
+LRU-кэш с TTL записей и ограничением суммарного размера в байтах.
+Значения хранятся уже десериализованными, поэтому попадание в L1
+не требует ни сетевого запроса, ни json.loads. Возвращаемые объекты
+общие для всех запросов и не должны изменяться вызывающим кодом.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+# Оценка накладных расходов на одну запись (ключ, кортеж, узел словаря)
+ENTRY_OVERHEAD_BYTES = 200
+
+
+class LocalCache:
+    """
+    Потокобезопасный LRU/TTL кэш с ограничением размера в байтах.
+    
+    Операции выполняются под блокировкой, поэтому кэш можно
+    использовать и из кода, работающего в пуле потоков.
+    """
+    
+    def __init__(self, max_bytes: int, default_ttl: float):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any, int]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        # Счетчик удалений: запись, прочитанная из Redis до инвалидации,
+        # не должна попасть в L1 после нее
+        self._generation = 0
+    
+    @property
+    def generation(self) -> int:
+        """Номер поколения, меняется при каждом удалении или очистке"""
+        return self._generation
+    
+    @property
+    def size(self) -> int:
+        """Текущий размер кэша в байтах (оценка)"""
+        return self._size
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Получение значения.
+        
+        Returns:
+            Кортеж (найдено, значение)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            
+            expires_at, value, size = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return False, None
+            
+            self._entries.move_to_end(key)
+            return True, value
+    
+    def set(
+        self,
+        key: str,
+        value: Any,
+        size: int,
+        ttl: Optional[float] = None,
+        generation: Optional[int] = None
+    ) -> bool:
+        """
+        Сохранение значения с вытеснением давно не использованных записей.
+        
+        Args:
+            key: Ключ
+            value: Значение (не изменяется после сохранения)
+            size: Размер сериализованного значения в байтах
+            ttl: Время жизни в секундах (по умолчанию default_ttl)
+            generation: Поколение, при котором значение было прочитано;
+                если с тех пор были удаления, значение не сохраняется
+        
+        Returns:
+            True если значение сохранено
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        size += ENTRY_OVERHEAD_BYTES
+        if ttl <= 0 or size > self.max_bytes:
+            return False
+        
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            
+            if key in self._entries:
+                self._remove(key)
+            
+            self._entries[key] = (time.monotonic() + ttl, value, size)
+            self._size += size
+            
+            while self._size > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+            return True
+    
+    def delete(self, key: str) -> None:
+        """Удаление значения"""
+        with self._lock:
+            self._generation += 1
+            if key in self._entries:
+                self._remove(key)
+    
+    def clear(self) -> None:
+        """Полная очистка кэша"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._size = 0
+    
+    def _remove(self, key: str) -> None:
+        """Удаление записи (вызывается под блокировкой)"""
+        _, _, size = self._entries.pop(key)
+        self._size -= size
@@ -0,0 +1,76 @@
+"""
+Применение миграций Alembic при старте сервиса.
+
+Схема БД описывается миграциями в каталоге migrations/, create_tables
+больше не вызывается. Базы, созданные раньше через create_tables,
+помечаются исходной ревизией (BASELINE_REVISION) и дальше обновляются
+обычным образом. Несколько реплик, стартующих одновременно, применяют
+миграции по очереди под advisory lock PostgreSQL.
+
+Индексы строятся CREATE INDEX CONCURRENTLY, который ждет завершения
+всех транзакций, начавшихся раньше. Поэтому реплики ждут блокировку
+короткими попытками pg_try_advisory_lock, а не в pg_advisory_lock:
+ожидающий запрос держал бы снимок и заблокировал построение индекса.
+"""
+
+import asyncio
+import logging
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+from app.db.database import engine
+
+logger = logging.getLogger(__name__)
+
+# Конфигурация Alembic в корне сервиса
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+# Ревизия, соответствующая схеме create_tables
+BASELINE_REVISION = "0001"
+
+# Ключ advisory lock на время применения миграций
+MIGRATION_LOCK_KEY = 72017
+
+# Пауза между попытками взять блокировку миграций
+MIGRATION_LOCK_POLL_SECONDS = 1.0
+
+
+def _upgrade(connection: Connection) -> None:
+    """Обновление схемы до последней ревизии на открытом соединении"""
+    config = Config(str(ALEMBIC_INI))
+    config.attributes["connection"] = connection
+    
+    inspector = inspect(connection)
+    legacy_schema = inspector.has_table("rooms") and not inspector.has_table("alembic_version")
+    # Alembic управляет транзакциями сам: миграции с CONCURRENTLY
+    # выполняются вне транзакции
+    connection.commit()
+    
+    if legacy_schema:
+        logger.info(f"Схема создана без миграций, отмечается ревизия {BASELINE_REVISION}")
+        command.stamp(config, BASELINE_REVISION)
+    
+    command.upgrade(config, "head")
+
+
+async def run_migrations() -> None:
+    """Применение недостающих миграций"""
+    async with engine.connect() as conn:
+        use_lock = conn.dialect.name == "postgresql"
+        if use_lock:
+            while not await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY}):
+                await conn.commit()
+                await asyncio.sleep(MIGRATION_LOCK_POLL_SECONDS)
+            await conn.commit()
+        
+        try:
+            await conn.run_sync(_upgrade)
+            await conn.commit()
+        finally:
+            if use_lock:
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+                await conn.commit()
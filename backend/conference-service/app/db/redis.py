@@ -1,43 +1,142 @@
 """
-Клиент Redis для кэширования данных.
+Асинхронный клиент Redis для кэширования данных.
+
+Связанные ключи кэша объединяются в пространства имен (например, "rooms"
+или "messages:{room_id}"). Каждое пространство имеет счетчик поколения,
+который входит в ключи кэша. Инвалидация пространства - один INCR
+счетчика: ключи старого поколения больше не читаются и удаляются по TTL.
+
+Перед Redis стоит локальный кэш процесса (L1). Значения в версионных
+ключах не меняются, поэтому согласованность L1 нужна только для
+счетчиков поколений: их изменения рассылаются репликам через
+pub/sub канал CACHE_INVALIDATION_CHANNEL.
 """
 
+import asyncio
 import json
 import logging
-from typing import Optional, Any
-import redis
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+import redis.asyncio as aioredis
 from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS, LOCAL_CACHE_BYTES, LOCAL_CACHE_ENTRIES
+from app.db.local_cache import LocalCache
 
 logger = logging.getLogger(__name__)
 
 # Глобальный клиент Redis
-redis_client: Optional[redis.Redis] = None
+redis_client: Optional[aioredis.Redis] = None
+
+# Ключ счетчика поколения пространства имен кэша
+NAMESPACE_VERSION_KEY = "cache:ns:{namespace}:version"
+
+# Канал рассылки инвалидаций L1 (сообщение - удаляемый ключ)
+CACHE_INVALIDATION_CHANNEL = "cache:invalidate"
+INVALIDATION_RECONNECT_DELAY_SECONDS = 1.0
+
+# Локальный кэш процесса перед Redis
+local_cache = LocalCache(
+    max_bytes=settings.L1_CACHE_MAX_BYTES,
+    default_ttl=settings.L1_CACHE_TTL_SECONDS
+)
+LOCAL_CACHE_BYTES.set_function(lambda: local_cache.size)
+LOCAL_CACHE_ENTRIES.set_function(lambda: len(local_cache))
+
+# Блокировка пересчета ключа между репликами
+CACHE_LOCK_KEY = "cache:lock:{key}"
+CACHE_LOCK_POLL_SECONDS = 0.05
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
 
 
-def get_redis_client() -> redis.Redis:
-    """Получение клиента Redis"""
+class _Flight:
+    """Пересчет ключа, результата которого ждут другие запросы процесса"""
+    
+    def __init__(self):
+        self.done = asyncio.Event()
+        self.ok = False
+        self.value: Any = None
+
+
+# Пересчеты ключей, выполняемые в процессе
+_flights: Dict[str, _Flight] = {}
+
+# Фоновая подписка на инвалидации и признак ее активности
+_invalidation_task: Optional[asyncio.Task] = None
+_invalidation_subscribed = False
+
+
+def get_redis_client() -> aioredis.Redis:
+    """
+    Получение клиента Redis.
+    Соединения открываются пулом клиента при первой команде.
+    """
     global redis_client
     
     if redis_client is None:
-        try:
-            redis_client = redis.Redis(
-                host=settings.REDIS_HOST,
-                port=settings.REDIS_PORT,
-                db=settings.REDIS_DB,
-                decode_responses=True
-            )
-            redis_client.ping()
-            logger.info("Подключение к Redis установлено")
-        except redis.ConnectionError as e:
-            logger.error(f"Ошибка подключения к Redis: {e}")
-            raise
+        redis_client = aioredis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            decode_responses=True
+        )
     
     return redis_client
 
 
-def cache_set(key: str, value: Any, ttl: int = None) -> bool:
+async def close_redis_client() -> None:
+    """Закрытие клиента Redis"""
+    global redis_client
+    
+    if redis_client is not None:
+        await redis_client.aclose()
+        redis_client = None
+
+
+async def _read_through(key: str, use_local: bool = True) -> Optional[Any]:
+    """
+    Чтение значения из L1, а при промахе - из Redis с сохранением в L1.
+    TTL записи в L1 не превышает оставшийся TTL ключа в Redis.
+    
+    Args:
+        key: Ключ кэша
+        use_local: False - читать сразу из Redis (обновляя L1)
+    """
+    if use_local:
+        found, value = local_cache.get(key)
+        if found:
+            CACHE_REQUESTS.labels("l1", "hit").inc()
+            return value
+        CACHE_REQUESTS.labels("l1", "miss").inc()
+    
+    generation = local_cache.generation
+    client = get_redis_client()
+    pipe = client.pipeline(transaction=False)
+    pipe.get(key)
+    pipe.pttl(key)
+    raw, pttl = await pipe.execute()
+    
+    if not raw:
+        CACHE_REQUESTS.labels("redis", "miss").inc()
+        return None
+    CACHE_REQUESTS.labels("redis", "hit").inc()
+    
+    value = json.loads(raw)
+    ttl = settings.L1_CACHE_TTL_SECONDS
+    if pttl > 0:
+        ttl = min(ttl, pttl / 1000)
+    local_cache.set(key, value, size=len(raw), ttl=ttl, generation=generation)
+    return value
+
+
+async def cache_set(key: str, value: Any, ttl: int = None) -> bool:
     """
-    Сохранение значения в кэш.
+    Сохранение значения в кэш (Redis и локальный L1).
     
     Args:
         key: Ключ кэша
@@ -51,18 +150,24 @@ def cache_set(key: str, value: Any, ttl: int = None) -> bool:
         client = get_redis_client()
         json_value = json.dumps(value, default=str)
         if ttl:
-            client.setex(key, ttl, json_value)
+            await client.setex(key, ttl, json_value)
         else:
-            client.set(key, json_value)
-        return True
+            await client.set(key, json_value)
     except Exception as e:
         logger.error(f"Ошибка записи в кэш: {e}")
         return False
+    
+    # В L1 кладем то же, что вернет json.loads при чтении из Redis
+    local_ttl = settings.L1_CACHE_TTL_SECONDS
+    if ttl:
+        local_ttl = min(local_ttl, ttl)
+    local_cache.set(key, json.loads(json_value), size=len(json_value), ttl=local_ttl)
+    return True
 
 
-def cache_get(key: str) -> Optional[Any]:
+async def cache_get(key: str) -> Optional[Any]:
     """
-    Получение значения из кэша.
+    Получение значения из кэша: сначала L1, затем Redis.
     
     Args:
         key: Ключ кэша
@@ -71,19 +176,16 @@ def cache_get(key: str) -> Optional[Any]:
         Значение из кэша или None
     """
     try:
-        client = get_redis_client()
-        value = client.get(key)
-        if value:
-            return json.loads(value)
-        return None
+        return await _read_through(key)
     except Exception as e:
+        CACHE_REQUESTS.labels("redis", "error").inc()
         logger.error(f"Ошибка чтения из кэша: {e}")
         return None
 
 
-def cache_delete(key: str) -> bool:
+async def cache_delete(key: str) -> bool:
     """
-    Удаление значения из кэша.
+    Удаление значения из кэша на всех репликах.
     
     Args:
         key: Ключ кэша
@@ -91,31 +193,288 @@ def cache_delete(key: str) -> bool:
     Returns:
         True если успешно
     """
+    local_cache.delete(key)
     try:
         client = get_redis_client()
-        client.delete(key)
+        pipe = client.pipeline(transaction=False)
+        pipe.delete(key)
+        pipe.publish(CACHE_INVALIDATION_CHANNEL, key)
+        await pipe.execute()
         return True
     except Exception as e:
         logger.error(f"Ошибка удаления из кэша: {e}")
         return False
 
 
-def cache_delete_pattern(pattern: str) -> bool:
+def _entry_is_fresh(entry: Any) -> bool:
+    """Проверка логического срока жизни записи cache_get_or_set"""
+    return isinstance(entry, dict) and entry.get("expires_at", 0) > time.time()
+
+
+async def _acquire_lock(key: str) -> Optional[str]:
+    """
+    Захват короткой блокировки пересчета ключа в Redis.
+    
+    Returns:
+        Токен блокировки, None если она занята другой репликой
+    
+    Raises:
+        Исключение клиента Redis при недоступности Redis
+    """
+    token = uuid.uuid4().hex
+    acquired = await get_redis_client().set(
+        CACHE_LOCK_KEY.format(key=key),
+        token,
+        nx=True,
+        px=int(settings.CACHE_LOCK_TIMEOUT_SECONDS * 1000)
+    )
+    return token if acquired else None
+
+
+async def _release_lock(key: str, token: str) -> None:
+    """Освобождение блокировки, если она все еще принадлежит нам"""
+    try:
+        await get_redis_client().eval(RELEASE_LOCK_SCRIPT, 1, CACHE_LOCK_KEY.format(key=key), token)
+    except Exception as e:
+        logger.error(f"Ошибка освобождения блокировки кэша {key}: {e}")
+
+
+async def _wait_for_value(key: str) -> Optional[Any]:
+    """Ожидание значения, которое пересчитывает другая реплика"""
+    deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        await asyncio.sleep(CACHE_LOCK_POLL_SECONDS)
+        entry = await _read_through(key, use_local=False)
+        if _entry_is_fresh(entry):
+            return entry["value"]
+    return None
+
+
+async def _compute(key: str, loader: Callable[[], Awaitable[Any]], ttl: int, stale_ttl: int, stale: Optional[dict]) -> Any:
+    """
+    Пересчет значения ведущим запросом процесса.
+    Между репликами пересчет разделяется блокировкой в Redis.
+    """
+    try:
+        token = await _acquire_lock(key)
+    except Exception as e:
+        logger.error(f"Ошибка захвата блокировки кэша {key}: {e}")
+        return await loader()
+    
+    if token is None:
+        # Ключ пересчитывает другая реплика
+        if stale is not None:
+            return stale["value"]
+        value = await _wait_for_value(key)
+        if value is not None:
+            return value
+        logger.warning(f"Не дождались пересчета ключа кэша {key}")
+        return await loader()
+    
+    try:
+        value = await loader()
+        await cache_set(
+            key,
+            {"value": value, "expires_at": time.time() + ttl},
+            ttl=ttl + stale_ttl
+        )
+        return value
+    finally:
+        await _release_lock(key, token)
+
+
+async def cache_get_or_set(
+    key: str,
+    loader: Callable[[], Awaitable[Any]],
+    ttl: int,
+    stale_ttl: Optional[int] = None
+) -> Any:
+    """
+    Получение значения из кэша с однократным пересчетом при промахе.
+    
+    Пока одна операция пересчитывает ключ, остальные запросы этого
+    процесса ждут ее результата, а запросы других реплик - появления
+    значения в Redis (блокировка CACHE_LOCK_KEY). Если задан stale_ttl,
+    запись хранится дольше своего срока жизни, и на время пересчета
+    ожидающим отдается устаревшее значение. Это работает для истечения
+    TTL; после инвалидации пространства имен ключ меняется, и запросы
+    ждут свежее значение.
+    
+    Args:
+        key: Ключ кэша
+        loader: Корутина получения значения (результат сериализуем в JSON)
+        ttl: Время жизни значения в секундах
+        stale_ttl: Сколько секунд после истечения можно отдавать
+            устаревшее значение (по умолчанию CACHE_STALE_TTL_SECONDS)
+    
+    Returns:
+        Значение из кэша или результат loader
+    """
+    if stale_ttl is None:
+        stale_ttl = settings.CACHE_STALE_TTL_SECONDS
+    
+    entry = await cache_get(key)
+    if _entry_is_fresh(entry):
+        return entry["value"]
+    
+    if entry is not None:
+        # В L1 может лежать копия, уже обновленная в Redis другой репликой
+        try:
+            entry = await _read_through(key, use_local=False)
+        except Exception as e:
+            logger.error(f"Ошибка чтения из кэша: {e}")
+        if _entry_is_fresh(entry):
+            return entry["value"]
+    stale = entry if isinstance(entry, dict) and "value" in entry else None
+    
+    flight = _flights.get(key)
+    if flight is not None:
+        if stale is not None:
+            return stale["value"]
+        try:
+            await asyncio.wait_for(flight.done.wait(), settings.CACHE_LOCK_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        if flight.ok:
+            return flight.value
+        return await loader()
+    
+    flight = _flights[key] = _Flight()
+    try:
+        flight.value = await _compute(key, loader, ttl, stale_ttl, stale)
+        flight.ok = True
+        return flight.value
+    finally:
+        _flights.pop(key, None)
+        flight.done.set()
+
+
+async def cache_namespace_version(namespace: str) -> int:
+    """
+    Текущее поколение пространства имен кэша.
+    
+    Поколение хранится в L1 только пока активна подписка на
+    инвалидации: иначе реплика может пропустить INCR на другой реплике.
+    
+    Args:
+        namespace: Пространство имен (например, "rooms")
+    
+    Returns:
+        Номер поколения (0, если пространство еще не инвалидировалось)
+    """
+    key = NAMESPACE_VERSION_KEY.format(namespace=namespace)
+    found, version = local_cache.get(key)
+    if found:
+        CACHE_REQUESTS.labels("l1", "hit").inc()
+        return version
+    CACHE_REQUESTS.labels("l1", "miss").inc()
+    
+    generation = local_cache.generation
+    try:
+        client = get_redis_client()
+        raw = await client.get(key)
+    except Exception as e:
+        CACHE_REQUESTS.labels("redis", "error").inc()
+        logger.error(f"Ошибка чтения поколения кэша {namespace}: {e}")
+        return 0
+    
+    CACHE_REQUESTS.labels("redis", "hit" if raw else "miss").inc()
+    version = int(raw) if raw else 0
+    if _invalidation_subscribed:
+        local_cache.set(key, version, size=len(key), generation=generation)
+    return version
+
+
+async def cache_key(namespace: str, *parts: Any) -> str:
+    """
+    Формирование ключа кэша в текущем поколении пространства имен.
+    
+    Args:
+        namespace: Пространство имен
+        parts: Части ключа (параметры запроса)
+    
+    Returns:
+        Ключ вида "{namespace}:v{поколение}:{части}"
+    """
+    version = await cache_namespace_version(namespace)
+    return ":".join([namespace, f"v{version}", *(str(part) for part in parts)])
+
+
+async def cache_invalidate_namespace(namespace: str) -> bool:
     """
-    Удаление значений по паттерну ключа.
+    Инвалидация всех ключей пространства имен за O(1).
+    
+    Новое поколение сразу видно в этом процессе, остальные реплики
+    сбрасывают его из L1 по рассылке в CACHE_INVALIDATION_CHANNEL.
     
     Args:
-        pattern: Паттерн ключей (например, "room:*")
+        namespace: Пространство имен
     
     Returns:
         True если успешно
     """
+    key = NAMESPACE_VERSION_KEY.format(namespace=namespace)
+    local_cache.delete(key)
     try:
         client = get_redis_client()
-        keys = client.keys(pattern)
-        if keys:
-            client.delete(*keys)
+        pipe = client.pipeline(transaction=False)
+        pipe.incr(key)
+        pipe.publish(CACHE_INVALIDATION_CHANNEL, key)
+        await pipe.execute()
         return True
     except Exception as e:
-        logger.error(f"Ошибка удаления по паттерну: {e}")
+        logger.error(f"Ошибка инвалидации кэша {namespace}: {e}")
         return False
+
+
+async def _listen_cache_invalidations() -> None:
+    """Удаление из L1 ключей, инвалидированных любой репликой"""
+    global _invalidation_subscribed
+    
+    while True:
+        pubsub = None
+        try:
+            pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+            # Пока подписки не было, рассылки могли быть пропущены
+            local_cache.clear()
+            _invalidation_subscribed = True
+            logger.info("Подписка на инвалидации кэша установлена")
+            
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    local_cache.delete(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка подписки на инвалидации кэша: {e}")
+            await asyncio.sleep(INVALIDATION_RECONNECT_DELAY_SECONDS)
+        finally:
+            _invalidation_subscribed = False
+            local_cache.clear()
+            if pubsub is not None:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+
+def start_cache_invalidation_listener() -> None:
+    """Запуск фоновой подписки на инвалидации кэша"""
+    global _invalidation_task
+    
+    if _invalidation_task is None:
+        _invalidation_task = asyncio.create_task(_listen_cache_invalidations())
+
+
+async def stop_cache_invalidation_listener() -> None:
+    """Остановка фоновой подписки на инвалидации кэша"""
+    global _invalidation_task
+    
+    if _invalidation_task is not None:
+        _invalidation_task.cancel()
+        try:
+            await _invalidation_task
+        except asyncio.CancelledError:
+            pass
+        _invalidation_task = None
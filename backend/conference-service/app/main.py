@@ -5,13 +5,30 @@ FastAPI приложение для управления комнатами ви
 
 import logging
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from prometheus_client import REGISTRY, CONTENT_TYPE_LATEST, generate_latest
 
 from app.core.config import settings
-from app.db.database import create_tables
+from app.core.http_metrics import HTTPMetricsMiddleware
+from app.core.tracing import setup_tracing, shutdown_tracing
+from app.core.metrics import DatabasePoolCollector
+from app.core.jwks import jwks_cache
+from app.db.database import close_engine, engine, get_pool_stats
+from app.db.migrations import run_migrations
 from app.api.rooms import router as rooms_router
 from app.api.messages import router as messages_router
+from app.api.events import router as events_router
+from app.db.redis import (
+    close_redis_client,
+    get_redis_client,
+    start_cache_invalidation_listener,
+    stop_cache_invalidation_listener,
+)
+from app.services.events import broker
+from app.services.presence import start_presence, stop_presence
+from app.services.message_ingest import start_message_ingest, stop_message_ingest
 
 # Настройка логирования
 logging.basicConfig(
@@ -25,28 +42,50 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     """
     Управление жизненным циклом приложения.
-    Создает таблицы БД и подключается к Redis при старте.
+    Применяет миграции БД и подключается к Redis при старте.
     """
     logger.info("Запуск Conference Service...")
     
-    # Создание таблиц при старте
+    # Применение миграций схемы БД
     try:
-        create_tables()
-        logger.info("Таблицы базы данных созданы/проверены")
+        await run_migrations()
+        logger.info("Схема базы данных обновлена")
     except Exception as e:
-        logger.error(f"Ошибка при создании таблиц: {e}")
+        logger.error(f"Ошибка при применении миграций: {e}")
     
     # Проверка подключения к Redis
     try:
-        from app.db.redis import get_redis_client
-        get_redis_client()
+        await get_redis_client().ping()
         logger.info("Подключение к Redis установлено")
     except Exception as e:
         logger.warning(f"Redis недоступен, кэширование отключено: {e}")
     
+    # Ключи проверки токенов auth-service
+    await jwks_cache.start()
+    
+    # Подписка на инвалидации локального кэша
+    start_cache_invalidation_listener()
+    
+    # Подписка на события комнат для WebSocket клиентов
+    await broker.start()
+    
+    # Удаление участников без heartbeat и запись истории входов/выходов
+    await start_presence()
+    
+    # Запись буферизованных сообщений чата в БД
+    await start_message_ingest()
+    
     yield
     
     logger.info("Остановка Conference Service...")
+    await stop_message_ingest()
+    await stop_presence()
+    await broker.stop()
+    await jwks_cache.stop()
+    await stop_cache_invalidation_listener()
+    await close_redis_client()
+    await close_engine()
+    shutdown_tracing()
 
 
 # Создание FastAPI приложения
@@ -54,7 +93,9 @@ app = FastAPI(
     title=settings.APP_NAME,
     description="Сервис управления комнатами видеоконференций CloudMeet Lite",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # Ответы сериализуются orjson вместо json.dumps
+    default_response_class=ORJSONResponse
 )
 
 # Настройка CORS
@@ -66,9 +107,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Метрики HTTP запросов (внешний слой, учитывает и ответы CORS)
+app.add_middleware(HTTPMetricsMiddleware)
+
+# Трассировка запросов, БД и Redis (при TRACING_ENABLED)
+setup_tracing(app, engine)
+
+# Метрики пула соединений с БД
+REGISTRY.register(DatabasePoolCollector(get_pool_stats))
+
 # Подключение роутеров
 app.include_router(rooms_router)
 app.include_router(messages_router)
+app.include_router(events_router)
 
 
 @app.get("/health")
@@ -80,6 +131,12 @@ def health_check():
     return {"status": "healthy", "service": "conference-service"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Метрики в формате Prometheus"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/")
 def root():
     """Корневой endpoint"""
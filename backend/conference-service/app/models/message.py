@@ -2,7 +2,7 @@
 ORM модель сообщения чата в комнате.
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.database import Base
@@ -22,9 +22,13 @@ class Message(Base):
     """
     
     __tablename__ = "messages"
+    __table_args__ = (
+        # Курсорная пагинация: WHERE room_id = ? AND id > ? ORDER BY id
+        Index("ix_messages_room_id_id", "room_id", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    room_id = Column(Integer, ForeignKey("rooms.id", ondelete="CASCADE"), nullable=False, index=True)
+    room_id = Column(Integer, ForeignKey("rooms.id", ondelete="CASCADE"), nullable=False)
     user_id = Column(Integer, nullable=False, index=True)
     user_display_name = Column(String(100), nullable=False)
     content = Column(Text, nullable=False)
@@ -2,7 +2,7 @@
 ORM модель участника комнаты.
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Index, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.database import Base
@@ -31,9 +31,20 @@ class RoomParticipant(Base):
     """
     
     __tablename__ = "room_participants"
+    __table_args__ = (
+        # Каскадное удаление комнаты и выборки истории по комнате
+        Index("ix_room_participants_room_id_user_id", "room_id", "user_id"),
+        # Открытая запись участника: WHERE room_id = ? AND user_id = ? AND leave_time IS NULL
+        Index(
+            "ix_room_participants_open",
+            "room_id",
+            "user_id",
+            postgresql_where=text("leave_time IS NULL")
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    room_id = Column(Integer, ForeignKey("rooms.id", ondelete="CASCADE"), nullable=False, index=True)
+    room_id = Column(Integer, ForeignKey("rooms.id", ondelete="CASCADE"), nullable=False)
     user_id = Column(Integer, nullable=False, index=True)
     user_display_name = Column(String(100), nullable=False)
     status = Column(String(20), default=ParticipantStatus.ONLINE.value)
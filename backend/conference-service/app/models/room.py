@@ -2,7 +2,7 @@
 ORM модель комнаты видеоконференции.
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Index, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.database import Base
@@ -21,6 +21,11 @@ class Room(Base):
     """
     
     __tablename__ = "rooms"
+    __table_args__ = (
+        # Список комнат: ORDER BY created_at DESC, по умолчанию только активные
+        Index("ix_rooms_created_at", "created_at"),
+        Index("ix_rooms_active_created_at", "created_at", postgresql_where=text("is_active")),
+    )
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     name = Column(String(255), nullable=False)
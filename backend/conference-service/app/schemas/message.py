@@ -4,7 +4,7 @@ Pydantic схемы для сообщений чата.
 
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 
 class MessageBase(BaseModel):
@@ -33,4 +33,5 @@ class MessageResponse(MessageBase):
 class MessagesListResponse(BaseModel):
     """Схема списка сообщений"""
     messages: List[MessageResponse]
-    total: int
+    total: Optional[int] = Field(None, description="Всего сообщений в комнате (только при include_total)")
+    has_more: bool = Field(False, description="Есть сообщения за пределами страницы в направлении выборки")
@@ -39,7 +39,7 @@ class RoomDetail(RoomResponse):
 
 class ParticipantResponse(BaseModel):
     """Схема ответа с данными участника"""
-    id: int
+    id: int = Field(..., description="Идентификатор участника в комнате (совпадает с user_id)")
     user_id: int
     user_display_name: str
     status: str
@@ -61,6 +61,12 @@ class JoinRoomResponse(BaseModel):
     message: str
     participant_id: int
     room_id: int
+    heartbeat_interval: int = Field(..., description="Интервал heartbeat запросов, секунд")
+
+
+class HeartbeatResponse(BaseModel):
+    """Схема ответа на heartbeat"""
+    status: str
 
 
 class LeaveRoomResponse(BaseModel):
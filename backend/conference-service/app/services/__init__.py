@@ -0,0 +1 @@
+# Модуль сервисов
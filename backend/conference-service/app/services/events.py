@@ -0,0 +1,220 @@
+"""
+События комнат в реальном времени.
+
+Эндпоинты публикуют события (новые сообщения, вход и выход участников)
+в канал Redis pub/sub комнаты. Каждая реплика сервиса держит одну
+подписку на каналы всех комнат и раздает события локальным подписчикам
+(WebSocket и SSE соединениям), поэтому события доходят до клиентов
+независимо от того, к какой реплике они подключены.
+
+Кроме того, события записываются в ограниченный Redis Stream комнаты.
+ID записи в потоке становится ID события, по которому SSE клиент
+может продолжить получение событий после переподключения.
+"""
+
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.db.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Типы событий
+EVENT_MESSAGE = "message"
+EVENT_PARTICIPANT_JOINED = "participant_joined"
+EVENT_PARTICIPANT_LEFT = "participant_left"
+EVENT_ROOM_CLOSED = "room_closed"
+EVENT_RESYNC = "resync"  # История событий обрезана, клиенту нужно перезагрузить данные
+
+# Каналы pub/sub и потоки истории событий
+ROOM_EVENTS_CHANNEL = "room:{room_id}:events"
+ROOM_EVENTS_PATTERN = "room:*:events"
+ROOM_EVENTS_STREAM = "room:{room_id}:stream"
+
+# Пауза перед повторной подпиской после ошибки Redis
+RECONNECT_DELAY_SECONDS = 1.0
+
+
+async def publish_room_event(room_id: int, event_type: str, data: Dict[str, Any]) -> Optional[str]:
+    """
+    Публикация события комнаты для всех реплик сервиса.
+    
+    Событие добавляется в поток истории комнаты и рассылается через pub/sub.
+    
+    Args:
+        room_id: ID комнаты
+        event_type: Тип события
+        data: Данные события
+    
+    Returns:
+        ID события или None при ошибке
+    """
+    event = {"type": event_type, "room_id": room_id, "data": data}
+    
+    try:
+        client = get_redis_client()
+        
+        stream_key = ROOM_EVENTS_STREAM.format(room_id=room_id)
+        pipe = client.pipeline()
+        pipe.xadd(
+            stream_key,
+            {"event": json.dumps(event, default=str)},
+            maxlen=settings.EVENTS_HISTORY_SIZE,
+            approximate=True
+        )
+        pipe.expire(stream_key, settings.EVENTS_HISTORY_TTL_SECONDS)
+        event_id, _ = await pipe.execute()
+        
+        event["id"] = event_id
+        await client.publish(ROOM_EVENTS_CHANNEL.format(room_id=room_id), json.dumps(event, default=str))
+        return event_id
+    except Exception as e:
+        logger.error(f"Ошибка публикации события комнаты {room_id}: {e}")
+        return None
+
+
+def parse_event_id(event_id: str) -> Optional[Tuple[int, int]]:
+    """Разбор ID события Redis Stream вида '<ms>-<seq>'"""
+    try:
+        ms, seq = event_id.split("-", 1)
+        return int(ms), int(seq)
+    except (ValueError, AttributeError):
+        return None
+
+
+async def read_room_events_since(room_id: int, last_event_id: str) -> List[Dict[str, Any]]:
+    """
+    Чтение событий комнаты, опубликованных после указанного события.
+    
+    Если часть событий после last_event_id уже вытеснена из истории,
+    первым возвращается событие resync.
+    
+    Args:
+        room_id: ID комнаты
+        last_event_id: ID последнего полученного клиентом события
+    
+    Returns:
+        Список событий в порядке публикации
+    """
+    last = parse_event_id(last_event_id)
+    if last is None:
+        return [{"type": EVENT_RESYNC, "room_id": room_id, "data": {}}]
+    
+    client = get_redis_client()
+    stream_key = ROOM_EVENTS_STREAM.format(room_id=room_id)
+    
+    # Самое старое событие в истории: если оно новее last_event_id,
+    # промежуточные события потеряны
+    oldest = await client.xrange(stream_key, count=1)
+    events: List[Dict[str, Any]] = []
+    if oldest and parse_event_id(oldest[0][0]) > last:
+        events.append({"type": EVENT_RESYNC, "room_id": room_id, "data": {}})
+    
+    entries = await client.xrange(
+        stream_key,
+        min=f"({last_event_id}",
+        count=settings.EVENTS_HISTORY_SIZE
+    )
+    for entry_id, fields in entries:
+        event = json.loads(fields["event"])
+        event["id"] = entry_id
+        events.append(event)
+    
+    return events
+
+
+class RoomEventBroker:
+    """
+    Раздача событий комнат локальным подписчикам.
+    
+    Держит одну подписку Redis на процесс и очередь на каждого подписчика.
+    Если подписчик не успевает читать события, самые старые отбрасываются.
+    """
+    
+    def __init__(self, queue_size: int):
+        self._queue_size = queue_size
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+        self._task: Optional[asyncio.Task] = None
+    
+    async def start(self) -> None:
+        """Запуск фоновой подписки на события"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+    
+    async def stop(self) -> None:
+        """Остановка фоновой подписки"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    @asynccontextmanager
+    async def subscribe(self, room_id: int) -> AsyncIterator[asyncio.Queue]:
+        """
+        Подписка на события комнаты.
+        
+        Yields:
+            Очередь, в которую поступают события комнаты
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._queue_size)
+        self._subscribers[room_id].add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(room_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[room_id]
+    
+    async def _listen(self) -> None:
+        """Чтение событий из Redis с переподключением при ошибках"""
+        while True:
+            pubsub = None
+            try:
+                pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+                await pubsub.psubscribe(ROOM_EVENTS_PATTERN)
+                logger.info("Подписка на события комнат установлена")
+                
+                async for message in pubsub.listen():
+                    if message["type"] == "pmessage":
+                        self._dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка подписки на события комнат: {e}")
+                await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+    
+    def _dispatch(self, raw: str) -> None:
+        """Передача события всем локальным подписчикам комнаты"""
+        try:
+            event = json.loads(raw)
+            room_id = int(event["room_id"])
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Некорректное событие комнаты: {e}")
+            return
+        
+        for queue in list(self._subscribers.get(room_id, ())):
+            if queue.full():
+                # Медленный подписчик: отбрасываем самое старое событие
+                queue.get_nowait()
+                logger.warning(f"Очередь событий комнаты {room_id} переполнена")
+            queue.put_nowait(event)
+
+
+# Глобальный брокер событий процесса
+broker = RoomEventBroker(queue_size=settings.EVENTS_QUEUE_SIZE)
@@ -0,0 +1,473 @@
+"""
+Буферизованная запись сообщений чата (MESSAGE_INGEST_MODE=buffered).
+
+В режиме direct каждое сообщение - отдельная транзакция с INSERT и
+commit. В буферизованном режиме отправка сообщения не ждет БД:
+- ID выдается счетчиком MESSAGE_ID_KEY, время отправки - сервисом;
+- сообщение одним Lua скриптом добавляется в Redis Stream
+  MESSAGE_STREAM_KEY и в sorted set несохраненных сообщений комнаты
+  MESSAGE_PENDING_KEY, после чего отправителю возвращается ответ;
+- фоновая задача (MessageWriter) читает поток через группу
+  потребителей и записывает пачки до MESSAGE_FLUSH_BATCH_SIZE
+  сообщений одним многострочным INSERT не реже чем раз в
+  MESSAGE_FLUSH_INTERVAL_MS.
+
+Запись идемпотентна (ON CONFLICT DO NOTHING по id): сообщения
+упавшей реплики забираются другой через XAUTOCLAIM и могут быть
+записаны повторно. Пока сообщение не записано в БД, история комнаты
+берет его из MESSAGE_PENDING_KEY.
+
+Ответ отправителю означает, что сообщение сохранено в Redis, поэтому
+для Redis должен быть включен AOF (appendonly yes). Режим должен быть
+одинаковым на всех репликах: ID из счетчика Redis и из
+последовательности PostgreSQL не согласуются во время работы.
+
+Если Redis потерял данные (FLUSHALL, переключение на реплику или
+перезапуск без AOF), группа потребителей и счетчик ID создаются
+заново: MessageWriter согласует их после ошибки команды (NOGROUP), а
+отправка сообщения - при отсутствии счетчика, не дожидаясь перезапуска.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from redis.exceptions import ResponseError
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from app.core.config import settings
+from app.core.metrics import MESSAGE_INGEST_BACKLOG, MESSAGE_INGEST_FLUSHED
+from app.db.database import SessionLocal
+from app.db.redis import get_redis_client
+from app.models.message import Message
+
+logger = logging.getLogger(__name__)
+
+# Ключи буфера сообщений
+MESSAGE_ID_KEY = "messages:id"
+MESSAGE_STREAM_KEY = "messages:ingest"
+MESSAGE_PENDING_KEY = "messages:pending:{room_id}"
+MESSAGE_WRITER_GROUP = "messages-writer"
+
+# Ожидание новых сообщений, когда поток пуст
+READ_BLOCK_MS = 1000
+
+# Пауза после ошибки записи или чтения
+RETRY_DELAY_SECONDS = 1.0
+
+# Потребители группы без сообщений, неактивные дольше, удаляются
+STALE_CONSUMER_MS = 24 * 3600 * 1000
+
+# Выдача ID и постановка сообщения в буфер.
+# Возвращает ID, -1 при переполнении буфера и -2, если счетчик ID
+# еще не согласован с БД (после очистки Redis)
+ENQUEUE_SCRIPT = """
+if redis.call("exists", KEYS[1]) == 0 then
+    return -2
+end
+if redis.call("xlen", KEYS[2]) >= tonumber(ARGV[2]) then
+    return -1
+end
+local id = redis.call("incr", KEYS[1])
+redis.call("xadd", KEYS[2], "*", "id", id, "message", ARGV[1])
+redis.call("zadd", KEYS[3], id, id .. ":" .. ARGV[1])
+return id
+"""
+
+# Счетчик ID не меньше максимального ID в БД и последнего ID в потоке
+# (сообщения потока могут быть еще не записаны в БД)
+SYNC_ID_SCRIPT = """
+local floor = tonumber(ARGV[1])
+local last = redis.call("xrevrange", KEYS[2], "+", "-", "COUNT", 1)
+if #last > 0 then
+    local fields = last[1][2]
+    for i = 1, #fields, 2 do
+        if fields[i] == "id" then
+            floor = math.max(floor, tonumber(fields[i + 1]))
+        end
+    end
+end
+local current = tonumber(redis.call("get", KEYS[1]) or "-1")
+if current < floor then
+    redis.call("set", KEYS[1], floor)
+    return floor
+end
+return current
+"""
+
+
+@dataclass
+class PendingMessage:
+    """Сообщение из буфера (поля совпадают с моделью Message)"""
+    id: int
+    room_id: int
+    user_id: int
+    user_display_name: str
+    content: str
+    created_at: datetime
+
+
+def is_buffered() -> bool:
+    """Включен ли буферизованный режим записи"""
+    return settings.MESSAGE_INGEST_MODE == "buffered"
+
+
+def _pending_key(room_id: int) -> str:
+    return MESSAGE_PENDING_KEY.format(room_id=room_id)
+
+
+def _parse(message_id: int, payload: str) -> PendingMessage:
+    """Сообщение из записи буфера"""
+    data = json.loads(payload)
+    return PendingMessage(
+        id=int(message_id),
+        room_id=data["room_id"],
+        user_id=data["user_id"],
+        user_display_name=data["user_display_name"],
+        content=data["content"],
+        created_at=datetime.fromisoformat(data["created_at"])
+    )
+
+
+async def enqueue(
+    room_id: int,
+    user_id: int,
+    user_display_name: str,
+    content: str
+) -> Optional[PendingMessage]:
+    """
+    Постановка сообщения в буфер.
+    
+    Returns:
+        Сообщение с выданным ID или None, если буфер не принимает
+        сообщения (переполнен или счетчик ID не готов)
+    """
+    created_at = datetime.now(timezone.utc)
+    payload = json.dumps({
+        "room_id": room_id,
+        "user_id": user_id,
+        "user_display_name": user_display_name,
+        "content": content,
+        "created_at": created_at.isoformat(),
+    }, ensure_ascii=False)
+    
+    async def push() -> int:
+        return await get_redis_client().eval(
+            ENQUEUE_SCRIPT, 3, MESSAGE_ID_KEY, MESSAGE_STREAM_KEY, _pending_key(room_id),
+            payload, settings.MESSAGE_INGEST_MAX_BACKLOG
+        )
+    
+    message_id = await push()
+    
+    if message_id == -2:
+        # Счетчик ID потерян вместе с данными Redis: согласование с БД
+        # и повторная попытка
+        logger.warning("Счетчик ID сообщений не найден, согласование с БД")
+        try:
+            await writer.resync()
+        except (SQLAlchemyError, OSError) as e:
+            logger.error(f"Ошибка согласования счетчика ID сообщений с БД: {e}")
+            return None
+        message_id = await push()
+    
+    if message_id == -1:
+        logger.warning("Буфер сообщений переполнен, БД не успевает за отправкой")
+        return None
+    if message_id == -2:
+        logger.warning("Счетчик ID сообщений еще не согласован с БД")
+        return None
+    
+    return PendingMessage(
+        id=message_id,
+        room_id=room_id,
+        user_id=user_id,
+        user_display_name=user_display_name,
+        content=content,
+        created_at=created_at
+    )
+
+
+async def get_pending(
+    room_id: int,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    newest_first: bool = False
+) -> List[PendingMessage]:
+    """
+    Несохраненные сообщения комнаты в диапазоне (after_id, before_id).
+    
+    Args:
+        room_id: ID комнаты
+        after_id: Только сообщения новее
+        before_id: Только сообщения старше
+        limit: Максимум сообщений от начала выборки
+        newest_first: Выборка от новых к старым
+    """
+    low = f"({after_id}" if after_id is not None else "-inf"
+    high = f"({before_id}" if before_id is not None else "+inf"
+    page = {"start": 0, "num": limit} if limit is not None else {}
+    
+    client = get_redis_client()
+    if newest_first:
+        members = await client.zrevrangebyscore(_pending_key(room_id), high, low, **page)
+    else:
+        members = await client.zrangebyscore(_pending_key(room_id), low, high, **page)
+    
+    return [_parse(*member.split(":", 1)) for member in members]
+
+
+def merge(stored: Iterable, pending: Iterable[PendingMessage], newest_first: bool = False) -> List:
+    """
+    Объединение сообщений из БД и буфера по ID.
+    Сообщение может быть в обоих источниках, пока буфер не очищен после записи.
+    """
+    messages: Dict[int, object] = {message.id: message for message in pending}
+    messages.update((message.id, message) for message in stored)
+    return [messages[key] for key in sorted(messages, reverse=newest_first)]
+
+
+class MessageWriter:
+    """Пакетная запись сообщений из Redis Stream в PostgreSQL"""
+    
+    def __init__(self, batch_size: int, flush_interval_ms: int, claim_idle_seconds: int):
+        self.batch_size = batch_size
+        self.flush_interval_ms = flush_interval_ms
+        self.claim_idle_seconds = claim_idle_seconds
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self._task: Optional[asyncio.Task] = None
+        self._prepared = False
+        self._prepare_lock = asyncio.Lock()
+    
+    async def start(self) -> None:
+        """Запуск фоновой записи"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """
+        Остановка фоновой записи.
+        Прочитанные, но не записанные сообщения остаются в группе
+        и будут записаны этой или другой репликой.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _prepare(self) -> None:
+        """
+        Создание группы потребителей и согласование счетчика ID с БД.
+        Выполняется при запуске и повторно после потери данных Redis.
+        """
+        client = get_redis_client()
+        try:
+            await client.xgroup_create(MESSAGE_STREAM_KEY, MESSAGE_WRITER_GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        
+        async with SessionLocal() as db:
+            max_id = await db.scalar(select(func.max(Message.id))) or 0
+        await client.eval(SYNC_ID_SCRIPT, 2, MESSAGE_ID_KEY, MESSAGE_STREAM_KEY, max_id)
+        self._prepared = True
+    
+    async def resync(self) -> None:
+        """
+        Согласование после потери счетчика ID (отправка получила -2).
+        Одновременные отправки ждут одно согласование.
+        """
+        async with self._prepare_lock:
+            if not await get_redis_client().exists(MESSAGE_ID_KEY):
+                await self._prepare()
+    
+    async def _run(self) -> None:
+        """Чтение потока и запись пачек"""
+        # Сначала записываются собственные неподтвержденные сообщения
+        retry_own = True
+        last_claim = 0.0
+        
+        while True:
+            try:
+                if not self._prepared:
+                    async with self._prepare_lock:
+                        await self._prepare()
+                
+                if time.monotonic() - last_claim >= self.claim_idle_seconds:
+                    last_claim = time.monotonic()
+                    await self._claim_abandoned()
+                
+                if retry_own:
+                    entries = await self._read(stream_id="0", block_ms=None)
+                else:
+                    entries = await self._read_batch()
+                
+                # Пока пачка не подтверждена, она числится за этим
+                # потребителем и после ошибки записи перечитывается первой
+                retry_own = bool(entries)
+                if entries:
+                    await self._flush(entries)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка записи сообщений из буфера: {e}")
+                if isinstance(e, ResponseError):
+                    # Ошибка команды (NOGROUP, нет ключа): Redis потерял
+                    # поток с группой, группа и счетчик ID создаются заново
+                    self._prepared = False
+                retry_own = True
+                await asyncio.sleep(RETRY_DELAY_SECONDS)
+    
+    async def _read(self, stream_id: str, block_ms: Optional[int], count: Optional[int] = None) -> List[Tuple]:
+        """Чтение записей потока группой потребителей"""
+        response = await get_redis_client().xreadgroup(
+            MESSAGE_WRITER_GROUP,
+            self.consumer,
+            {MESSAGE_STREAM_KEY: stream_id},
+            count=count or self.batch_size,
+            block=block_ms
+        )
+        return response[0][1] if response else []
+    
+    async def _read_batch(self) -> List[Tuple]:
+        """
+        Новые записи потока: пачка набирается, пока не заполнится
+        или пока с первой записи не пройдет MESSAGE_FLUSH_INTERVAL_MS.
+        """
+        entries = await self._read(stream_id=">", block_ms=READ_BLOCK_MS)
+        if not entries:
+            return entries
+        
+        deadline = time.monotonic() + self.flush_interval_ms / 1000
+        while len(entries) < self.batch_size:
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                break
+            more = await self._read(
+                stream_id=">",
+                block_ms=remaining_ms,
+                count=self.batch_size - len(entries)
+            )
+            entries.extend(more)
+        return entries
+    
+    async def _claim_abandoned(self) -> None:
+        """Запись сообщений, прочитанных репликой, которая их не записала"""
+        client = get_redis_client()
+        start_id = "0-0"
+        
+        while True:
+            next_id, entries, *_ = await client.xautoclaim(
+                MESSAGE_STREAM_KEY,
+                MESSAGE_WRITER_GROUP,
+                self.consumer,
+                min_idle_time=self.claim_idle_seconds * 1000,
+                start_id=start_id,
+                count=self.batch_size
+            )
+            if entries:
+                logger.info(f"Забрано {len(entries)} незаписанных сообщений другой реплики")
+                await self._flush(entries)
+            if next_id == "0-0":
+                break
+            start_id = next_id
+        
+        # Потребители завершившихся реплик без сообщений не нужны группе
+        for consumer in await client.xinfo_consumers(MESSAGE_STREAM_KEY, MESSAGE_WRITER_GROUP):
+            if (
+                consumer["name"] != self.consumer
+                and consumer["pending"] == 0
+                and consumer["idle"] > STALE_CONSUMER_MS
+            ):
+                await client.xgroup_delconsumer(MESSAGE_STREAM_KEY, MESSAGE_WRITER_GROUP, consumer["name"])
+    
+    async def _flush(self, entries: List[Tuple]) -> None:
+        """Запись пачки одним INSERT и удаление ее из буфера"""
+        entry_ids = []
+        messages: Dict[int, PendingMessage] = {}
+        for entry_id, fields in entries:
+            entry_ids.append(entry_id)
+            # Запись удалена из потока после подтверждения другой репликой
+            if fields:
+                message = _parse(fields["id"], fields["message"])
+                messages[message.id] = message
+        
+        if messages:
+            rows = [asdict(message) for message in messages.values()]
+            async with SessionLocal() as db:
+                await self._insert(db, rows)
+                # Последовательность messages.id не должна отставать от
+                # выданных ID на случай возврата в режим direct
+                await db.execute(
+                    text(
+                        "SELECT setval(pg_get_serial_sequence('messages', 'id'), :max_id) "
+                        "WHERE :max_id > COALESCE(pg_sequence_last_value("
+                        "pg_get_serial_sequence('messages', 'id')::regclass), 0)"
+                    ),
+                    {"max_id": max(messages)}
+                )
+                await db.commit()
+        
+        client = get_redis_client()
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.xack(MESSAGE_STREAM_KEY, MESSAGE_WRITER_GROUP, *entry_ids)
+            pipe.xdel(MESSAGE_STREAM_KEY, *entry_ids)
+            for message in messages.values():
+                pipe.zremrangebyscore(_pending_key(message.room_id), message.id, message.id)
+            pipe.xlen(MESSAGE_STREAM_KEY)
+            *_, backlog = await pipe.execute()
+        
+        MESSAGE_INGEST_FLUSHED.inc(len(messages))
+        MESSAGE_INGEST_BACKLOG.set(backlog)
+    
+    async def _insert(self, db, rows: List[dict]) -> None:
+        """
+        Многострочный INSERT пачки. Если пачка не записывается целиком
+        (например, комната удалена), сообщения пишутся по одному, а
+        непригодные пропускаются, чтобы не блокировать буфер.
+        """
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(Message).values(rows).on_conflict_do_nothing(index_elements=["id"]))
+            return
+        except IntegrityError as e:
+            logger.error(f"Пачка из {len(rows)} сообщений не записана, запись по одному: {e}")
+        
+        for row in rows:
+            try:
+                async with db.begin_nested():
+                    await db.execute(insert(Message).values(row).on_conflict_do_nothing(index_elements=["id"]))
+            except IntegrityError as e:
+                logger.error(f"Сообщение {row['id']} комнаты {row['room_id']} отброшено: {e}")
+
+
+# Запись сообщений процесса сервиса
+writer = MessageWriter(
+    batch_size=settings.MESSAGE_FLUSH_BATCH_SIZE,
+    flush_interval_ms=settings.MESSAGE_FLUSH_INTERVAL_MS,
+    claim_idle_seconds=settings.MESSAGE_CLAIM_IDLE_SECONDS
+)
+
+
+async def start_message_ingest() -> None:
+    """
+    Запуск записи буфера в БД. В режиме direct запись тоже запускается,
+    чтобы после переключения режима дописать оставшиеся сообщения.
+    """
+    await writer.start()
+
+
+async def stop_message_ingest() -> None:
+    """Остановка записи буфера"""
+    await writer.stop()
@@ -0,0 +1,512 @@
+"""
+Присутствие участников в комнатах.
+
+Текущий состав комнаты хранится в Redis, а не в таблице
+room_participants:
+- sorted set PRESENCE_KEY: участник -> время последнего heartbeat;
+- hash PRESENCE_INFO_KEY: участник -> имя, статус и время входа;
+- set PRESENCE_ROOMS_KEY: комнаты, в которых есть участники;
+- hash PRESENCE_COUNTS_KEY: комната -> количество участников.
+
+Клиент подтверждает присутствие heartbeat запросом раз в
+PRESENCE_HEARTBEAT_SECONDS. Участник без heartbeat дольше
+PRESENCE_TIMEOUT_SECONDS не учитывается при чтении и удаляется
+фоновой задачей (reaper), поэтому упавшие клиенты не остаются в
+комнате навсегда. Чтение состава комнаты - O(log n) запрос к sorted
+set без обращения к PostgreSQL.
+
+Счетчики участников меняются теми же Lua скриптами, что и состав
+комнаты, поэтому обновляются атомарно с ним. Список комнат читает
+счетчики одним HMGET. Периодическая сверка (reconcile_counts)
+исправляет расхождение счетчика с sorted set, если оно все же
+возникло (например, после ручного изменения ключей).
+
+В room_participants пишется только история входов и выходов.
+Запись выполняется фоновой задачей пачками, чтобы вход и выход не
+ждали БД.
+
+Каждое изменение состава увеличивает версию комнаты
+(app/services/room_versions.py), по которой строится ETag
+детальной информации о комнате.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.core.metrics import (
+    PRESENCE_COUNTER_DRIFT,
+    PRESENCE_HISTORY_QUEUE_DEPTH,
+    PRESENCE_REAPED,
+)
+from app.db.database import SessionLocal
+from app.db.redis import get_redis_client
+from app.models.participant import RoomParticipant, ParticipantStatus
+from app.services import room_versions
+from app.services.events import publish_room_event, EVENT_PARTICIPANT_LEFT
+
+logger = logging.getLogger(__name__)
+
+# Ключи присутствия
+PRESENCE_KEY = "presence:room:{room_id}"
+PRESENCE_INFO_KEY = "presence:room:{room_id}:info"
+PRESENCE_ROOMS_KEY = "presence:rooms"
+PRESENCE_COUNTS_KEY = "presence:counts"
+
+# Максимум записей истории в одной транзакции
+HISTORY_BATCH_SIZE = 200
+
+# Вход: обновляет heartbeat, данные участника сохраняются только
+# при первом входе. Возвращает 1, если участника не было в комнате
+JOIN_SCRIPT = """
+local existed = redis.call("zscore", KEYS[1], ARGV[1])
+redis.call("zadd", KEYS[1], ARGV[2], ARGV[1])
+redis.call("sadd", KEYS[3], ARGV[4])
+if not existed then
+    redis.call("hincrby", KEYS[4], ARGV[4], 1)
+end
+if existed and tonumber(existed) > tonumber(ARGV[5]) then
+    return 0
+end
+redis.call("hset", KEYS[2], ARGV[1], ARGV[3])
+return 1
+"""
+
+# Heartbeat: обновляет время только присутствующему участнику
+HEARTBEAT_SCRIPT = """
+local score = redis.call("zscore", KEYS[1], ARGV[1])
+if not score or tonumber(score) <= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call("zadd", KEYS[1], ARGV[2], ARGV[1])
+return 1
+"""
+
+# Выход: удаляет участника и возвращает его данные
+LEAVE_SCRIPT = """
+local removed = redis.call("zrem", KEYS[1], ARGV[1])
+local info = redis.call("hget", KEYS[2], ARGV[1])
+redis.call("hdel", KEYS[2], ARGV[1])
+if redis.call("zcard", KEYS[1]) == 0 then
+    redis.call("srem", KEYS[3], ARGV[2])
+end
+if removed == 0 then
+    return false
+end
+if redis.call("hincrby", KEYS[4], ARGV[2], -1) <= 0 then
+    redis.call("hdel", KEYS[4], ARGV[2])
+end
+return info
+"""
+
+# Удаление участников без heartbeat. Скрипт атомарен, поэтому
+# каждого участника удаляет ровно одна реплика
+REAP_SCRIPT = """
+local expired = redis.call("zrangebyscore", KEYS[1], "-inf", ARGV[1], "withscores")
+local result = {}
+local removed = 0
+for i = 1, #expired, 2 do
+    local member = expired[i]
+    redis.call("zrem", KEYS[1], member)
+    local info = redis.call("hget", KEYS[2], member)
+    redis.call("hdel", KEYS[2], member)
+    table.insert(result, member)
+    table.insert(result, expired[i + 1])
+    table.insert(result, info or "")
+    removed = removed + 1
+end
+if removed > 0 and redis.call("hincrby", KEYS[4], ARGV[2], -removed) <= 0 then
+    redis.call("hdel", KEYS[4], ARGV[2])
+end
+if redis.call("zcard", KEYS[1]) == 0 then
+    redis.call("srem", KEYS[3], ARGV[2])
+end
+return result
+"""
+
+
+# Сверка счетчика комнаты с ее sorted set. Возвращает расхождение
+RECONCILE_SCRIPT = """
+local actual = redis.call("zcard", KEYS[1])
+local stored = tonumber(redis.call("hget", KEYS[4], ARGV[1]) or "0")
+if actual == stored then
+    return 0
+end
+if actual == 0 then
+    redis.call("hdel", KEYS[4], ARGV[1])
+    redis.call("srem", KEYS[3], ARGV[1])
+else
+    redis.call("hset", KEYS[4], ARGV[1], actual)
+end
+return actual - stored
+"""
+
+
+@dataclass
+class Participant:
+    """Участник, присутствующий в комнате"""
+    user_id: int
+    user_display_name: str
+    status: str
+    join_time: datetime
+
+
+def _keys(room_id: int) -> List[str]:
+    """Ключи присутствия комнаты в порядке KEYS скриптов"""
+    return [
+        PRESENCE_KEY.format(room_id=room_id),
+        PRESENCE_INFO_KEY.format(room_id=room_id),
+        PRESENCE_ROOMS_KEY,
+        PRESENCE_COUNTS_KEY,
+    ]
+
+
+def _expired_before(now: float) -> float:
+    """Граница: участники с heartbeat не позже нее считаются ушедшими"""
+    return now - settings.PRESENCE_TIMEOUT_SECONDS
+
+
+def _parse_info(user_id: int, raw: Optional[str]) -> Participant:
+    """Данные участника из hash присутствия"""
+    info: Dict[str, Any] = json.loads(raw) if raw else {}
+    return Participant(
+        user_id=user_id,
+        user_display_name=info.get("name") or str(user_id),
+        status=info.get("status") or ParticipantStatus.IN_CALL.value,
+        join_time=datetime.fromtimestamp(info.get("joined", time.time()), tz=timezone.utc)
+    )
+
+
+async def join(room_id: int, user_id: int, display_name: str) -> bool:
+    """
+    Вход участника в комнату.
+    
+    Returns:
+        True если участник вошел, False если он уже был в комнате
+    """
+    now = time.time()
+    info = json.dumps({
+        "name": display_name,
+        "status": ParticipantStatus.IN_CALL.value,
+        "joined": now,
+    })
+    joined = await get_redis_client().eval(
+        JOIN_SCRIPT, 4, *_keys(room_id),
+        user_id, now, info, room_id, _expired_before(now)
+    )
+    
+    if joined:
+        history.record_join(room_id, user_id, display_name, now)
+        await room_versions.bump(room_id, room_versions.VERSION_ROOM)
+    return bool(joined)
+
+
+async def heartbeat(room_id: int, user_id: int) -> bool:
+    """
+    Подтверждение присутствия участника.
+    
+    Returns:
+        False если участника нет в комнате (например, он удален по таймауту)
+    """
+    now = time.time()
+    touched = await get_redis_client().eval(
+        HEARTBEAT_SCRIPT, 1, PRESENCE_KEY.format(room_id=room_id),
+        user_id, now, _expired_before(now)
+    )
+    return bool(touched)
+
+
+async def leave(room_id: int, user_id: int) -> Optional[Participant]:
+    """
+    Выход участника из комнаты.
+    
+    Returns:
+        Данные вышедшего участника или None, если его не было в комнате
+    """
+    raw = await get_redis_client().eval(LEAVE_SCRIPT, 4, *_keys(room_id), user_id, room_id)
+    if raw is None:
+        return None
+    
+    history.record_leave(room_id, user_id, time.time())
+    await room_versions.bump(room_id, room_versions.VERSION_ROOM)
+    return _parse_info(user_id, raw)
+
+
+async def clear_room(room_id: int) -> None:
+    """Выход всех участников закрываемой комнаты"""
+    client = get_redis_client()
+    keys = _keys(room_id)
+    
+    async with client.pipeline(transaction=True) as pipe:
+        pipe.zrange(keys[0], 0, -1)
+        pipe.delete(keys[0], keys[1])
+        pipe.srem(keys[2], room_id)
+        pipe.hdel(keys[3], room_id)
+        members, *_ = await pipe.execute()
+    
+    now = time.time()
+    for member in members:
+        history.record_leave(room_id, int(member), now)
+    
+    # Версия меняется и без участников: закрытие меняет активность комнаты
+    await room_versions.bump(room_id, room_versions.VERSION_ROOM)
+
+
+def is_active_score(score: Optional[float]) -> bool:
+    """Не истек ли heartbeat участника (score из PRESENCE_KEY)"""
+    return score is not None and score > _expired_before(time.time())
+
+
+async def is_present(room_id: int, user_id: int) -> bool:
+    """Присутствует ли участник в комнате (heartbeat в пределах таймаута)"""
+    score = await get_redis_client().zscore(PRESENCE_KEY.format(room_id=room_id), user_id)
+    return is_active_score(score)
+
+
+async def get_participants(room_id: int) -> List[Participant]:
+    """Участники, приславшие heartbeat в пределах таймаута"""
+    client = get_redis_client()
+    key, info_key, *_ = _keys(room_id)
+    
+    members = await client.zrangebyscore(key, f"({_expired_before(time.time())}", "+inf")
+    if not members:
+        return []
+    
+    infos = await client.hmget(info_key, members)
+    participants = [_parse_info(int(member), raw) for member, raw in zip(members, infos)]
+    participants.sort(key=lambda participant: participant.join_time)
+    return participants
+
+
+async def count_participants(room_ids: List[int]) -> Dict[int, int]:
+    """
+    Количество участников для списка комнат одним запросом.
+    Участники без heartbeat учитываются до удаления reaper (не дольше
+    PRESENCE_REAP_INTERVAL_SECONDS после таймаута).
+    """
+    if not room_ids:
+        return {}
+    
+    counts = await get_redis_client().hmget(PRESENCE_COUNTS_KEY, room_ids)
+    return {
+        room_id: max(0, int(count)) if count else 0
+        for room_id, count in zip(room_ids, counts)
+    }
+
+
+async def reap_expired() -> int:
+    """
+    Удаление участников без heartbeat во всех комнатах.
+    
+    Returns:
+        Количество удаленных участников
+    """
+    client = get_redis_client()
+    expired_before = _expired_before(time.time())
+    reaped = 0
+    
+    for room in await client.smembers(PRESENCE_ROOMS_KEY):
+        room_id = int(room)
+        result = await client.eval(REAP_SCRIPT, 4, *_keys(room_id), expired_before, room_id)
+        if result:
+            await room_versions.bump(room_id, room_versions.VERSION_ROOM)
+        
+        for member, last_seen, raw in zip(result[::3], result[1::3], result[2::3]):
+            participant = _parse_info(int(member), raw)
+            # Временем выхода считается последний heartbeat
+            history.record_leave(room_id, participant.user_id, float(last_seen))
+            await publish_room_event(room_id, EVENT_PARTICIPANT_LEFT, {
+                "user_id": participant.user_id,
+                "user_display_name": participant.user_display_name
+            })
+            reaped += 1
+    
+    if reaped:
+        PRESENCE_REAPED.inc(reaped)
+        logger.info(f"Удалено участников без heartbeat: {reaped}")
+    return reaped
+
+
+async def reconcile_counts() -> int:
+    """
+    Сверка счетчиков участников с составом комнат.
+    
+    Returns:
+        Количество исправленных счетчиков
+    """
+    client = get_redis_client()
+    rooms = set(await client.smembers(PRESENCE_ROOMS_KEY))
+    rooms.update(await client.hkeys(PRESENCE_COUNTS_KEY))
+    corrected = 0
+    
+    for room in rooms:
+        room_id = int(room)
+        drift = await client.eval(RECONCILE_SCRIPT, 4, *_keys(room_id), room_id)
+        if drift:
+            corrected += 1
+            PRESENCE_COUNTER_DRIFT.inc(abs(drift))
+            logger.warning(f"Счетчик участников комнаты {room_id} исправлен на {drift}")
+    
+    return corrected
+
+
+class PresenceHistory:
+    """
+    Фоновая запись истории входов и выходов в room_participants.
+    
+    События копятся в очереди процесса и записываются пачками.
+    При переполнении очереди новые события отбрасываются: история
+    не влияет на текущий состав комнат.
+    """
+    
+    def __init__(self, queue_size: int):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._task: Optional[asyncio.Task] = None
+    
+    def record_join(self, room_id: int, user_id: int, display_name: str, at: float) -> None:
+        """Вход участника в момент at (unix time)"""
+        self._put(("join", room_id, user_id, display_name, at))
+    
+    def record_leave(self, room_id: int, user_id: int, at: float) -> None:
+        """Выход участника в момент at (unix time)"""
+        self._put(("leave", room_id, user_id, None, at))
+    
+    def _put(self, item: Tuple) -> None:
+        """Постановка события в очередь без ожидания"""
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            logger.error(f"Очередь истории участников переполнена, событие потеряно: {item[:3]}")
+        PRESENCE_HISTORY_QUEUE_DEPTH.set(self._queue.qsize())
+    
+    async def start(self) -> None:
+        """Запуск фоновой записи"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Остановка с записью накопленных событий"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        
+        while not self._queue.empty():
+            await self._flush(self._drain())
+    
+    def _drain(self) -> List[Tuple]:
+        """Пачка событий из очереди"""
+        batch = []
+        while len(batch) < HISTORY_BATCH_SIZE and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        PRESENCE_HISTORY_QUEUE_DEPTH.set(self._queue.qsize())
+        return batch
+    
+    async def _run(self) -> None:
+        """Запись событий по мере поступления"""
+        while True:
+            batch = [await self._queue.get()]
+            batch.extend(self._drain())
+            try:
+                await self._flush(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка записи истории участников ({len(batch)} событий): {e}")
+    
+    async def _flush(self, batch: List[Tuple]) -> None:
+        """Запись пачки событий одной транзакцией"""
+        if not batch:
+            return
+        
+        async with SessionLocal() as db:
+            for kind, room_id, user_id, display_name, at in batch:
+                moment = datetime.fromtimestamp(at, tz=timezone.utc)
+                if kind == "join":
+                    # Незакрытая запись означает, что выход еще не записан
+                    open_record = await db.scalar(
+                        select(RoomParticipant.id).where(
+                            RoomParticipant.room_id == room_id,
+                            RoomParticipant.user_id == user_id,
+                            RoomParticipant.leave_time.is_(None)
+                        ).limit(1)
+                    )
+                    if open_record is None:
+                        db.add(RoomParticipant(
+                            room_id=room_id,
+                            user_id=user_id,
+                            user_display_name=display_name,
+                            status=ParticipantStatus.IN_CALL.value,
+                            join_time=moment
+                        ))
+                        await db.flush()
+                else:
+                    await db.execute(
+                        update(RoomParticipant)
+                        .where(
+                            RoomParticipant.room_id == room_id,
+                            RoomParticipant.user_id == user_id,
+                            RoomParticipant.leave_time.is_(None)
+                        )
+                        .values(status=ParticipantStatus.OFFLINE.value, leave_time=moment)
+                    )
+            await db.commit()
+
+
+# История процесса сервиса
+history = PresenceHistory(queue_size=settings.PRESENCE_HISTORY_QUEUE_SIZE)
+
+# Фоновое удаление участников без heartbeat и сверка счетчиков
+_reaper_task: Optional[asyncio.Task] = None
+
+
+async def _reap_loop() -> None:
+    """Периодическое удаление участников без heartbeat и сверка счетчиков"""
+    last_reconcile = time.monotonic()
+    
+    while True:
+        await asyncio.sleep(settings.PRESENCE_REAP_INTERVAL_SECONDS)
+        try:
+            await reap_expired()
+            
+            if time.monotonic() - last_reconcile >= settings.PRESENCE_RECONCILE_INTERVAL_SECONDS:
+                last_reconcile = time.monotonic()
+                await reconcile_counts()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка обслуживания присутствия участников: {e}")
+
+
+async def start_presence() -> None:
+    """Запуск записи истории и удаления участников без heartbeat"""
+    global _reaper_task
+    
+    await history.start()
+    if _reaper_task is None:
+        _reaper_task = asyncio.create_task(_reap_loop())
+
+
+async def stop_presence() -> None:
+    """Остановка фоновых задач присутствия"""
+    global _reaper_task
+    
+    if _reaper_task is not None:
+        _reaper_task.cancel()
+        try:
+            await _reaper_task
+        except asyncio.CancelledError:
+            pass
+        _reaper_task = None
+    
+    await history.stop()
@@ -0,0 +1,160 @@
+"""
+Снимок прав доступа к комнате для отправки и чтения сообщений.
+
+Отправка и чтение сообщений проверяют, что комната существует и
+активна, и что отправитель в ней присутствует, а is_owner требует
+владельца комнаты. Вместо запроса к rooms на каждое сообщение эти
+данные берутся из снимка в Redis:
+- hash ROOM_ACCESS_KEY: активность комнаты и ее владелец;
+- состав комнаты - sorted set присутствия (app/services/presence.py),
+  который уже обновляют вход, выход, heartbeat и удаление комнаты.
+
+Оба ключа читаются одним pipeline, поэтому проверка стоит один
+запрос к Redis. Снимок комнаты записывается при создании и удалении
+комнаты; при промахе он загружается из БД и записывается, только
+если его не успел записать обработчик удаления (иначе загрузка,
+начатая до удаления, вернула бы комнату активной).
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.redis import get_redis_client
+from app.models.room import Room
+from app.services import presence
+
+logger = logging.getLogger(__name__)
+
+# Снимок комнаты: active ("1"/"0") и owner_id; для несуществующей
+# комнаты - missing ("1")
+ROOM_ACCESS_KEY = "room:access:{room_id}"
+
+# Запись загруженного из БД снимка, если его нет
+STORE_IF_ABSENT_SCRIPT = """
+if redis.call("exists", KEYS[1]) == 1 then
+    return 0
+end
+redis.call("hset", KEYS[1], unpack(ARGV, 2))
+redis.call("expire", KEYS[1], ARGV[1])
+return 1
+"""
+
+
+@dataclass
+class RoomAccess:
+    """Снимок комнаты и присутствие пользователя в ней"""
+    room_id: int
+    owner_id: int
+    is_active: bool
+    # None, если присутствие не проверялось
+    is_member: Optional[bool] = None
+    
+    def is_owner(self, user_id: int) -> bool:
+        """Является ли пользователь владельцем комнаты"""
+        return user_id == self.owner_id
+
+
+def _fields(owner_id: Optional[int], is_active: bool) -> dict:
+    """Поля hash снимка (owner_id None - комнаты нет)"""
+    if owner_id is None:
+        return {"missing": "1"}
+    return {"active": "1" if is_active else "0", "owner_id": owner_id}
+
+
+async def store_room_access(room_id: int, owner_id: int, is_active: bool) -> None:
+    """
+    Запись снимка комнаты при создании и удалении.
+    Ошибка Redis не прерывает операцию: снимок истечет через ROOM_ACCESS_TTL_SECONDS.
+    """
+    key = ROOM_ACCESS_KEY.format(room_id=room_id)
+    try:
+        async with get_redis_client().pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping=_fields(owner_id, is_active))
+            pipe.expire(key, settings.ROOM_ACCESS_TTL_SECONDS)
+            await pipe.execute()
+    except RedisError as e:
+        logger.error(f"Ошибка записи снимка комнаты {room_id}: {e}")
+
+
+async def load_room_access(db: AsyncSession, room_id: int) -> Optional[RoomAccess]:
+    """Снимок комнаты из БД (None - комнаты нет)"""
+    row = (await db.execute(
+        select(Room.owner_id, Room.is_active).where(Room.id == room_id)
+    )).first()
+    if row is None:
+        return None
+    return RoomAccess(room_id=room_id, owner_id=row.owner_id, is_active=bool(row.is_active))
+
+
+async def _load_and_store(db: AsyncSession, room_id: int) -> Optional[RoomAccess]:
+    """Загрузка снимка комнаты из БД и запись в Redis, если его там нет"""
+    access = await load_room_access(db, room_id)
+    
+    if access is None:
+        fields = _fields(None, False)
+        ttl = settings.ROOM_ACCESS_MISSING_TTL_SECONDS
+    else:
+        fields = _fields(access.owner_id, access.is_active)
+        ttl = settings.ROOM_ACCESS_TTL_SECONDS
+    
+    args = [item for pair in fields.items() for item in pair]
+    try:
+        await get_redis_client().eval(
+            STORE_IF_ABSENT_SCRIPT, 1, ROOM_ACCESS_KEY.format(room_id=room_id), ttl, *args
+        )
+    except RedisError as e:
+        logger.error(f"Ошибка записи снимка комнаты {room_id}: {e}")
+    
+    return access
+
+
+async def get_room_access(
+    db: AsyncSession,
+    room_id: int,
+    member_id: Optional[int] = None
+) -> Optional[RoomAccess]:
+    """
+    Снимок комнаты и, если указан member_id, присутствие пользователя.
+    
+    Без member_id при недоступности Redis снимок читается из БД.
+    С member_id ошибка Redis пробрасывается: присутствие хранится только в Redis.
+    
+    Returns:
+        Снимок или None, если комнаты нет
+    """
+    key = ROOM_ACCESS_KEY.format(room_id=room_id)
+    
+    try:
+        async with get_redis_client().pipeline(transaction=False) as pipe:
+            pipe.hgetall(key)
+            if member_id is not None:
+                pipe.zscore(presence.PRESENCE_KEY.format(room_id=room_id), member_id)
+            fields, *member = await pipe.execute()
+    except RedisError as e:
+        if member_id is not None:
+            raise
+        logger.error(f"Ошибка чтения снимка комнаты {room_id}: {e}")
+        fields = {}
+        member = []
+    
+    if not fields:
+        access = await _load_and_store(db, room_id)
+    elif fields.get("missing"):
+        access = None
+    else:
+        access = RoomAccess(
+            room_id=room_id,
+            owner_id=int(fields["owner_id"]),
+            is_active=fields["active"] == "1"
+        )
+    
+    if access is not None and member:
+        access.is_member = presence.is_active_score(member[0])
+    return access
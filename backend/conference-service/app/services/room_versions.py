@@ -0,0 +1,124 @@
+"""
+Версии данных комнаты для условных запросов (ETag / 304).
+
+Hash ROOM_VERSION_KEY хранит два счетчика комнаты:
+- VERSION_ROOM - состав участников и активность комнаты (RoomDetail);
+- VERSION_MESSAGES - история сообщений (MessagesListResponse).
+
+Счетчик увеличивается после каждого изменения (вход, выход, удаление
+участника без heartbeat, закрытие комнаты, новое сообщение), и ETag
+ответа строится из версии, прочитанной до загрузки данных. Поэтому
+совпадение If-None-Match с текущим ETag означает, что данные не
+менялись, и endpoint отвечает 304 без обращения к PostgreSQL.
+
+Начальное значение счетчика случайное: после потери ключа (TTL,
+очистка Redis) новые ETag не совпадают с ETag, сохраненными клиентами.
+Участник без heartbeat пропадает из ответа с полными данными сразу по
+таймауту, а версия меняется при его удалении reaper, поэтому клиент с
+ETag видит его не дольше PRESENCE_REAP_INTERVAL_SECONDS.
+"""
+
+import logging
+import random
+from typing import Optional
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.db.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Версии комнаты
+ROOM_VERSION_KEY = "room:version:{room_id}"
+VERSION_ROOM = "room"
+VERSION_MESSAGES = "messages"
+
+# Увеличение версий из ARGV[3..]; отсутствующая версия получает
+# случайное начальное значение ARGV[2]
+BUMP_SCRIPT = """
+for i = 3, #ARGV do
+    if redis.call("hexists", KEYS[1], ARGV[i]) == 1 then
+        redis.call("hincrby", KEYS[1], ARGV[i], 1)
+    else
+        redis.call("hset", KEYS[1], ARGV[i], ARGV[2])
+    end
+end
+redis.call("expire", KEYS[1], ARGV[1])
+return 1
+"""
+
+# Текущая версия; отсутствующая создается со случайным значением ARGV[2]
+GET_SCRIPT = """
+local version = redis.call("hget", KEYS[1], ARGV[3])
+if not version then
+    version = ARGV[2]
+    redis.call("hset", KEYS[1], ARGV[3], version)
+    redis.call("expire", KEYS[1], ARGV[1])
+end
+return version
+"""
+
+
+def _initial_version() -> int:
+    """Случайное начальное значение версии"""
+    return random.getrandbits(48)
+
+
+async def bump(room_id: int, *kinds: str) -> None:
+    """
+    Увеличение версий комнаты после изменения ее данных.
+    Ошибка Redis не прерывает операцию: изменение уже выполнено.
+    """
+    try:
+        await get_redis_client().eval(
+            BUMP_SCRIPT, 1, ROOM_VERSION_KEY.format(room_id=room_id),
+            settings.ROOM_VERSION_TTL_SECONDS, _initial_version(), *kinds
+        )
+    except RedisError as e:
+        logger.error(f"Ошибка обновления версии комнаты {room_id}: {e}")
+
+
+async def get_version(room_id: int, kind: str) -> Optional[str]:
+    """
+    Текущая версия данных комнаты.
+    Читается до загрузки данных; None - Redis недоступен, ETag не выдается.
+    """
+    try:
+        return await get_redis_client().eval(
+            GET_SCRIPT, 1, ROOM_VERSION_KEY.format(room_id=room_id),
+            settings.ROOM_VERSION_TTL_SECONDS, _initial_version(), kind
+        )
+    except RedisError as e:
+        logger.error(f"Ошибка чтения версии комнаты {room_id}: {e}")
+        return None
+
+
+def make_etag(room_id: int, kind: str, version: str) -> str:
+    """
+    Слабый ETag: nginx при сжатии ответа заменяет сильные ETag слабыми,
+    а для опроса достаточно семантической эквивалентности
+    """
+    return f'W/"{kind}-{room_id}-{version}"'
+
+
+def cache_headers(etag: str) -> dict:
+    """
+    Заголовки ответа с версией: клиент хранит ответ, но перед
+    использованием всегда проверяет его запросом с If-None-Match
+    """
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Совпадает ли ETag с заголовком If-None-Match (слабое сравнение)"""
+    if not if_none_match:
+        return False
+    
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.removeprefix("W/") == etag.removeprefix("W/"):
+            return True
+    return False
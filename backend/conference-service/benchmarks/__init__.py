@@ -0,0 +1 @@
+# Бенчмарки и регрессионные проверки производительности
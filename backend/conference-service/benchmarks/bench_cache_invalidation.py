@@ -0,0 +1,107 @@
+"""
+Бенчмарк стоимости инвалидации кэша в зависимости от размера keyspace.
+
+Сравнивает старую инвалидацию через KEYS <pattern> + DEL с инвалидацией
+пространства имен одним INCR счетчика поколения. Для каждого размера
+keyspace заполняет базу Redis посторонними ключами и ключами списка
+комнат, затем замеряет время обеих операций.
+
+Требует запущенный Redis. Использует отдельную базу (по умолчанию 15)
+и очищает ее перед каждым замером.
+
+Запуск из каталога сервиса:
+    python -m benchmarks.bench_cache_invalidation --sizes 10000 100000 1000000
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+import redis
+
+from app.core.config import settings
+from app.db import redis as cache
+
+# Ключей в инвалидируемом пространстве имен (страницы списка комнат)
+NAMESPACE_KEYS = 100
+
+# Размер пачки при заполнении Redis
+FILL_BATCH_SIZE = 10000
+
+
+def fill(client: redis.Redis, size: int) -> None:
+    """Заполнение базы посторонними ключами и ключами пространства rooms"""
+    client.flushdb()
+    
+    for start in range(0, size, FILL_BATCH_SIZE):
+        pipe = client.pipeline(transaction=False)
+        for i in range(start, min(start + FILL_BATCH_SIZE, size)):
+            pipe.set(f"bench:other:{i}", "x", ex=3600)
+        pipe.execute()
+
+
+def fill_namespace(client: redis.Redis) -> None:
+    """Заполнение текущего поколения пространства rooms"""
+    pipe = client.pipeline(transaction=False)
+    for i in range(NAMESPACE_KEYS):
+        pipe.set(f"rooms:list:{i}:20:True", "[]", ex=3600)
+        pipe.set(cache.cache_key("rooms", "list", i, 20, True), "[]", ex=3600)
+    pipe.execute()
+
+
+def measure(func, repeats: int) -> float:
+    """Медианное время выполнения в миллисекундах"""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def keys_invalidation(client: redis.Redis) -> None:
+    """Старый способ: KEYS по паттерну и удаление найденных ключей"""
+    fill_namespace(client)
+    keys = client.keys("rooms:*")
+    if keys:
+        client.delete(*keys)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--db", type=int, default=15, help="База Redis для бенчмарка (будет очищена)")
+    args = parser.parse_args()
+    
+    client = redis.Redis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=args.db,
+        decode_responses=True
+    )
+    client.ping()
+    
+    # Функции кэша сервиса работают с той же базой
+    cache.redis_client = client
+    
+    print(f"{'keys':>10} | {'KEYS+DEL, ms':>12} | {'INCR, ms':>9}")
+    print("-" * 38)
+    
+    for size in args.sizes:
+        fill(client, size)
+        
+        # Заполнение пространства входит в замер KEYS, поэтому вычитаем его
+        fill_cost = measure(lambda: fill_namespace(client), args.repeats)
+        keys_cost = measure(lambda: keys_invalidation(client), args.repeats) - fill_cost
+        incr_cost = measure(lambda: cache.cache_invalidate_namespace("rooms"), args.repeats)
+        
+        print(f"{size:>10} | {keys_cost:>12.3f} | {incr_cost:>9.3f}")
+    
+    client.flushdb()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Нагрузочный бенчмарк потолка параллельности сервиса.
+
+Для каждого уровня параллельности держит N одновременных запросов
+к указанному URL в течение заданного времени и печатает пропускную
+способность и задержки. Потолок - уровень, после которого пропускная
+способность перестает расти, а растет только задержка.
+
+Синхронные endpoints упирались в пул потоков Starlette (40 потоков),
+асинхронные - в размер пула соединений БД (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+Для сравнения запустите бенчмарк на версии до и после перехода на
+асинхронный слой БД.
+
+Запуск из каталога сервиса (сервис должен быть запущен):
+    python -m benchmarks.bench_concurrency \\
+        --url http://localhost:8002/api/rooms --token <JWT> \\
+        --concurrency 10 20 40 80 160 --duration 10
+
+Подходит и для auth-service, например --url http://localhost:8001/api/auth/me.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+# Рост пропускной способности меньше этой доли считается насыщением
+SATURATION_GAIN = 0.10
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Перцентиль q (0..100) по отсортированной выборке"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    url: str,
+    headers: Dict[str, str],
+    concurrency: int,
+    duration: float
+) -> Dict[str, float]:
+    """Нагрузка с фиксированным числом одновременных запросов"""
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    
+    async def worker() -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await client.get(url, headers=headers)
+                if response.status_code >= 400:
+                    errors += 1
+                    continue
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        "mean": (statistics.mean(latencies) * 1000) if latencies else 0.0,
+        "errors": errors,
+    }
+
+
+def find_ceiling(results: List[Dict[str, float]]) -> Optional[int]:
+    """Первый уровень, после которого пропускная способность не растет"""
+    for previous, current in zip(results, results[1:]):
+        if current["rps"] < previous["rps"] * (1 + SATURATION_GAIN):
+            return int(previous["concurrency"])
+    return None
+
+
+async def run(args: argparse.Namespace) -> int:
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    max_concurrency = max(args.concurrency)
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+    
+    results = []
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        # Прогрев соединений и кэшей
+        await run_level(client, args.url, headers, min(args.concurrency), 1.0)
+        
+        print(f"{'concurrency':>11} {'rps':>9} {'p50 ms':>9} {'p99 ms':>9} {'mean ms':>9} {'errors':>7}")
+        for concurrency in sorted(args.concurrency):
+            result = await run_level(client, args.url, headers, concurrency, args.duration)
+            results.append(result)
+            print(
+                f"{result['concurrency']:>11} {result['rps']:>9.1f} {result['p50']:>9.1f} "
+                f"{result['p99']:>9.1f} {result['mean']:>9.1f} {result['errors']:>7}"
+            )
+    
+    ceiling = find_ceiling(results)
+    if ceiling is None:
+        print("Потолок не достигнут: увеличьте уровни параллельности")
+    else:
+        print(f"Потолок параллельности: ~{ceiling} одновременных запросов")
+    
+    return 1 if any(result["errors"] for result in results) else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="URL для GET запросов")
+    parser.add_argument("--token", help="JWT токен для заголовка Authorization")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 20, 40, 80, 160])
+    parser.add_argument("--duration", type=float, default=10.0, help="Секунд на уровень")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Таймаут запроса")
+    args = parser.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
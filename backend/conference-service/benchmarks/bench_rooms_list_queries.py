@@ -0,0 +1,123 @@
+"""
+Регрессионный бенчмарк количества SQL запросов в GET /api/rooms.
+
+Заполняет SQLite в памяти комнатами, выполняет запросы списка комнат
+с промахом кэша и считает SQL запросы на один HTTP запрос. Количество
+участников читается из счетчиков присутствия в Redis, поэтому они
+подменяются заранее известными значениями, а бенчмарк проверяет, что
+счетчики попадают в ответ без дополнительных SQL запросов.
+Завершается с ненулевым кодом, если запросов больше допустимого.
+
+Запуск из каталога сервиса:
+    python -m benchmarks.bench_rooms_list_queries --rooms 100 --participants 5
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.main import app
+from app.api import rooms as rooms_api
+from app.api.deps import get_current_user, CurrentUser
+from app.db.database import Base, get_db
+from app.models.room import Room
+
+# Допустимое количество SQL запросов на один запрос списка комнат
+MAX_STATEMENTS_PER_REQUEST = 1
+
+
+async def seed(session, rooms: int) -> None:
+    """Создание комнат"""
+    for i in range(rooms):
+        session.add(Room(name=f"Room {i}", owner_id=1, is_active=True))
+    await session.commit()
+
+
+async def run(args: argparse.Namespace) -> int:
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    
+    async with Session() as session:
+        await seed(session, args.rooms)
+    
+    statements = []
+    
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    async def override_get_db():
+        async with Session() as db:
+            yield db
+    
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: CurrentUser(user_id=1, email="bench@example.com")
+    
+    # Каждый запрос должен проходить мимо кэша
+    async def cache_key(namespace, *parts):
+        return ":".join([namespace, *map(str, parts)])
+    
+    async def cache_get_or_set(key, loader, ttl, stale_ttl=None):
+        return await loader()
+    
+    rooms_api.cache_key = cache_key
+    rooms_api.cache_get_or_set = cache_get_or_set
+    
+    # Счетчики присутствия: у комнаты с ID n - n % participants участников
+    async def count_participants(room_ids):
+        return {room_id: room_id % args.participants for room_id in room_ids}
+    
+    rooms_api.presence.count_participants = count_participants
+    
+    # ASGITransport не запускает lifespan, Redis не нужен
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    transport = httpx.ASGITransport(app=app)
+    limit = min(args.rooms, 100)
+    
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            response = await client.get("/api/rooms", params={"limit": limit})
+            response.raise_for_status()
+        elapsed = time.perf_counter() - started
+    await engine.dispose()
+    
+    per_request = len(statements) / args.requests
+    counts_ok = all(
+        room["participants_count"] == room["id"] % args.participants
+        for room in response.json()
+    )
+    
+    print(f"rooms per page:           {limit}")
+    print(f"SQL statements / request: {per_request:.1f}")
+    print(f"avg latency:              {elapsed / args.requests * 1000:.2f} ms")
+    print(f"participant counts ok:    {counts_ok}")
+    
+    if per_request > MAX_STATEMENTS_PER_REQUEST or not counts_ok:
+        print(f"FAIL: ожидалось не более {MAX_STATEMENTS_PER_REQUEST} запросов и корректные счетчики")
+        return 1
+    
+    print("OK")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=100)
+    parser.add_argument("--participants", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
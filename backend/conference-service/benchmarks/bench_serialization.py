@@ -0,0 +1,184 @@
+"""
+Бенчмарк CPU на сериализацию страницы истории сообщений.
+
+Сравнивает ответ GET /api/rooms/{room_id}/messages с кэшированной
+страницей до и после перехода на orjson:
+- before - прежний путь: MessageResponse(**msg) для каждого сообщения,
+  проверка response_model, jsonable_encoder и json.dumps (JSONResponse);
+- after - текущий endpoint: страница, проверенная схемой при загрузке,
+  отдается из кэша через ORJSONResponse.
+
+Оба варианта выполняются одним приложением (те же middleware), кэш,
+доступ к комнате и версия подменяются, поэтому измеряется только
+обработка ответа. Время - процессорное (time.process_time) на запрос.
+Завершается с ненулевым кодом, если ответы различаются или after
+не быстрее before в MIN_SPEEDUP раз.
+
+Запуск из каталога сервиса:
+    python -m benchmarks.bench_serialization --messages 200 --requests 200
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from fastapi.responses import JSONResponse
+
+from app.main import app
+from app.api import messages as messages_api
+from app.api.deps import get_current_user, CurrentUser
+from app.db.database import get_db
+from app.schemas.message import MessageResponse, MessagesListResponse
+from app.services.room_access import RoomAccess
+
+# Минимальное ускорение сериализации страницы
+MIN_SPEEDUP = 1.5
+
+ROOM_ID = 1
+OWNER_ID = 1
+
+
+def make_rows(count: int) -> list:
+    """Сообщения страницы в виде полей строк БД"""
+    started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "id": i + 1,
+            "room_id": ROOM_ID,
+            "user_id": i % 7 + 1,
+            "user_display_name": f"Участник {i % 7 + 1}",
+            "content": f"Сообщение {i + 1}: " + "текст " * 10,
+            "created_at": started + timedelta(seconds=i * 13, microseconds=i * 1001),
+        }
+        for i in range(count)
+    ]
+
+
+def through_cache(value: dict) -> dict:
+    """Значение после записи в Redis и чтения (как cache_get_or_set)"""
+    return json.loads(json.dumps(value, default=str))
+
+
+def legacy_page(rows: list) -> dict:
+    """Кэшируемая страница в прежнем виде (model_dump каждого сообщения)"""
+    return through_cache({
+        "messages": [MessageResponse(
+            is_owner=row["user_id"] == OWNER_ID,
+            **row
+        ).model_dump() for row in rows],
+        "total": None,
+        "has_more": True
+    })
+
+
+def current_page(rows: list) -> dict:
+    """Кэшируемая страница в текущем виде (load_messages)"""
+    return through_cache(MessagesListResponse(
+        messages=[{**row, "is_owner": row["user_id"] == OWNER_ID} for row in rows],
+        total=None,
+        has_more=True
+    ).model_dump(mode="json"))
+
+
+async def measure(client: httpx.AsyncClient, url: str, requests: int) -> tuple:
+    """Процессорное время на запрос и тело последнего ответа"""
+    # Прогрев
+    for _ in range(10):
+        (await client.get(url)).raise_for_status()
+    
+    started = time.process_time()
+    for _ in range(requests):
+        response = await client.get(url)
+        response.raise_for_status()
+    elapsed = time.process_time() - started
+    return elapsed / requests, response
+
+
+async def run(args: argparse.Namespace) -> int:
+    rows = make_rows(args.messages)
+    legacy = legacy_page(rows)
+    current = current_page(rows)
+    
+    # Прежний endpoint: модели из кэшированной страницы и response_model
+    async def legacy_get_messages(room_id: int):
+        return MessagesListResponse(
+            messages=[MessageResponse(**msg) for msg in legacy["messages"]],
+            total=legacy["total"],
+            has_more=legacy["has_more"]
+        )
+    
+    app.add_api_route(
+        "/bench/legacy/{room_id}/messages",
+        legacy_get_messages,
+        response_model=MessagesListResponse,
+        response_class=JSONResponse
+    )
+    
+    # Текущий endpoint без БД, Redis и проверки версии
+    async def get_room_access(db, room_id, member_id=None):
+        return RoomAccess(room_id=room_id, owner_id=OWNER_ID, is_active=True)
+    
+    async def cache_key(namespace, *parts):
+        return ":".join([namespace, *map(str, parts)])
+    
+    async def cache_get_or_set(key, loader, ttl, stale_ttl=None):
+        return current
+    
+    async def get_version(room_id, kind):
+        return None
+    
+    async def override_get_db():
+        yield None
+    
+    messages_api.get_room_access = get_room_access
+    messages_api.cache_key = cache_key
+    messages_api.cache_get_or_set = cache_get_or_set
+    messages_api.room_versions.get_version = get_version
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: CurrentUser(user_id=OWNER_ID, email="bench@example.com")
+    
+    # ASGITransport не запускает lifespan, Redis не нужен
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    transport = httpx.ASGITransport(app=app)
+    
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        before, before_response = await measure(
+            client, f"/bench/legacy/{ROOM_ID}/messages", args.requests
+        )
+        after, after_response = await measure(
+            client, f"/api/rooms/{ROOM_ID}/messages", args.requests
+        )
+    
+    same_body = before_response.json() == after_response.json()
+    speedup = before / after if after else float("inf")
+    
+    print(f"messages per page:     {args.messages}")
+    print(f"response size:         {len(after_response.content)} bytes")
+    print(f"CPU / request before:  {before * 1000:.3f} ms")
+    print(f"CPU / request after:   {after * 1000:.3f} ms")
+    print(f"speedup:               {speedup:.1f}x")
+    print(f"same response body:    {same_body}")
+    
+    if not same_body or speedup < MIN_SPEEDUP:
+        print(f"FAIL: ожидались одинаковые ответы и ускорение не менее {MIN_SPEEDUP}x")
+        return 1
+    
+    print("OK")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
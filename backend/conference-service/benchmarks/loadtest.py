@@ -0,0 +1,605 @@
+"""
+Нагрузочный тест полного пути запросов с базовой линией.
+
+Моделирует трафик клиентов frontend:
+- шторм входов: все пользователи входят в течение --login-ramp секунд
+  (POST /api/auth/login и GET /api/auth/me);
+- просмотр списка комнат: --browsers пользователей открывают список
+  и карточку случайной комнаты раз в --browse-interval секунд;
+- комнаты: в каждой из --rooms комнат --participants участников
+  входят в комнату в течение --join-ramp секунд и, как room.js без WebSocket, опрашивают сообщения
+  каждые 1.5 с и комнату каждые 5 с, шлют heartbeat каждые 15 с и
+  сообщение раз в --message-interval секунд. Запросы по таймеру не
+  ждут ответа на предыдущий (как setInterval). Опрос, как api.js,
+  повторяет ETag прошлого ответа в If-None-Match. С --long-poll
+  сообщения, как в room.js, запрашиваются длинным опросом (wait=25,
+  следующий запрос сразу после ответа); такие запросы учитываются
+  отдельным endpoint с суффиксом " (wait)", как в метках маршрутов
+  сервиса.
+
+Для каждого endpoint печатает число запросов, пропускную способность,
+p50/p95/p99 задержки, ошибки, долю ответов 304 и SQL запросы на один запрос (разница
+счетчиков *_db_queries_total из /metrics сервисов до и после теста).
+Результат сравнивается с базовой линией (loadtest_baseline.json, раздел
+режима), при регрессии или ошибках тест завершается с ненулевым кодом.
+
+Режимы:
+- по умолчанию - запросы к запущенному docker-compose через gateway
+  (--target), метрики SQL берутся с портов сервисов (--metrics-url);
+- --in-process - conference-service в процессе теста (ASGITransport),
+  PostgreSQL заменяется SQLite, Redis - fakeredis (нужны aiosqlite и
+  fakeredis[lua]). Auth-service в этом режиме нет, шторм входов
+  пропускается, а пользователь передается заголовком.
+
+Запуск из каталога сервиса:
+    python -m benchmarks.loadtest --in-process
+    python -m benchmarks.loadtest --target http://localhost:8000 --duration 60
+    python -m benchmarks.loadtest --in-process --update-baseline
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+# Базовые линии режимов
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "loadtest_baseline.json")
+
+# Интервалы опроса room.js (секунды)
+MESSAGES_POLL_INTERVAL = 1.5
+MESSAGES_WAIT = 25
+ROOM_POLL_INTERVAL = 5.0
+HEARTBEAT_INTERVAL = 15.0
+
+# Пароль пользователей теста в режиме docker-compose
+PASSWORD = "loadtest-password"
+
+# Суффикс счетчиков SQL запросов сервисов
+DB_QUERIES_METRIC = "_db_queries"
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Перцентиль q (0..100) по отсортированной выборке"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+@dataclass
+class User:
+    """Пользователь теста, заголовки его запросов и ETag полученных ответов"""
+    user_id: int
+    email: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    etags: Dict[str, str] = field(default_factory=dict)
+
+
+class Recorder:
+    """Задержки и ошибки по endpoint (метод и шаблон маршрута)"""
+    
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.not_modified: Dict[str, int] = defaultdict(int)
+    
+    async def request(
+        self,
+        method: str,
+        route: str,
+        user: Optional[User] = None,
+        path_params: Optional[dict] = None,
+        conditional: bool = False,
+        label: str = "",
+        **kwargs
+    ) -> Optional[httpx.Response]:
+        """
+        Запрос с записью задержки; при ошибке возвращает None.
+        conditional - запрос с If-None-Match по ETag прошлого ответа на тот же URL,
+        label - суффикс endpoint в результатах
+        """
+        endpoint = f"{method} {route}{label}"
+        url = route.format(**(path_params or {}))
+        headers = dict(user.headers) if user is not None else {}
+        
+        cache_key = f"{url}?{httpx.QueryParams(kwargs.get('params'))}"
+        if conditional and cache_key in user.etags:
+            headers["If-None-Match"] = user.etags[cache_key]
+        
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            self.errors[endpoint] += 1
+            return None
+        
+        if response.status_code >= 400:
+            self.errors[endpoint] += 1
+            return None
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        
+        if response.status_code == 304:
+            self.not_modified[endpoint] += 1
+        elif conditional and "etag" in response.headers:
+            user.etags[cache_key] = response.headers["etag"]
+        return response
+
+
+async def every(interval: float, deadline: float, action: Callable[[], Awaitable[None]]) -> None:
+    """
+    Вызов action каждые interval секунд до deadline, как setInterval:
+    следующий вызов не ждет завершения предыдущего. Первый вызов
+    смещен случайно, чтобы клиенты не опрашивали сервер синхронно.
+    """
+    loop = asyncio.get_running_loop()
+    next_at = loop.time() + random.uniform(0, interval)
+    tasks = set()
+    
+    while next_at < deadline:
+        await asyncio.sleep(max(0.0, next_at - loop.time()))
+        task = asyncio.create_task(action())
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        next_at += interval
+    
+    await asyncio.gather(*tasks)
+
+
+async def participant(recorder: Recorder, room_id: int, user: User, deadline: float, args) -> None:
+    """Участник комнаты: вход, опрос сообщений и комнаты, heartbeat, сообщения"""
+    params = {"room_id": room_id}
+    
+    # Участники открывают комнату не одновременно
+    await asyncio.sleep(random.uniform(0, args.join_ramp))
+    if await recorder.request("POST", "/api/rooms/{room_id}/join", user, params) is None:
+        return
+    
+    # Первая загрузка: комната и последние сообщения
+    await recorder.request("GET", "/api/rooms/{room_id}", user, params)
+    response = await recorder.request("GET", "/api/rooms/{room_id}/messages", user, params)
+    last_id = 0
+    if response is not None and response.json()["messages"]:
+        last_id = response.json()["messages"][-1]["id"]
+    
+    async def poll_messages() -> None:
+        nonlocal last_id
+        response = await recorder.request(
+            "GET", "/api/rooms/{room_id}/messages", user, params, conditional=True, params={"after_id": last_id}
+        )
+        if response is not None and response.status_code == 200 and response.json()["messages"]:
+            last_id = max(last_id, response.json()["messages"][-1]["id"])
+    
+    async def long_poll_messages() -> None:
+        nonlocal last_id
+        loop = asyncio.get_running_loop()
+        while (remaining := deadline - loop.time()) >= 1:
+            response = await recorder.request(
+                "GET", "/api/rooms/{room_id}/messages", user, params, conditional=True, label=" (wait)",
+                params={"after_id": last_id, "wait": min(MESSAGES_WAIT, int(remaining))}
+            )
+            if response is None:
+                await asyncio.sleep(MESSAGES_POLL_INTERVAL)
+            elif response.status_code == 200 and response.json()["messages"]:
+                last_id = max(last_id, response.json()["messages"][-1]["id"])
+    
+    async def poll_room() -> None:
+        await recorder.request("GET", "/api/rooms/{room_id}", user, params, conditional=True)
+    
+    async def heartbeat() -> None:
+        await recorder.request("POST", "/api/rooms/{room_id}/heartbeat", user, params)
+    
+    async def send_message() -> None:
+        await recorder.request(
+            "POST", "/api/rooms/{room_id}/messages", user, params,
+            json={"content": f"loadtest message from {user.user_id}"}
+        )
+    
+    loops = [
+        long_poll_messages() if args.long_poll else every(MESSAGES_POLL_INTERVAL, deadline, poll_messages),
+        every(ROOM_POLL_INTERVAL, deadline, poll_room),
+        every(HEARTBEAT_INTERVAL, deadline, heartbeat),
+    ]
+    if args.message_interval > 0:
+        loops.append(every(args.message_interval, deadline, send_message))
+    await asyncio.gather(*loops)
+    
+    await recorder.request("POST", "/api/rooms/{room_id}/leave", user, params)
+
+
+async def browser(recorder: Recorder, room_ids: List[int], user: User, deadline: float, args) -> None:
+    """Просмотр списка комнат и карточки случайной комнаты"""
+    async def browse() -> None:
+        await recorder.request(
+            "GET", "/api/rooms", user, params={"skip": 0, "limit": 20, "only_active": True}
+        )
+        await recorder.request("GET", "/api/rooms/{room_id}", user, {"room_id": random.choice(room_ids)})
+    
+    await every(args.browse_interval, deadline, browse)
+
+
+async def login_storm(recorder: Recorder, users: List[User], ramp: float) -> None:
+    """Вход всех пользователей в течение ramp секунд"""
+    async def login(user: User) -> None:
+        await asyncio.sleep(random.uniform(0, ramp))
+        response = await recorder.request(
+            "POST", "/api/auth/login", json={"email": user.email, "password": PASSWORD}
+        )
+        if response is None:
+            return
+        user.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        await recorder.request("GET", "/api/auth/me", user)
+    
+    await asyncio.gather(*(login(user) for user in users))
+
+
+async def register_users(client: httpx.AsyncClient, count: int) -> List[User]:
+    """Регистрация пользователей теста (уже существующие пропускаются)"""
+    users = [User(user_id=i, email=f"loadtest{i}@example.com") for i in range(count)]
+    
+    async def register(user: User) -> None:
+        response = await client.post("/api/auth/register", json={
+            "email": user.email,
+            "display_name": f"loadtest{user.user_id}",
+            "password": PASSWORD,
+        })
+        # 400 - пользователь зарегистрирован предыдущим запуском
+        if response.status_code not in (201, 400):
+            response.raise_for_status()
+    
+    # Регистрация не входит в замер, поэтому без шторма bcrypt
+    semaphore = asyncio.Semaphore(8)
+    
+    async def limited(user: User) -> None:
+        async with semaphore:
+            await register(user)
+    
+    await asyncio.gather(*(limited(user) for user in users))
+    return users
+
+
+async def create_rooms(recorder: Recorder, owner: User, count: int) -> List[int]:
+    """Создание комнат теста (не входит в замер)"""
+    room_ids = []
+    for i in range(count):
+        response = await recorder.client.post(
+            "/api/rooms", json={"name": f"Loadtest room {i}"}, headers=owner.headers
+        )
+        response.raise_for_status()
+        room_ids.append(response.json()["id"])
+    return room_ids
+
+
+def parse_db_queries(text: str) -> Dict[str, float]:
+    """Счетчики SQL запросов по endpoint из текста /metrics"""
+    counts: Dict[str, float] = defaultdict(float)
+    for family in text_string_to_metric_families(text):
+        if not family.name.endswith(DB_QUERIES_METRIC):
+            continue
+        for sample in family.samples:
+            if sample.name.endswith("_total"):
+                method = sample.labels["method"]
+                endpoint = f"{method} {sample.labels['route']}" if method else sample.labels["route"]
+                counts[endpoint] += sample.value
+    return counts
+
+
+class ComposeTarget:
+    """Сервисы docker-compose: запросы через gateway, метрики с портов сервисов"""
+    
+    mode = "compose"
+    
+    def __init__(self, args):
+        self.args = args
+    
+    async def __aenter__(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(max_connections=self.args.max_connections)
+        self.client = httpx.AsyncClient(base_url=self.args.target, limits=limits, timeout=self.args.timeout)
+        self.metrics_client = httpx.AsyncClient(timeout=self.args.timeout)
+        return self.client
+    
+    async def __aexit__(self, *exc) -> None:
+        await self.client.aclose()
+        await self.metrics_client.aclose()
+    
+    async def users(self, count: int) -> List[User]:
+        return await register_users(self.client, count)
+    
+    async def db_queries(self) -> Dict[str, float]:
+        counts: Dict[str, float] = defaultdict(float)
+        for url in self.args.metrics_url:
+            response = await self.metrics_client.get(url)
+            response.raise_for_status()
+            for endpoint, value in parse_db_queries(response.text).items():
+                counts[endpoint] += value
+        return counts
+
+
+class InProcessTarget:
+    """conference-service в процессе теста с SQLite и fakeredis вместо PostgreSQL и Redis"""
+    
+    mode = "in-process"
+    
+    def __init__(self, args):
+        self.args = args
+    
+    async def __aenter__(self) -> httpx.AsyncClient:
+        import fakeredis.aioredis
+        from fastapi import Header
+        from prometheus_client import generate_latest
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        
+        from app.main import app
+        from app.api.deps import get_current_user, CurrentUser
+        from app.db import database, redis as cache
+        from app.services import presence
+        from app.services.events import broker
+        
+        self._generate_latest = generate_latest
+        self._presence = presence
+        self._broker = broker
+        
+        # SQLite в файле: в памяти соединения пула не видят общих данных
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.engine = create_async_engine(
+            f"sqlite+aiosqlite:///{self._tmpdir.name}/loadtest.db",
+            poolclass=database.InstrumentedQueuePool,
+            connect_args={"timeout": 30}
+        )
+        database.count_queries(self.engine)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(database.Base.metadata.create_all)
+        
+        Session = async_sessionmaker(self.engine, autoflush=False, expire_on_commit=False)
+        database.engine = self.engine
+        presence.SessionLocal = Session
+        cache.redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        
+        async def override_get_db():
+            async with Session() as db:
+                yield db
+        
+        def override_get_current_user(x_loadtest_user: int = Header(...)) -> CurrentUser:
+            return CurrentUser(
+                user_id=x_loadtest_user,
+                email=f"loadtest{x_loadtest_user}@example.com",
+                display_name=f"loadtest{x_loadtest_user}"
+            )
+        
+        app.dependency_overrides[database.get_db] = override_get_db
+        app.dependency_overrides[get_current_user] = override_get_current_user
+        
+        # Запись истории входов/выходов, удаление участников без heartbeat
+        # и события комнат (пробуждают длинный опрос)
+        await presence.start_presence()
+        await broker.start()
+        
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        self.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://loadtest",
+            timeout=self.args.timeout
+        )
+        return self.client
+    
+    async def __aexit__(self, *exc) -> None:
+        await self.client.aclose()
+        await self._broker.stop()
+        await self._presence.stop_presence()
+        await self.engine.dispose()
+        self._tmpdir.cleanup()
+    
+    async def users(self, count: int) -> List[User]:
+        return [
+            User(user_id=i + 1, email=f"loadtest{i + 1}@example.com", headers={"X-Loadtest-User": str(i + 1)})
+            for i in range(count)
+        ]
+    
+    async def db_queries(self) -> Dict[str, float]:
+        return parse_db_queries(self._generate_latest().decode())
+
+
+def summarize(
+    recorder: Recorder,
+    queries_before: Dict[str, float],
+    queries_after: Dict[str, float],
+    durations: Dict[str, float]
+) -> Dict[str, dict]:
+    """Показатели по endpoint"""
+    results = {}
+    for endpoint in sorted(set(recorder.latencies) | set(recorder.errors)):
+        latencies = sorted(recorder.latencies[endpoint])
+        count = len(latencies)
+        queries = queries_after.get(endpoint, 0.0) - queries_before.get(endpoint, 0.0)
+        duration = durations["login"] if "/api/auth/" in endpoint else durations["steady"]
+        results[endpoint] = {
+            "requests": count,
+            "errors": recorder.errors[endpoint],
+            "rps": round(count / duration, 2) if duration else 0.0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "mean_ms": round(statistics.mean(latencies) * 1000, 2) if latencies else 0.0,
+            "not_modified": round(recorder.not_modified[endpoint] / count, 3) if count else 0.0,
+            "db_queries_per_request": round(queries / count, 3) if count else 0.0,
+        }
+    return results
+
+
+def print_results(results: Dict[str, dict], background_queries: float) -> None:
+    print(
+        f"{'endpoint':<40} {'requests':>8} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'p99 ms':>8} {'errors':>6} {'304':>5} {'db/req':>7}"
+    )
+    for endpoint, r in results.items():
+        print(
+            f"{endpoint:<40} {r['requests']:>8} {r['rps']:>7.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+            f"{r['p99_ms']:>8.1f} {r['errors']:>6} {r['not_modified']:>5.0%} {r['db_queries_per_request']:>7.2f}"
+        )
+    print(f"SQL запросов фоновых задач: {background_queries:.0f}")
+
+
+def scenario(args) -> dict:
+    """Параметры, от которых зависят результаты (должны совпадать с базовой линией)"""
+    return {
+        "rooms": args.rooms,
+        "participants": args.participants,
+        "browsers": args.browsers,
+        "duration": args.duration,
+        "join_ramp": args.join_ramp,
+        "browse_interval": args.browse_interval,
+        "message_interval": args.message_interval,
+        "long_poll": args.long_poll,
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], args) -> List[str]:
+    """Регрессии относительно базовой линии"""
+    regressions = []
+    for endpoint, current in results.items():
+        if current["errors"]:
+            regressions.append(f"{endpoint}: {current['errors']} ошибок")
+        
+        base = baseline.get(endpoint)
+        if base is None:
+            print(f"  нет в базовой линии: {endpoint}")
+            continue
+        
+        p95_limit = base["p95_ms"] * (1 + args.latency_tolerance) + args.latency_slack_ms
+        if current["p95_ms"] > p95_limit:
+            regressions.append(f"{endpoint}: p95 {current['p95_ms']:.1f} ms > {p95_limit:.1f} ms")
+        
+        queries_limit = base["db_queries_per_request"] * (1 + args.queries_tolerance) + 0.1
+        if current["db_queries_per_request"] > queries_limit:
+            regressions.append(
+                f"{endpoint}: SQL запросов на запрос {current['db_queries_per_request']:.2f} > {queries_limit:.2f}"
+            )
+        
+        rps_limit = base["rps"] * (1 - args.latency_tolerance)
+        if current["rps"] < rps_limit:
+            regressions.append(f"{endpoint}: {current['rps']:.1f} rps < {rps_limit:.1f}")
+    return regressions
+
+
+def load_baselines() -> dict:
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+async def run(args: argparse.Namespace) -> int:
+    random.seed(args.seed)
+    target = InProcessTarget(args) if args.in_process else ComposeTarget(args)
+    
+    async with target as client:
+        recorder = Recorder(client)
+        users = await target.users(args.rooms * args.participants + args.browsers)
+        queries_before = await target.db_queries()
+        durations = {"login": 0.0, "steady": 0.0}
+        
+        if not args.in_process:
+            started = time.perf_counter()
+            await login_storm(recorder, users, args.login_ramp)
+            durations["login"] = time.perf_counter() - started
+        
+        room_ids = await create_rooms(recorder, users[0], args.rooms)
+        participants = users[:args.rooms * args.participants]
+        browsers = users[args.rooms * args.participants:]
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + args.duration
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                participant(recorder, room_ids[i // args.participants], user, deadline, args)
+                for i, user in enumerate(participants)
+            ),
+            *(browser(recorder, room_ids, user, deadline, args) for user in browsers)
+        )
+        durations["steady"] = time.perf_counter() - started
+        
+        # Фоновая запись истории входов/выходов
+        await asyncio.sleep(1.0)
+        queries_after = await target.db_queries()
+    
+    results = summarize(recorder, queries_before, queries_after, durations)
+    background = queries_after.get("background", 0.0) - queries_before.get("background", 0.0)
+    print_results(results, background)
+    
+    # Длинный опрос меняет число и задержки запросов сообщений,
+    # поэтому его базовая линия хранится отдельно
+    mode = f"{target.mode}-long-poll" if args.long_poll else target.mode
+    
+    baselines = load_baselines()
+    if args.update_baseline:
+        baselines[mode] = {"scenario": scenario(args), "endpoints": results}
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Базовая линия {mode} сохранена в {BASELINE_PATH}")
+        return 0
+    
+    baseline = baselines.get(mode)
+    if baseline is None:
+        print(f"Нет базовой линии режима {mode}: сохраните ее с --update-baseline")
+        return 1 if any(r["errors"] for r in results.values()) else 0
+    
+    if baseline["scenario"] != scenario(args):
+        print(f"FAIL: параметры не совпадают с базовой линией {baseline['scenario']}")
+        return 2
+    
+    regressions = compare(results, baseline["endpoints"], args)
+    if regressions:
+        print("FAIL:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    
+    print("OK")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--in-process", action="store_true", help="conference-service в процессе теста")
+    parser.add_argument("--target", default="http://localhost:8000", help="URL gateway")
+    parser.add_argument(
+        "--metrics-url", nargs="+",
+        default=["http://localhost:8001/metrics", "http://localhost:8002/metrics"],
+        help="/metrics сервисов с БД"
+    )
+    parser.add_argument("--rooms", type=int, default=5)
+    parser.add_argument("--participants", type=int, default=10, help="Участников в комнате")
+    parser.add_argument("--browsers", type=int, default=20, help="Пользователей, просматривающих список")
+    parser.add_argument("--duration", type=float, default=30.0, help="Секунд основной нагрузки")
+    parser.add_argument("--login-ramp", type=float, default=2.0, help="Секунд, за которые входят все пользователи")
+    parser.add_argument("--join-ramp", type=float, default=5.0, help="Секунд, за которые участники входят в комнаты")
+    parser.add_argument("--browse-interval", type=float, default=5.0)
+    parser.add_argument("--message-interval", type=float, default=20.0, help="0 - без отправки сообщений")
+    parser.add_argument("--long-poll", action="store_true", help="Длинный опрос сообщений вместо опроса раз в 1.5 с")
+    parser.add_argument("--max-connections", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--latency-tolerance", type=float, default=0.5, help="Допустимый рост p95 и падение rps")
+    parser.add_argument("--latency-slack-ms", type=float, default=5.0, help="Допустимый рост p95 сверх доли")
+    parser.add_argument("--queries-tolerance", type=float, default=0.2, help="Допустимый рост SQL запросов на запрос")
+    parser.add_argument("--update-baseline", action="store_true", help="Сохранить результаты как базовую линию")
+    args = parser.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
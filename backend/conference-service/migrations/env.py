@@ -0,0 +1,75 @@
+"""
+Окружение Alembic для conference-service.
+
+При старте сервиса миграции запускает app/db/migrations.py и передает
+готовое соединение через config.attributes["connection"]. При ручном
+запуске (alembic upgrade head) соединение открывается здесь по
+настройкам сервиса.
+"""
+
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+from app.db.database import Base
+import app.models.room  # noqa: F401
+import app.models.participant  # noqa: F401
+import app.models.message  # noqa: F401
+
+config = context.config
+target_metadata = Base.metadata
+
+
+def do_run_migrations(connection: Connection) -> None:
+    """Применение миграций на открытом соединении"""
+    # Каждая миграция в своей транзакции: миграции с autocommit_block
+    # (CREATE INDEX CONCURRENTLY) фиксируют предыдущие шаги
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        transaction_per_migration=True
+    )
+    
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:
+    """Применение миграций через асинхронный движок сервиса"""
+    engine = create_async_engine(settings.DATABASE_URL)
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+        await connection.commit()
+    await engine.dispose()
+
+
+def run_migrations_offline() -> None:
+    """Генерация SQL без подключения к БД (alembic upgrade head --sql)"""
+    context.configure(
+        url=settings.DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        transaction_per_migration=True,
+    )
+    
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+connection = config.attributes.get("connection")
+
+if connection is not None:
+    do_run_migrations(connection)
+else:
+    if config.config_file_name is not None:
+        fileConfig(config.config_file_name)
+    
+    if context.is_offline_mode():
+        run_migrations_offline()
+    else:
+        asyncio.run(run_async_migrations())
@@ -0,0 +1,67 @@
+"""
+Исходная схема (таблицы в том виде, в котором их создавал create_tables)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 10:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "rooms",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("owner_id", sa.Integer(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_rooms_id", "rooms", ["id"])
+    op.create_index("ix_rooms_owner_id", "rooms", ["owner_id"])
+    
+    op.create_table(
+        "room_participants",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("room_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("user_display_name", sa.String(length=100), nullable=False),
+        sa.Column("status", sa.String(length=20), nullable=True),
+        sa.Column("join_time", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("leave_time", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["room_id"], ["rooms.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_room_participants_id", "room_participants", ["id"])
+    op.create_index("ix_room_participants_room_id", "room_participants", ["room_id"])
+    op.create_index("ix_room_participants_user_id", "room_participants", ["user_id"])
+    
+    op.create_table(
+        "messages",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("room_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("user_display_name", sa.String(length=100), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(["room_id"], ["rooms.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_messages_id", "messages", ["id"])
+    op.create_index("ix_messages_room_id", "messages", ["room_id"])
+    op.create_index("ix_messages_user_id", "messages", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("messages")
+    op.drop_table("room_participants")
+    op.drop_table("rooms")
@@ -0,0 +1,92 @@
+"""
+Составные и частичные индексы для частых запросов комнат, участников и сообщений
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 10:30:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def _create_index(name: str, table: str, columns: list, **kw) -> None:
+    """
+    Построение индекса без блокировки записи (CREATE INDEX CONCURRENTLY).
+    Прерванное построение оставляет невалидный индекс, он удаляется
+    и строится заново.
+    """
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql" and not op.get_context().as_sql:
+        invalid = bind.execute(
+            sa.text(
+                "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+                "WHERE pg_class.relname = :name AND NOT pg_index.indisvalid"
+            ),
+            {"name": name}
+        ).scalar()
+        if invalid:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True, **kw)
+
+
+def _drop_index(name: str, table: str) -> None:
+    """Удаление индекса без блокировки чтения и записи таблицы"""
+    op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
+
+
+def upgrade() -> None:
+    # Миграция применяется при старте сервиса на рабочей базе, поэтому
+    # индексы строятся CONCURRENTLY - вне транзакции и без блокировки
+    # записи. Новые индексы создаются до удаления заменяемых, чтобы
+    # запросы не оставались без индекса
+    with op.get_context().autocommit_block():
+        # Список комнат: ORDER BY created_at DESC, по умолчанию только активные
+        _create_index("ix_rooms_created_at", "rooms", ["created_at"])
+        _create_index(
+            "ix_rooms_active_created_at",
+            "rooms",
+            ["created_at"],
+            postgresql_where=sa.text("is_active"),
+        )
+        
+        # История присутствия: поиск и закрытие открытой записи участника
+        # (WHERE room_id = ? AND user_id = ? AND leave_time IS NULL)
+        _create_index(
+            "ix_room_participants_open",
+            "room_participants",
+            ["room_id", "user_id"],
+            postgresql_where=sa.text("leave_time IS NULL"),
+        )
+        # Полный индекс нужен каскадному удалению комнаты и выборкам истории;
+        # одиночный индекс по room_id становится его префиксом и не нужен
+        _create_index(
+            "ix_room_participants_room_id_user_id",
+            "room_participants",
+            ["room_id", "user_id"],
+        )
+        
+        # Курсорная пагинация сообщений (WHERE room_id = ? AND id > ? ORDER BY id).
+        # В базах, созданных create_tables, индекс уже есть
+        _create_index("ix_messages_room_id_id", "messages", ["room_id", "id"])
+        
+        _drop_index("ix_room_participants_room_id", "room_participants")
+        _drop_index("ix_messages_room_id", "messages")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        _create_index("ix_messages_room_id", "messages", ["room_id"])
+        _create_index("ix_room_participants_room_id", "room_participants", ["room_id"])
+        
+        _drop_index("ix_messages_room_id_id", "messages")
+        _drop_index("ix_room_participants_room_id_user_id", "room_participants")
+        _drop_index("ix_room_participants_open", "room_participants")
+        _drop_index("ix_rooms_active_created_at", "rooms")
+        _drop_index("ix_rooms_created_at", "rooms")
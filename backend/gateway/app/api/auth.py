@@ -4,12 +4,11 @@ Gateway endpoints для аутентификации.
 """
 
 import logging
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Request, Response
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from typing import Dict, Any
 
 from app.core.config import settings
-from app.services.proxy import proxy_request
+from app.services.proxy import stream_request
 from app.api.deps import get_current_user, CurrentUser
 
 logger = logging.getLogger(__name__)
@@ -18,40 +17,35 @@ security = HTTPBearer(auto_error=False)
 
 
 @router.post("/register")
-async def register(request: Request) -> Dict[str, Any]:
+async def register(request: Request) -> Response:
     """Проксирование регистрации к auth-service"""
-    body = await request.json()
-    
-    return await proxy_request(
-        method="POST",
-        url=f"{settings.AUTH_SERVICE_URL}/api/auth/register",
-        json_data=body
+    return await stream_request(
+        request,
+        url=f"{settings.AUTH_SERVICE_URL}/api/auth/register"
     )
 
 
 @router.post("/login")
-async def login(request: Request) -> Dict[str, Any]:
+async def login(request: Request) -> Response:
     """Проксирование логина к auth-service"""
-    body = await request.json()
-    
-    return await proxy_request(
-        method="POST",
-        url=f"{settings.AUTH_SERVICE_URL}/api/auth/login",
-        json_data=body
+    return await stream_request(
+        request,
+        url=f"{settings.AUTH_SERVICE_URL}/api/auth/login"
     )
 
 
 @router.get("/me")
 async def get_me(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> Dict[str, Any]:
+) -> Response:
     """Проксирование получения текущего пользователя"""
     headers = {}
     if credentials:
         headers["Authorization"] = f"Bearer {credentials.credentials}"
     
-    return await proxy_request(
-        method="GET",
+    return await stream_request(
+        request,
         url=f"{settings.AUTH_SERVICE_URL}/api/auth/me",
         headers=headers
     )
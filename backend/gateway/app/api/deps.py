@@ -18,17 +18,14 @@ class CurrentUser(BaseModel):
     display_name: Optional[str] = None
 
 
-def get_current_user_optional(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> Optional[CurrentUser]:
+def get_user_from_token(token: str) -> Optional[CurrentUser]:
     """
-    Опциональное получение текущего пользователя.
-    Не выбрасывает ошибку, если токен отсутствует.
-    """
-    if credentials is None:
-        return None
+    Получение данных пользователя из JWT токена.
     
-    payload = decode_token(credentials.credentials)
+    Returns:
+        Данные пользователя или None, если токен недействителен
+    """
+    payload = decode_token(token)
     if payload is None:
         return None
     
@@ -38,13 +35,31 @@ def get_current_user_optional(
     if user_id is None:
         return None
     
+    try:
+        user_id_int = int(user_id)
+    except (ValueError, TypeError):
+        return None
+    
     return CurrentUser(
-        user_id=user_id,
+        user_id=user_id_int,
         email=email,
-        display_name=email
+        display_name=payload.get("display_name") or email
     )
 
 
+def get_current_user_optional(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> Optional[CurrentUser]:
+    """
+    Опциональное получение текущего пользователя.
+    Не выбрасывает ошибку, если токен отсутствует.
+    """
+    if credentials is None:
+        return None
+    
+    return get_user_from_token(credentials.credentials)
+
+
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> CurrentUser:
@@ -61,18 +76,8 @@ def get_current_user(
     if credentials is None:
         raise credentials_exception
     
-    payload = decode_token(credentials.credentials)
-    if payload is None:
-        raise credentials_exception
-    
-    user_id = payload.get("sub")
-    email = payload.get("email")
-    
-    if user_id is None:
+    current_user = get_user_from_token(credentials.credentials)
+    if current_user is None:
         raise credentials_exception
     
-    return CurrentUser(
-        user_id=user_id,
-        email=email,
-        display_name=email
-    )
+    return current_user
@@ -3,13 +3,16 @@ Gateway endpoints для управления комнатами.
 Проксирует запросы к conference-service.
 """
 
+import httpx
 import logging
-from fastapi import APIRouter, Depends, Request, Query
+from fastapi import APIRouter, Depends, Request, Response, Query, WebSocket
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from typing import Dict, Any, Optional
+from typing import Dict, Optional
 
 from app.core.config import settings
-from app.services.proxy import proxy_request
+from app.core.http_metrics import mark_long_poll
+from app.core.security import create_identity_headers
+from app.services.proxy import stream_request, proxy_websocket
 from app.api.deps import get_current_user, CurrentUser
 
 logger = logging.getLogger(__name__)
@@ -17,39 +20,57 @@ router = APIRouter(prefix="/api/rooms", tags=["rooms"])
 security = HTTPBearer()
 
 
-def get_auth_headers(credentials: HTTPAuthorizationCredentials) -> Dict[str, str]:
-    """Формирование заголовков авторизации"""
-    return {"Authorization": f"Bearer {credentials.credentials}"}
+def get_websocket_url(path: str, query: str) -> str:
+    """Формирование ws:// URL conference-service"""
+    base_url = settings.CONFERENCE_SERVICE_URL.replace("https://", "wss://", 1).replace("http://", "ws://", 1)
+    return f"{base_url}{path}?{query}" if query else f"{base_url}{path}"
+
+
+def get_auth_headers(
+    current_user: CurrentUser = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> Dict[str, str]:
+    """
+    Заголовки авторизации для conference-service.
+    Токен проверяется один раз здесь, сервис получает подписанные
+    данные пользователя и не декодирует JWT повторно.
+    """
+    return {
+        "Authorization": f"Bearer {credentials.credentials}",
+        **create_identity_headers(
+            current_user.user_id,
+            current_user.email,
+            current_user.display_name
+        ),
+    }
 
 
 @router.post("")
 async def create_room(
     request: Request,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> Dict[str, Any]:
+    auth_headers: Dict[str, str] = Depends(get_auth_headers)
+) -> Response:
     """Создание комнаты"""
-    body = await request.json()
-    
-    return await proxy_request(
-        method="POST",
+    return await stream_request(
+        request,
         url=f"{settings.CONFERENCE_SERVICE_URL}/api/rooms",
-        headers=get_auth_headers(credentials),
-        json_data=body
+        headers=auth_headers
     )
 
 
 @router.get("")
 async def get_rooms(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
     only_active: bool = Query(True),
-    credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> Any:
+    auth_headers: Dict[str, str] = Depends(get_auth_headers)
+) -> Response:
     """Получение списка комнат"""
-    return await proxy_request(
-        method="GET",
+    return await stream_request(
+        request,
         url=f"{settings.CONFERENCE_SERVICE_URL}/api/rooms",
-        headers=get_auth_headers(credentials),
+        headers=auth_headers,
         params={"skip": skip, "limit": limit, "only_active": only_active}
     )
 
@@ -57,52 +78,70 @@ async def get_rooms(
 @router.get("/{room_id}")
 async def get_room(
     room_id: int,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> Dict[str, Any]:
+    request: Request,
+    auth_headers: Dict[str, str] = Depends(get_auth_headers)
+) -> Response:
     """Получение информации о комнате"""
-    return await proxy_request(
-        method="GET",
+    return await stream_request(
+        request,
         url=f"{settings.CONFERENCE_SERVICE_URL}/api/rooms/{room_id}",
-        headers=get_auth_headers(credentials)
+        headers=auth_headers
     )
 
 
 @router.post("/{room_id}/join")
 async def join_room(
     room_id: int,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> Dict[str, Any]:
+    request: Request,
+    auth_headers: Dict[str, str] = Depends(get_auth_headers)
+) -> Response:
     """Присоединение к комнате"""
-    return await proxy_request(
-        method="POST",
+    return await stream_request(
+        request,
         url=f"{settings.CONFERENCE_SERVICE_URL}/api/rooms/{room_id}/join",
-        headers=get_auth_headers(credentials)
+        headers=auth_headers
+    )
+
+
+@router.post("/{room_id}/heartbeat")
+async def heartbeat(
+    room_id: int,
+    request: Request,
+    auth_headers: Dict[str, str] = Depends(get_auth_headers)
+) -> Response:
+    """Подтверждение присутствия в комнате"""
+    return await stream_request(
+        request,
+        url=f"{settings.CONFERENCE_SERVICE_URL}/api/rooms/{room_id}/heartbeat",
+        headers=auth_headers
     )
 
 
 @router.post("/{room_id}/leave")
 async def leave_room(
     room_id: int,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> Dict[str, Any]:
+    request: Request,
+    auth_headers: Dict[str, str] = Depends(get_auth_headers)
+) -> Response:
     """Выход из комнаты"""
-    return await proxy_request(
-        method="POST",
+    return await stream_request(
+        request,
         url=f"{settings.CONFERENCE_SERVICE_URL}/api/rooms/{room_id}/leave",
-        headers=get_auth_headers(credentials)
+        headers=auth_headers
     )
 
 
 @router.delete("/{room_id}")
 async def delete_room(
     room_id: int,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> Dict[str, Any]:
+    request: Request,
+    auth_headers: Dict[str, str] = Depends(get_auth_headers)
+) -> Response:
     """Удаление комнаты"""
-    return await proxy_request(
-        method="DELETE",
+    return await stream_request(
+        request,
         url=f"{settings.CONFERENCE_SERVICE_URL}/api/rooms/{room_id}",
-        headers=get_auth_headers(credentials)
+        headers=auth_headers
     )
 
 
@@ -110,30 +149,81 @@ async def delete_room(
 async def send_message(
     room_id: int,
     request: Request,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> Dict[str, Any]:
+    auth_headers: Dict[str, str] = Depends(get_auth_headers)
+) -> Response:
     """Отправка сообщения в чат"""
-    body = await request.json()
-    
-    return await proxy_request(
-        method="POST",
+    return await stream_request(
+        request,
         url=f"{settings.CONFERENCE_SERVICE_URL}/api/rooms/{room_id}/messages",
-        headers=get_auth_headers(credentials),
-        json_data=body
+        headers=auth_headers
     )
 
 
 @router.get("/{room_id}/messages")
 async def get_messages(
     room_id: int,
-    skip: int = Query(0, ge=0),
+    request: Request,
+    after_id: Optional[int] = Query(None, ge=0),
+    before_id: Optional[int] = Query(None, ge=1),
+    skip: Optional[int] = Query(None, ge=0),
     limit: int = Query(50, ge=1, le=200),
-    credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> Dict[str, Any]:
-    """Получение сообщений чата"""
-    return await proxy_request(
-        method="GET",
+    include_total: bool = Query(False),
+    wait: Optional[int] = Query(None, ge=0, le=settings.MESSAGES_WAIT_MAX_SECONDS),
+    auth_headers: Dict[str, str] = Depends(get_auth_headers)
+) -> Response:
+    """
+    Получение сообщений чата.
+    С after_id и wait - длинный опрос: сервис держит запрос до нового
+    сообщения, но не дольше wait секунд.
+    """
+    params = {
+        "after_id": after_id,
+        "before_id": before_id,
+        "skip": skip,
+        "limit": limit,
+        "include_total": include_total,
+        "wait": wait,
+    }
+    
+    # Таймаут чтения пула сервиса отсчитывается после ожидания
+    timeout = None
+    if wait and after_id is not None:
+        mark_long_poll(request.scope)
+        timeout = httpx.Timeout(
+            settings.CONFERENCE_SERVICE_TIMEOUT + wait,
+            connect=settings.CONFERENCE_SERVICE_CONNECT_TIMEOUT
+        )
+    
+    return await stream_request(
+        request,
         url=f"{settings.CONFERENCE_SERVICE_URL}/api/rooms/{room_id}/messages",
-        headers=get_auth_headers(credentials),
-        params={"skip": skip, "limit": limit}
+        headers=auth_headers,
+        params={key: value for key, value in params.items() if value is not None},
+        timeout=timeout
+    )
+
+
+@router.get("/{room_id}/events")
+async def room_events_stream(
+    room_id: int,
+    request: Request
+) -> Response:
+    """
+    Поток событий комнаты (Server-Sent Events).
+    Ответ передается клиенту по мере поступления, без буферизации.
+    """
+    return await stream_request(
+        request,
+        url=f"{settings.CONFERENCE_SERVICE_URL}/api/rooms/{room_id}/events",
+        # Поток открыт неограниченно долго, сервис присылает keep-alive
+        timeout=httpx.Timeout(settings.CONFERENCE_SERVICE_TIMEOUT, read=None)
+    )
+
+
+@router.websocket("/{room_id}/ws")
+async def room_events(websocket: WebSocket, room_id: int):
+    """Поток событий комнаты (WebSocket, токен в query параметре token)"""
+    await proxy_websocket(
+        websocket,
+        url=get_websocket_url(f"/api/rooms/{room_id}/ws", websocket.url.query)
     )
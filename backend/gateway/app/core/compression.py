@@ -0,0 +1,222 @@
+"""
+ASGI middleware сжатия ответов (Brotli и gzip).
+
+Кодировка выбирается по Accept-Encoding клиента: br, если клиент его
+принимает, иначе gzip. Сжимаются только текстовые ответы (JSON, текст)
+размером не меньше COMPRESSION_MIN_SIZE: на маленьких ответах сжатие
+тратит CPU и почти не уменьшает размер.
+
+Не сжимаются:
+- ответы, уже имеющие Content-Encoding (сжатые сервисом);
+- потоки событий text/event-stream: сжатие буферизует события;
+- ответы без тела (204, 304) и ответы на HEAD.
+
+Сжатое тело отличается от исходного побайтно, поэтому сильный ETag
+сервиса заменяется слабым (как это делает nginx), а ответ получает
+Vary: Accept-Encoding.
+"""
+
+import gzip
+import io
+from typing import List, Optional, Tuple
+
+import brotli
+
+# Типы содержимого, которые имеет смысл сжимать
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "text/",
+)
+
+# Потоковые типы, которые нельзя буферизовать
+EXCLUDED_TYPES = ("text/event-stream",)
+
+# Коды ответов без тела
+NO_BODY_STATUSES = {204, 304}
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Кодировка ответа по заголовку Accept-Encoding.
+    Кодировки с q=0 считаются запрещенными.
+    """
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+    
+    if "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    """Потоковый компрессор выбранной кодировки"""
+    
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+            self._buffer = None
+            self._gzip = None
+        else:
+            self._brotli = None
+            self._buffer = io.BytesIO()
+            self._gzip = gzip.GzipFile(mode="wb", fileobj=self._buffer, compresslevel=gzip_level)
+    
+    def _take(self) -> bytes:
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+    
+    def compress(self, chunk: bytes) -> bytes:
+        """Сжатие очередной части тела"""
+        if self._brotli is not None:
+            return self._brotli.process(chunk)
+        self._gzip.write(chunk)
+        return self._take()
+    
+    def finish(self) -> bytes:
+        """Завершение потока сжатия"""
+        if self._brotli is not None:
+            return self._brotli.finish()
+        self._gzip.close()
+        return self._take()
+
+
+class CompressionMiddleware:
+    """Сжатие ответов Brotli или gzip с порогом по размеру"""
+    
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        
+        encoding = choose_encoding(accept_encoding)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        
+        await _CompressionResponder(self, encoding)(scope, receive, send)
+
+
+class _CompressionResponder:
+    """Сжатие одного ответа: решение принимается по заголовкам и первой части тела"""
+    
+    def __init__(self, middleware: CompressionMiddleware, encoding: str):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.start_message: Optional[dict] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+    
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.middleware.app(scope, receive, self.send_compressed)
+    
+    def _should_compress(self, headers: List[Tuple[bytes, bytes]], status: int) -> bool:
+        """Подходит ли ответ для сжатия по статусу и заголовкам"""
+        if status in NO_BODY_STATUSES:
+            return False
+        
+        content_type = b""
+        for name, value in headers:
+            name = name.lower()
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value.lower()
+            if name == b"content-length":
+                # Некорректная длина от сервиса - ответ передается как есть
+                try:
+                    if int(value) < self.middleware.minimum_size:
+                        return False
+                except ValueError:
+                    return False
+        
+        content_type = content_type.decode("latin-1")
+        if content_type.startswith(EXCLUDED_TYPES):
+            return False
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+    
+    def _compressed_headers(self) -> List[Tuple[bytes, bytes]]:
+        """Заголовки сжатого ответа"""
+        headers = []
+        vary = []
+        for name, value in self.start_message["headers"]:
+            lower = name.lower()
+            if lower == b"content-length":
+                continue
+            if lower == b"vary":
+                vary.append(value)
+                continue
+            if lower == b"etag" and not value.startswith(b"W/"):
+                value = b"W/" + value
+            headers.append((name, value))
+        
+        vary.append(b"Accept-Encoding")
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        headers.append((b"vary", b", ".join(vary)))
+        return headers
+    
+    async def send_compressed(self, message):
+        if self.passthrough:
+            await self.send(message)
+            return
+        
+        if message["type"] == "http.response.start":
+            headers = list(message.get("headers", []))
+            if not self._should_compress(headers, message["status"]):
+                self.passthrough = True
+                await self.send(message)
+                return
+            # Заголовки отправляются вместе с первой частью тела
+            self.start_message = {**message, "headers": headers}
+            return
+        
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+        
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        
+        if self.compressor is None:
+            if not more_body and len(body) < self.middleware.minimum_size:
+                # Весь ответ меньше порога - отправляется без сжатия
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+            
+            self.compressor = _Compressor(
+                self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality
+            )
+            await self.send({**self.start_message, "headers": self._compressed_headers()})
+        
+        data = self.compressor.compress(body)
+        if not more_body:
+            data += self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
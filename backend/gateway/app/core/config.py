@@ -3,6 +3,7 @@
 """
 
 from pydantic_settings import BaseSettings
+from typing import Literal
 
 
 class Settings(BaseSettings):
@@ -15,9 +16,45 @@ class Settings(BaseSettings):
     AUTH_SERVICE_URL: str = "http://auth-service:8000"
     CONFERENCE_SERVICE_URL: str = "http://conference-service:8000"
     
-    # JWT настройки
-    JWT_SECRET_KEY: str = "super-secret-key-change-in-production"
-    JWT_ALGORITHM: str = "HS256"
+    # Пул соединений к auth-service
+    AUTH_SERVICE_MAX_CONNECTIONS: int = 100
+    AUTH_SERVICE_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    AUTH_SERVICE_KEEPALIVE_EXPIRY: float = 30.0
+    AUTH_SERVICE_CONNECT_TIMEOUT: float = 5.0
+    AUTH_SERVICE_TIMEOUT: float = 30.0
+    
+    # Пул соединений к conference-service
+    CONFERENCE_SERVICE_MAX_CONNECTIONS: int = 200
+    CONFERENCE_SERVICE_MAX_KEEPALIVE_CONNECTIONS: int = 50
+    CONFERENCE_SERVICE_KEEPALIVE_EXPIRY: float = 30.0
+    CONFERENCE_SERVICE_CONNECT_TIMEOUT: float = 5.0
+    CONFERENCE_SERVICE_TIMEOUT: float = 30.0
+    MESSAGES_WAIT_MAX_SECONDS: int = 30  # Максимальный wait длинного опроса сообщений (как в conference-service)
+    
+    # Сжатие ответов (Brotli или gzip по Accept-Encoding)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024  # Ответы меньше порога (байт) не сжимаются
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4  # 0-11: выше - меньше размер, больше CPU
+    
+    # JWT настройки: токены проверяются открытыми ключами auth-service
+    JWKS_URL: str = "http://auth-service:8000/.well-known/jwks.json"
+    JWKS_REFRESH_SECONDS: int = 300  # Плановое обновление ключей
+    JWKS_MIN_REFRESH_SECONDS: int = 10  # Минимальный интервал внеочередного обновления
+    JWT_ALGORITHM: str = "RS256"
+    JWT_SECRET_KEY: str = "super-secret-key-change-in-production"  # Для устаревших токенов HS256
+    JWT_ACCEPT_HS256: bool = False  # Только на время перехода на RS256: принимать ранее выданные токены HS256
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000  # Кэш проверенных токенов (0 - отключен)
+    
+    # Подпись заголовков X-User-* для conference-service (общий секрет)
+    INTERNAL_AUTH_SECRET: str = "internal-secret-change-in-production"
+    
+    # Распределенная трассировка (OpenTelemetry)
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATIO: float = 0.01  # Доля записываемых трасс, начатых в этом сервисе
+    TRACING_EXPORTER: Literal["file", "otlp"] = "file"  # file - JSON Lines, otlp - OTLP/HTTP коллектор
+    TRACING_FILE_PATH: str = "traces/gateway.jsonl"
+    TRACING_OTLP_ENDPOINT: str = "http://otel-collector:4318/v1/traces"
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,73 @@
+"""
+ASGI middleware метрик HTTP запросов.
+
+Время запроса записывается в момент отправки заголовков ответа с
+меткой шаблона маршрута (например, /api/rooms/{room_id}), а не
+фактического пути, чтобы число временных рядов не зависело от ID
+в URL. Запросы, не попавшие ни в один маршрут, получают метку
+UNMATCHED_ROUTE. Время ответа длинного опроса включает ожидание,
+поэтому такие запросы (mark_long_poll) получают отдельную метку.
+"""
+
+import time
+
+from app.core.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT
+
+# Метка запросов без маршрута (404 на неизвестные пути)
+UNMATCHED_ROUTE = "unmatched"
+
+# Суффикс метки маршрута запросов длинного опроса
+LONG_POLL_SUFFIX = " (wait)"
+LONG_POLL_SCOPE_KEY = "metrics.long_poll"
+
+
+def _route(scope: dict) -> str:
+    """Шаблон маршрута запроса"""
+    # Маршрут записывается в scope роутером FastAPI
+    route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+    if scope.get(LONG_POLL_SCOPE_KEY):
+        route += LONG_POLL_SUFFIX
+    return route
+
+
+def mark_long_poll(scope: dict) -> None:
+    """Отметка запроса длинного опроса (отдельная метка маршрута)"""
+    scope[LONG_POLL_SCOPE_KEY] = True
+
+
+class HTTPMetricsMiddleware:
+    """Гистограмма времени ответа по маршрутам и число запросов в обработке"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        started = time.perf_counter()
+        observed = False
+        
+        def observe(status_code: int) -> None:
+            nonlocal observed
+            if observed:
+                return
+            observed = True
+            HTTP_REQUEST_DURATION.labels(scope["method"], _route(scope), str(status_code)).observe(
+                time.perf_counter() - started
+            )
+        
+        async def send_with_metrics(message):
+            if message["type"] == "http.response.start":
+                observe(message["status"])
+            await send(message)
+        
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        except Exception:
+            observe(500)
+            raise
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
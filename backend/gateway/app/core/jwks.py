@@ -0,0 +1,132 @@
+"""
+Кэш открытых ключей проверки JWT (JWKS) auth-service.
+
+Ключи загружаются при старте и обновляются в фоне раз в
+JWKS_REFRESH_SECONDS, поэтому проверка токена не делает сетевых
+запросов. Токен с неизвестным kid отклоняется и запускает
+внеочередное обновление (не чаще JWKS_MIN_REFRESH_SECONDS), чтобы
+новый ключ подхватывался без перезапуска сервиса.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+import httpx
+from jose import jwk
+
+from app.core.config import settings
+from app.core.token_cache import token_cache
+
+logger = logging.getLogger(__name__)
+
+# Таймаут запроса JWKS
+JWKS_FETCH_TIMEOUT_SECONDS = 5.0
+
+
+class JWKSCache:
+    """Открытые ключи auth-service по идентификатору (kid)"""
+    
+    def __init__(self, url: str, refresh_seconds: float, min_refresh_seconds: float):
+        self.url = url
+        self.refresh_seconds = refresh_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self._keys: Dict[str, jwk.Key] = {}
+        self._last_refresh = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+    
+    async def start(self) -> None:
+        """Первая загрузка ключей и запуск фонового обновления"""
+        if self._task is not None:
+            return
+        
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        await self.refresh()
+        self._task = asyncio.create_task(self._refresh_loop())
+    
+    async def stop(self) -> None:
+        """Остановка фонового обновления"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def get_key(self, kid: Optional[str]) -> Optional[jwk.Key]:
+        """
+        Открытый ключ по идентификатору.
+        Для неизвестного ключа запрашивает внеочередное обновление.
+        """
+        key = self._keys.get(kid) if kid else None
+        if key is None and kid:
+            self.request_refresh()
+        return key
+    
+    def request_refresh(self) -> None:
+        """Запрос внеочередного обновления (безопасен из любого потока)"""
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+    
+    async def refresh(self) -> bool:
+        """
+        Загрузка ключей из JWKS endpoint.
+        
+        Returns:
+            True если ключи обновлены
+        """
+        self._last_refresh = time.monotonic()
+        try:
+            async with httpx.AsyncClient(timeout=JWKS_FETCH_TIMEOUT_SECONDS) as client:
+                response = await client.get(self.url)
+                response.raise_for_status()
+                jwks = response.json()
+            
+            keys = {
+                key_data["kid"]: jwk.construct(key_data)
+                for key_data in jwks.get("keys", [])
+                if key_data.get("kid")
+            }
+        except Exception as e:
+            # Остаемся на прежнем наборе ключей
+            logger.error(f"Ошибка загрузки JWKS {self.url}: {e}")
+            return False
+        
+        if set(keys) != set(self._keys):
+            logger.info(f"Ключи проверки JWT обновлены: {sorted(keys)}")
+        
+        # Токены удаленного (отозванного) ключа не должны
+        # оставаться действительными в кэше проверенных токенов
+        if set(self._keys) - set(keys):
+            token_cache.clear()
+        self._keys = keys
+        return True
+    
+    async def _refresh_loop(self) -> None:
+        """Периодическое и внеочередное обновление ключей"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.refresh_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            
+            # Поток токенов с чужим kid не должен превращаться в поток запросов
+            delay = self._last_refresh + self.min_refresh_seconds - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            
+            await self.refresh()
+
+
+# Глобальный кэш ключей процесса
+jwks_cache = JWKSCache(
+    url=settings.JWKS_URL,
+    refresh_seconds=settings.JWKS_REFRESH_SECONDS,
+    min_refresh_seconds=settings.JWKS_MIN_REFRESH_SECONDS
+)
@@ -0,0 +1,81 @@
+"""
+Метрики Prometheus для API Gateway.
+"""
+
+from typing import Callable, Dict
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+# Количество запросов к сервисам, ожидающих ответа
+UPSTREAM_IN_FLIGHT = Gauge(
+    "gateway_upstream_requests_in_flight",
+    "Запросы к внутренним сервисам в процессе выполнения",
+    ["upstream"]
+)
+
+# Время запроса к внутреннему сервису до получения заголовков ответа
+# по результату: код ответа или timeout/connect_error/error
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "gateway_upstream_request_duration_seconds",
+    "Время запроса к внутреннему сервису",
+    ["upstream", "outcome"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+# HTTP запросы к сервису: время до отправки заголовков ответа по
+# шаблону маршрута (SSE и потоковые ответы не растягивают гистограмму)
+HTTP_REQUEST_DURATION = Histogram(
+    "gateway_http_request_duration_seconds",
+    "Время обработки HTTP запроса по маршруту",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "gateway_http_requests_in_flight",
+    "HTTP запросы в процессе обработки"
+)
+
+# Проверки JWT через кэш проверенных токенов
+TOKEN_CACHE_REQUESTS = Counter(
+    "gateway_token_cache_requests_total",
+    "Проверки JWT токенов по результату обращения к кэшу (hit/miss)",
+    ["result"]
+)
+
+
+class UpstreamPoolCollector:
+    """
+    Коллектор заполненности пулов соединений к внутренним сервисам.
+    Значения снимаются в момент запроса /metrics.
+    """
+    
+    def __init__(self, stats_provider: Callable[[], Dict[str, Dict[str, int]]]):
+        self._stats_provider = stats_provider
+    
+    def collect(self):
+        connections = GaugeMetricFamily(
+            "gateway_upstream_pool_connections",
+            "Соединения в пуле по состоянию (active/idle)",
+            labels=["upstream", "state"]
+        )
+        queued = GaugeMetricFamily(
+            "gateway_upstream_pool_queued_requests",
+            "Запросы, ожидающие свободного соединения в пуле",
+            labels=["upstream"]
+        )
+        max_connections = GaugeMetricFamily(
+            "gateway_upstream_pool_max_connections",
+            "Максимальный размер пула соединений",
+            labels=["upstream"]
+        )
+        
+        for upstream, stats in self._stats_provider().items():
+            connections.add_metric([upstream, "active"], stats["active"])
+            connections.add_metric([upstream, "idle"], stats["idle"])
+            queued.add_metric([upstream], stats["queued"])
+            max_connections.add_metric([upstream], stats["max_connections"])
+        
+        yield connections
+        yield queued
+        yield max_connections
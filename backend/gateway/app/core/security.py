@@ -1,20 +1,97 @@
 """
-Модуль безопасности Gateway - декодирование JWT.
+Модуль безопасности Gateway - декодирование JWT
+и подпись данных пользователя для внутренних сервисов.
 """
 
-from typing import Optional
+import hashlib
+import hmac
+import time
+from typing import Dict, Optional
+from urllib.parse import quote
 from jose import JWTError, jwt
 from app.core.config import settings
+from app.core.jwks import jwks_cache
+from app.core.metrics import TOKEN_CACHE_REQUESTS
+from app.core.token_cache import token_cache
+from app.core.tracing import tracer
+
+# Алгоритм устаревших токенов, подписанных общим секретом
+LEGACY_ALGORITHM = "HS256"
 
 
 def decode_token(token: str) -> Optional[dict]:
-    """Декодирование JWT токена"""
+    """
+    Декодирование и проверка JWT токена.
+    Повторная проверка того же токена берется из кэша до его истечения.
+    
+    Args:
+        token: JWT токен
+    
+    Returns:
+        Декодированные данные или None при ошибке
+    """
+    payload = token_cache.get(token)
+    if payload is not None:
+        TOKEN_CACHE_REQUESTS.labels("hit").inc()
+        return payload
+    
+    TOKEN_CACHE_REQUESTS.labels("miss").inc()
+    with tracer.start_as_current_span("jwt.verify"):
+        payload = verify_token(token)
+    if payload is not None:
+        token_cache.set(token, payload)
+    return payload
+
+
+def verify_token(token: str) -> Optional[dict]:
+    """Проверка подписи и срока JWT токена по кэшу ключей JWKS"""
     try:
+        header = jwt.get_unverified_header(token)
+        
+        # Алгоритм проверки выбирается явно: открытый ключ
+        # никогда не используется как HMAC секрет
+        if header.get("alg") == LEGACY_ALGORITHM:
+            if not settings.JWT_ACCEPT_HS256:
+                return None
+            return jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[LEGACY_ALGORITHM])
+        
+        key = jwks_cache.get_key(header.get("kid"))
+        if key is None:
+            return None
+        
         payload = jwt.decode(
             token, 
-            settings.JWT_SECRET_KEY, 
+            key, 
             algorithms=[settings.JWT_ALGORITHM]
         )
         return payload
     except JWTError:
         return None
+
+
+def sign_identity(values: str) -> str:
+    """HMAC-SHA256 подпись данных пользователя общим секретом"""
+    return hmac.new(
+        settings.INTERNAL_AUTH_SECRET.encode(),
+        values.encode(),
+        hashlib.sha256
+    ).hexdigest()
+
+
+def create_identity_headers(user_id: int, email: str, display_name: Optional[str]) -> Dict[str, str]:
+    """
+    Заголовки с данными проверенного пользователя для conference-service.
+    
+    Сервис доверяет им только при верной подписи, поэтому не проверяет
+    JWT повторно. Метка времени ограничивает повторное использование
+    перехваченных заголовков. Email и имя кодируются для передачи
+    не-ASCII символов в заголовках.
+    """
+    headers = {
+        "X-User-ID": str(user_id),
+        "X-User-Email": quote(email or "", safe="@"),
+        "X-User-Name": quote(display_name or "", safe="@"),
+        "X-User-Timestamp": str(int(time.time())),
+    }
+    headers["X-User-Signature"] = sign_identity("\n".join(headers.values()))
+    return headers
@@ -0,0 +1,179 @@
+"""
+Распределенная трассировка запросов (OpenTelemetry).
+
+Gateway начинает трассу входящего запроса (FastAPIInstrumentor) и
+для каждого запроса к внутреннему сервису создает клиентский спан,
+контекст которого передается сервису в заголовке W3C traceparent
+(app/services/proxy.py). Спаны сервисов становятся его дочерними, и
+время запроса разделяется на Gateway, сеть и обработку в сервисе.
+
+Решение о записи трассы принимается здесь (доля TRACING_SAMPLE_RATIO),
+сервисы следуют флагу sampled из traceparent. traceparent клиента
+отбрасывает nginx, поэтому клиент не может включить запись трасс.
+При выключенной трассировке провайдер не настраивается, и вызовы API
+OpenTelemetry ничего не делают.
+
+Экспорт спанов выполняется пачками в отдельном потоке:
+- file - JSON Lines в TRACING_FILE_PATH (локальная отладка);
+- otlp - OTLP/HTTP на TRACING_OTLP_ENDPOINT (коллектор, Jaeger, Tempo).
+"""
+
+import logging
+import os
+import threading
+from typing import MutableMapping, Optional, Sequence, Union
+
+from fastapi import FastAPI
+from opentelemetry import propagate, trace
+from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.sdk.trace.sampling import (
+    Decision,
+    ParentBased,
+    Sampler,
+    SamplingResult,
+    TraceIdRatioBased,
+)
+from opentelemetry.trace import Span, SpanKind, Status, StatusCode
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Имя сервиса в трассах
+SERVICE = "gateway"
+
+# Служебные endpoints не трассируются
+EXCLUDED_URLS = "/health,/metrics"
+
+# Трассер для спанов, создаваемых вручную
+tracer = trace.get_tracer(__name__)
+
+# Провайдер, настроенный setup_tracing
+_provider: Optional[TracerProvider] = None
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Запись спанов в файл, по одному JSON объекту на строку"""
+    
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+    
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+        try:
+            with self._lock:
+                self._file.write(lines)
+                self._file.flush()
+        except OSError as e:
+            logger.error(f"Ошибка записи спанов в файл: {e}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+    
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class RequestRootSampler(Sampler):
+    """
+    Выборка трасс, начинающихся входящим запросом.
+    Корневые спаны другого вида (например, запросы фоновых задач) не записываются.
+    """
+    
+    def __init__(self, ratio: float):
+        self._ratio = TraceIdRatioBased(ratio)
+    
+    def should_sample(
+        self,
+        parent_context,
+        trace_id,
+        name,
+        kind=None,
+        attributes=None,
+        links=None,
+        trace_state=None
+    ) -> SamplingResult:
+        if kind != SpanKind.SERVER:
+            return SamplingResult(Decision.DROP)
+        return self._ratio.should_sample(
+            parent_context, trace_id, name, kind, attributes, links, trace_state
+        )
+    
+    def get_description(self) -> str:
+        return f"RequestRootSampler{{{self._ratio.get_description()}}}"
+
+
+def _exporter() -> SpanExporter:
+    """Экспортер спанов по настройке TRACING_EXPORTER"""
+    if settings.TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+    return JsonLinesSpanExporter(settings.TRACING_FILE_PATH)
+
+
+def setup_tracing(app: FastAPI) -> None:
+    """
+    Настройка трассировки приложения.
+    Вызывается при создании приложения, до первого запроса.
+    """
+    global _provider
+    
+    if not settings.TRACING_ENABLED or _provider is not None:
+        return
+    
+    _provider = TracerProvider(
+        resource=Resource.create({SERVICE_NAME: SERVICE}),
+        sampler=ParentBased(RequestRootSampler(settings.TRACING_SAMPLE_RATIO))
+    )
+    _provider.add_span_processor(BatchSpanProcessor(_exporter()))
+    trace.set_tracer_provider(_provider)
+    
+    FastAPIInstrumentor.instrument_app(app, tracer_provider=_provider, excluded_urls=EXCLUDED_URLS)
+    
+    logger.info(
+        f"Трассировка включена: выборка {settings.TRACING_SAMPLE_RATIO}, "
+        f"экспорт {settings.TRACING_EXPORTER}"
+    )
+
+
+def shutdown_tracing() -> None:
+    """Отправка накопленных спанов при остановке сервиса"""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+def start_upstream_span(
+    upstream: str,
+    method: str,
+    url: str,
+    headers: MutableMapping[str, str]
+) -> Span:
+    """
+    Клиентский спан запроса к сервису.
+    В headers добавляется traceparent, дочерний для этого спана.
+    """
+    span = tracer.start_span(
+        f"{method} {upstream}",
+        kind=SpanKind.CLIENT,
+        attributes={"http.method": method, "http.url": url, "peer.service": upstream}
+    )
+    propagate.inject(headers, context=trace.set_span_in_context(span))
+    return span
+
+
+def end_upstream_span(span: Span, outcome: Union[int, str]) -> None:
+    """Завершение спана запроса к сервису: код ответа или вид ошибки"""
+    if isinstance(outcome, int):
+        span.set_attribute("http.status_code", outcome)
+        if outcome >= 500:
+            span.set_status(Status(StatusCode.ERROR))
+    else:
+        span.set_status(Status(StatusCode.ERROR, outcome))
+    span.end()
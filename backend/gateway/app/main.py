@@ -5,10 +5,18 @@
 
 import logging
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from prometheus_client import REGISTRY, CONTENT_TYPE_LATEST, generate_latest
 
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
+from app.core.http_metrics import HTTPMetricsMiddleware
+from app.core.tracing import setup_tracing, shutdown_tracing
+from app.core.jwks import jwks_cache
+from app.core.metrics import UpstreamPoolCollector
+from app.services.proxy import init_http_clients, close_http_clients, get_pool_stats
 from app.api.auth import router as auth_router
 from app.api.rooms import router as rooms_router
 
@@ -26,8 +34,19 @@ async def lifespan(app: FastAPI):
     logger.info("Запуск API Gateway...")
     logger.info(f"Auth Service URL: {settings.AUTH_SERVICE_URL}")
     logger.info(f"Conference Service URL: {settings.CONFERENCE_SERVICE_URL}")
+    
+    # Пулы соединений к внутренним сервисам живут все время работы Gateway
+    init_http_clients()
+    
+    # Ключи проверки токенов auth-service
+    await jwks_cache.start()
+    
     yield
+    
     logger.info("Остановка API Gateway...")
+    await jwks_cache.stop()
+    await close_http_clients()
+    shutdown_tracing()
 
 
 # Создание FastAPI приложения
@@ -35,7 +54,9 @@ app = FastAPI(
     title=settings.APP_NAME,
     description="API Gateway для платформы CloudMeet Lite",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # Ответы сериализуются orjson вместо json.dumps
+    default_response_class=ORJSONResponse
 )
 
 # Настройка CORS
@@ -47,10 +68,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Сжатие ответов сервисов и Gateway
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    )
+
+# Метрики HTTP запросов (внешний слой, учитывает и ответы CORS)
+app.add_middleware(HTTPMetricsMiddleware)
+
+# Трассировка запросов и передача ее контекста сервисам (при TRACING_ENABLED)
+setup_tracing(app)
+
 # Подключение роутеров
 app.include_router(auth_router)
 app.include_router(rooms_router)
 
+# Метрики пулов соединений
+REGISTRY.register(UpstreamPoolCollector(get_pool_stats))
+
 
 @app.get("/health")
 def health_check():
@@ -58,6 +97,12 @@ def health_check():
     return {"status": "healthy", "service": "gateway"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Метрики в формате Prometheus"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/")
 def root():
     """Корневой endpoint"""
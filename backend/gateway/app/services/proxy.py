@@ -1,17 +1,187 @@
 """
 HTTP клиент для проксирования запросов к внутренним сервисам.
+
+Для каждого внутреннего сервиса создается долгоживущий httpx.AsyncClient
+с собственным пулом keep-alive соединений. Клиенты создаются и закрываются
+в lifespan приложения (см. app/main.py).
 """
 
+import asyncio
 import httpx
 import logging
-from typing import Optional, Dict, Any
-from fastapi import HTTPException, status
+import time
+import websockets
+from typing import Optional, Dict, Any, Tuple, List
+from fastapi import HTTPException, Request, WebSocket, status
+from starlette.background import BackgroundTask
+from starlette.responses import StreamingResponse
+
+from app.core.config import settings
+from app.core.metrics import UPSTREAM_IN_FLIGHT, UPSTREAM_REQUEST_DURATION
+from app.core.tracing import Span, end_upstream_span, start_upstream_span
 
 logger = logging.getLogger(__name__)
 
-# Таймаут для запросов
+# Таймаут для запросов к сервисам без собственных настроек
 TIMEOUT = 30.0
 
+# Имя пула для URL, не относящихся к известным сервисам
+DEFAULT_UPSTREAM = "default"
+
+# Hop-by-hop заголовки относятся к конкретному соединению
+# и не передаются через прокси (RFC 7230, раздел 6.1)
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+}
+
+# Данные пользователя для внутренних сервисов выставляет только
+# Gateway, одноименные заголовки клиента отбрасываются
+IDENTITY_HEADER_PREFIX = "x-user-"
+
+# Заголовки контекста трассировки W3C
+TRACE_CONTEXT_HEADERS = {"traceparent", "tracestate"}
+
+# Таймаут установки WebSocket соединения с сервисом
+WEBSOCKET_OPEN_TIMEOUT = 10.0
+
+# Настройки пулов и долгоживущие клиенты по имени сервиса
+_upstreams: Dict[str, Dict[str, Any]] = {}
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _upstream_configs() -> Dict[str, Dict[str, Any]]:
+    """Настройки пулов соединений для внутренних сервисов"""
+    return {
+        "auth-service": {
+            "base_url": settings.AUTH_SERVICE_URL.rstrip("/"),
+            "limits": httpx.Limits(
+                max_connections=settings.AUTH_SERVICE_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.AUTH_SERVICE_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.AUTH_SERVICE_KEEPALIVE_EXPIRY
+            ),
+            "timeout": httpx.Timeout(
+                settings.AUTH_SERVICE_TIMEOUT,
+                connect=settings.AUTH_SERVICE_CONNECT_TIMEOUT
+            ),
+        },
+        "conference-service": {
+            "base_url": settings.CONFERENCE_SERVICE_URL.rstrip("/"),
+            "limits": httpx.Limits(
+                max_connections=settings.CONFERENCE_SERVICE_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.CONFERENCE_SERVICE_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.CONFERENCE_SERVICE_KEEPALIVE_EXPIRY
+            ),
+            "timeout": httpx.Timeout(
+                settings.CONFERENCE_SERVICE_TIMEOUT,
+                connect=settings.CONFERENCE_SERVICE_CONNECT_TIMEOUT
+            ),
+        },
+        DEFAULT_UPSTREAM: {
+            "base_url": None,
+            "limits": httpx.Limits(),
+            "timeout": httpx.Timeout(TIMEOUT),
+        },
+    }
+
+
+def init_http_clients() -> None:
+    """Создание пулов соединений ко всем внутренним сервисам"""
+    if _clients:
+        return
+    
+    for name, config in _upstream_configs().items():
+        _upstreams[name] = config
+        _clients[name] = httpx.AsyncClient(
+            limits=config["limits"],
+            timeout=config["timeout"]
+        )
+        logger.info(
+            f"Пул соединений {name}: max_connections={config['limits'].max_connections}, "
+            f"keepalive={config['limits'].max_keepalive_connections}"
+        )
+
+
+async def close_http_clients() -> None:
+    """Закрытие всех пулов соединений"""
+    for name, client in list(_clients.items()):
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.error(f"Ошибка при закрытии пула {name}: {e}")
+    
+    _clients.clear()
+    _upstreams.clear()
+
+
+def get_http_client(url: str) -> Tuple[str, httpx.AsyncClient]:
+    """
+    Выбор пула соединений по URL запроса.
+    
+    Returns:
+        Имя сервиса и его долгоживущий клиент
+    """
+    if not _clients:
+        init_http_clients()
+    
+    for name, config in _upstreams.items():
+        base_url = config["base_url"]
+        if base_url and url.startswith(base_url):
+            return name, _clients[name]
+    
+    return DEFAULT_UPSTREAM, _clients[DEFAULT_UPSTREAM]
+
+
+def get_pool_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Статистика заполненности пулов соединений.
+    
+    Returns:
+        Для каждого сервиса: активные, простаивающие соединения,
+        запросы в очереди на соединение и лимит пула
+    """
+    stats = {}
+    
+    for name, client in list(_clients.items()):
+        # httpx не предоставляет публичного API для состояния пула,
+        # поэтому читаем его из транспорта httpcore
+        pool = getattr(client._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        pool_requests = list(getattr(pool, "_requests", []))
+        
+        idle = sum(1 for conn in connections if conn.is_idle())
+        queued = sum(1 for request in pool_requests if request.is_queued())
+        
+        stats[name] = {
+            "active": len(connections) - idle,
+            "idle": idle,
+            "queued": queued,
+            "max_connections": _upstreams[name]["limits"].max_connections or 0,
+        }
+    
+    return stats
+
+
+def _error_outcome(error: Exception) -> str:
+    """Метка результата запроса, завершившегося исключением"""
+    if isinstance(error, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(error, httpx.ConnectError):
+        return "connect_error"
+    return "error"
+
+
+def observe_upstream(upstream: str, outcome, started: float, span: Span) -> None:
+    """Запись времени запроса к сервису (до получения заголовков ответа)"""
+    UPSTREAM_REQUEST_DURATION.labels(upstream, str(outcome)).observe(time.perf_counter() - started)
+    end_upstream_span(span, outcome)
+
 
 async def proxy_request(
     method: str,
@@ -36,34 +206,46 @@ async def proxy_request(
     Raises:
         HTTPException: При ошибке запроса
     """
+    upstream, client = get_http_client(url)
+    
+    # Контекст трассировки передается сервису в заголовке traceparent
+    headers = dict(headers or {})
+    span = start_upstream_span(upstream, method, url, headers)
+    started = time.perf_counter()
+    
     try:
-        async with httpx.AsyncClient(timeout=TIMEOUT) as client:
-            response = await client.request(
-                method=method,
-                url=url,
-                headers=headers,
-                json=json_data,
-                params=params
-            )
-            
-            # Если ответ с ошибкой от сервиса, пробрасываем её
-            if response.status_code >= 400:
-                try:
-                    error_detail = response.json()
-                except:
-                    error_detail = {"detail": response.text}
-                
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=error_detail.get("detail", "Ошибка сервиса")
+        with UPSTREAM_IN_FLIGHT.labels(upstream=upstream).track_inprogress():
+            try:
+                response = await client.request(
+                    method=method,
+                    url=url,
+                    headers=headers,
+                    json=json_data,
+                    params=params
                 )
+            except Exception as e:
+                observe_upstream(upstream, _error_outcome(e), started, span)
+                raise
+        observe_upstream(upstream, response.status_code, started, span)
+        
+        # Если ответ с ошибкой от сервиса, пробрасываем её
+        if response.status_code >= 400:
+            try:
+                error_detail = response.json()
+            except:
+                error_detail = {"detail": response.text}
             
-            # Для 204 No Content возвращаем пустой ответ
-            if response.status_code == 204:
-                return {}
-            
-            return response.json()
-            
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=error_detail.get("detail", "Ошибка сервиса")
+            )
+        
+        # Для 204 No Content возвращаем пустой ответ
+        if response.status_code == 204:
+            return {}
+        
+        return response.json()
+    
     except httpx.TimeoutException:
         logger.error(f"Таймаут запроса к {url}")
         raise HTTPException(
@@ -84,3 +266,192 @@ async def proxy_request(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Внутренняя ошибка сервера"
         )
+
+
+def _filter_headers(
+    headers: List[Tuple[str, str]],
+    excluded: set = frozenset()
+) -> List[Tuple[str, str]]:
+    """Удаление hop-by-hop и явно исключенных заголовков"""
+    return [
+        (name, value) for name, value in headers
+        if name.lower() not in HOP_BY_HOP_HEADERS and name.lower() not in excluded
+    ]
+
+
+def _filter_request_headers(headers: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """
+    Заголовки клиента для передачи сервису: без Host, данных пользователя
+    и контекста трассировки (его выставляет Gateway)
+    """
+    return [
+        (name, value) for name, value in _filter_headers(headers, excluded=TRACE_CONTEXT_HEADERS | {"host"})
+        if not name.lower().startswith(IDENTITY_HEADER_PREFIX)
+    ]
+
+
+async def stream_request(
+    request: Request,
+    url: str,
+    headers: Optional[Dict[str, str]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    timeout: Optional[httpx.Timeout] = None
+) -> StreamingResponse:
+    """
+    Потоковое проксирование запроса к внутреннему сервису.
+    
+    Тело запроса и ответа передаются как поток байтов без разбора JSON,
+    поэтому память Gateway не зависит от размера ответа. Статус и заголовки
+    ответа (ETag, Content-Encoding, Content-Type и т.д.) сохраняются.
+    Условные заголовки клиента (If-None-Match) передаются сервису,
+    и его ответ 304 возвращается клиенту без тела.
+    
+    Args:
+        request: Входящий запрос клиента
+        url: Полный URL для запроса
+        headers: Дополнительные заголовки (перекрывают заголовки клиента)
+        params: Query параметры (по умолчанию - параметры входящего запроса)
+        timeout: Таймауты запроса (по умолчанию - настройки пула сервиса)
+    
+    Returns:
+        Потоковый ответ с телом от сервиса
+    
+    Raises:
+        HTTPException: Если сервис недоступен или не отвечает
+    """
+    upstream, client = get_http_client(url)
+    
+    forward_headers = httpx.Headers(_filter_request_headers(request.headers.items()))
+    if headers:
+        forward_headers.update(headers)
+    span = start_upstream_span(upstream, request.method, url, forward_headers)
+    
+    # Тело читается из клиента по частям только если оно есть
+    has_body = "content-length" in request.headers or "transfer-encoding" in request.headers
+    
+    upstream_request = client.build_request(
+        method=request.method,
+        url=url,
+        headers=forward_headers,
+        params=params if params is not None else request.query_params.multi_items(),
+        content=request.stream() if has_body else None,
+        timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+    )
+    
+    in_flight = UPSTREAM_IN_FLIGHT.labels(upstream=upstream)
+    in_flight.inc()
+    started = time.perf_counter()
+    
+    try:
+        response = await client.send(upstream_request, stream=True)
+        observe_upstream(upstream, response.status_code, started, span)
+    except httpx.TimeoutException as e:
+        observe_upstream(upstream, _error_outcome(e), started, span)
+        in_flight.dec()
+        logger.error(f"Таймаут запроса к {url}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Сервис не отвечает"
+        )
+    except httpx.ConnectError as e:
+        observe_upstream(upstream, _error_outcome(e), started, span)
+        in_flight.dec()
+        logger.error(f"Ошибка подключения к {url}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Сервис недоступен"
+        )
+    except Exception as e:
+        observe_upstream(upstream, _error_outcome(e), started, span)
+        in_flight.dec()
+        logger.error(f"Ошибка при запросе к {url}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Внутренняя ошибка сервера"
+        )
+    
+    async def release() -> None:
+        """Возврат соединения в пул после отправки ответа клиенту"""
+        await response.aclose()
+        in_flight.dec()
+    
+    streaming_response = StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        background=BackgroundTask(release)
+    )
+    # Байты передаются без изменений, поэтому Content-Length и
+    # Content-Encoding сервиса остаются корректными
+    streaming_response.raw_headers = [
+        (name.encode("latin-1"), value.encode("latin-1"))
+        for name, value in _filter_headers(response.headers.multi_items())
+    ]
+    
+    return streaming_response
+
+
+async def proxy_websocket(websocket: WebSocket, url: str) -> None:
+    """
+    Проксирование WebSocket соединения к внутреннему сервису.
+    
+    Соединение с клиентом принимается только после того, как сервис
+    принял соединение. Сообщения передаются в обе стороны без изменений,
+    код закрытия сервиса передается клиенту.
+    
+    Args:
+        websocket: Входящее WebSocket соединение клиента
+        url: Полный ws:// URL сервиса (включая query параметры)
+    """
+    try:
+        upstream = await websockets.connect(
+            url,
+            open_timeout=WEBSOCKET_OPEN_TIMEOUT,
+            max_size=None
+        )
+    except websockets.InvalidStatusCode as e:
+        # Сервис отклонил соединение (например, недействительный токен)
+        logger.warning(f"Сервис отклонил WebSocket соединение {e.status_code}")
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    except Exception as e:
+        logger.error(f"Ошибка WebSocket подключения к сервису: {e}")
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+        return
+    
+    await websocket.accept()
+    
+    async def client_to_upstream() -> None:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("text") is not None:
+                await upstream.send(message["text"])
+            elif message.get("bytes") is not None:
+                await upstream.send(message["bytes"])
+    
+    async def upstream_to_client() -> None:
+        async for message in upstream:
+            if isinstance(message, str):
+                await websocket.send_text(message)
+            else:
+                await websocket.send_bytes(message)
+    
+    tasks = [
+        asyncio.create_task(client_to_upstream()),
+        asyncio.create_task(upstream_to_client()),
+    ]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await upstream.close()
+        
+        # Если соединение закрыл сервис, передаем клиенту его код закрытия
+        try:
+            await websocket.close(code=upstream.close_code or status.WS_1000_NORMAL_CLOSURE)
+        except RuntimeError:
+            # Клиент уже отключился
+            pass
@@ -6,12 +6,17 @@
 // Базовый URL API (настраивается через переменные окружения или конфигурацию)
 const API_BASE_URL = window.API_BASE_URL || '/api';
 
+// Сколько последних GET ответов с ETag хранится для условных запросов
+const ETAG_CACHE_SIZE = 50;
+
 /**
  * Класс для работы с API
  */
 class ApiClient {
     constructor(baseUrl = API_BASE_URL) {
         this.baseUrl = baseUrl;
+        // URL -> { etag, data } для повторных GET запросов
+        this.etagCache = new Map();
     }
     
     /**
@@ -33,6 +38,7 @@ class ApiClient {
      */
     removeToken() {
         localStorage.removeItem('token');
+        this.etagCache.clear();
     }
     
     /**
@@ -58,7 +64,22 @@ class ApiClient {
     }
     
     /**
-     * Выполнение HTTP запроса
+     * Сохранение GET ответа с ETag (старые записи вытесняются)
+     */
+    rememberResponse(url, etag, data) {
+        this.etagCache.delete(url);
+        this.etagCache.set(url, { etag, data });
+        
+        if (this.etagCache.size > ETAG_CACHE_SIZE) {
+            this.etagCache.delete(this.etagCache.keys().next().value);
+        }
+    }
+    
+    /**
+     * Выполнение HTTP запроса.
+     * GET запрос к URL, ответ которого содержал ETag, отправляется
+     * с If-None-Match; на 304 возвращаются ранее полученные данные
+     * (тот же объект, поэтому вызывающий код может не перерисовывать их).
      */
     async request(method, endpoint, data = null, includeAuth = true) {
         const url = `${this.baseUrl}${endpoint}`;
@@ -72,6 +93,11 @@ class ApiClient {
             options.body = JSON.stringify(data);
         }
         
+        const cached = method === 'GET' ? this.etagCache.get(url) : undefined;
+        if (cached) {
+            options.headers['If-None-Match'] = cached.etag;
+        }
+        
         try {
             const response = await fetch(url, options);
             
@@ -80,8 +106,18 @@ class ApiClient {
                 return { success: true };
             }
             
+            // Данные не изменились с прошлого запроса
+            if (response.status === 304 && cached) {
+                return cached.data;
+            }
+            
             const responseData = await response.json();
             
+            const etag = response.headers.get('ETag');
+            if (method === 'GET' && response.ok && etag) {
+                this.rememberResponse(url, etag, responseData);
+            }
+            
             if (!response.ok) {
                 // Если токен недействителен, выходим
                 if (response.status === 401) {
@@ -174,6 +210,13 @@ class ApiClient {
         return this.request('POST', `/rooms/${roomId}/join`);
     }
     
+    /**
+     * Подтверждение присутствия в комнате
+     */
+    async heartbeat(roomId) {
+        return this.request('POST', `/rooms/${roomId}/heartbeat`);
+    }
+    
     /**
      * Выход из комнаты
      */
@@ -191,10 +234,18 @@ class ApiClient {
     // === Методы для работы с сообщениями ===
     
     /**
-     * Получение сообщений комнаты
+     * Получение сообщений комнаты.
+     * afterId - только сообщения новее указанного,
+     * beforeId - страница сообщений перед указанным,
+     * без курсоров - последние limit сообщений.
+     * wait (с afterId) - сервер ждет новых сообщений до wait секунд.
      */
-    async getMessages(roomId, skip = 0, limit = 50) {
-        return this.request('GET', `/rooms/${roomId}/messages?skip=${skip}&limit=${limit}`);
+    async getMessages(roomId, { afterId = null, beforeId = null, limit = 50, wait = 0 } = {}) {
+        const params = new URLSearchParams({ limit });
+        if (afterId !== null) params.set('after_id', afterId);
+        if (beforeId !== null) params.set('before_id', beforeId);
+        if (wait > 0 && afterId !== null) params.set('wait', wait);
+        return this.request('GET', `/rooms/${roomId}/messages?${params}`);
     }
     
     /**
@@ -203,6 +254,30 @@ class ApiClient {
     async sendMessage(roomId, content) {
         return this.request('POST', `/rooms/${roomId}/messages`, { content });
     }
+    
+    // === События в реальном времени ===
+    
+    /**
+     * URL WebSocket потока событий комнаты.
+     * Браузер не передает заголовки при открытии WebSocket,
+     * поэтому токен передается в query параметре.
+     */
+    getRoomEventsUrl(roomId) {
+        const url = new URL(`${this.baseUrl}/rooms/${roomId}/ws`, window.location.href);
+        url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:';
+        url.searchParams.set('token', this.getToken());
+        return url.toString();
+    }
+    
+    /**
+     * URL потока событий комнаты в формате Server-Sent Events
+     * (для сетей, где WebSocket недоступен)
+     */
+    getRoomEventStreamUrl(roomId) {
+        const url = new URL(`${this.baseUrl}/rooms/${roomId}/events`, window.location.href);
+        url.searchParams.set('token', this.getToken());
+        return url.toString();
+    }
 }
 
 // Глобальный экземпляр API клиента
@@ -32,8 +32,28 @@ document.addEventListener('DOMContentLoaded', () => {
     
     let currentUser = null;
     let roomData = null;
+    let messages = [];
+    let messagesLoaded = false;
     let updateInterval = null;
-    let messagesInterval = null;
+    
+    // Длинный опрос сообщений: сервер держит запрос до нового сообщения
+    let messagesPolling = false;
+    let messagesPollId = 0;
+    const MESSAGES_WAIT_SECONDS = 25;
+    const MESSAGES_RETRY_DELAY = 1500;
+    
+    // WebSocket событий комнаты; пока он открыт, опрос сервера не нужен
+    let heartbeatInterval = null;
+    let eventsSocket = null;
+    let reconnectTimeout = null;
+    let reconnectDelay = 1000;
+    let isLeaving = false;
+    const MAX_RECONNECT_DELAY = 30000;
+    
+    // Если WebSocket не удается открыть, переходим на Server-Sent Events
+    let eventSource = null;
+    let failedSocketAttempts = 0;
+    const MAX_FAILED_SOCKET_ATTEMPTS = 2;
     
     // Инициализация страницы
     init();
@@ -44,8 +64,10 @@ document.addEventListener('DOMContentLoaded', () => {
             currentUser = await api.getMe();
             userNameSpan.textContent = currentUser.display_name;
             
-            // Присоединяемся к комнате
-            await api.joinRoom(roomId);
+            // Присоединяемся к комнате и подтверждаем присутствие,
+            // иначе сервер удалит нас из комнаты по таймауту
+            const joinResult = await api.joinRoom(roomId);
+            startHeartbeat(joinResult.heartbeat_interval);
             
             // Загружаем данные комнаты
             await loadRoom();
@@ -53,9 +75,9 @@ document.addEventListener('DOMContentLoaded', () => {
             // Загружаем сообщения
             await loadMessages();
             
-            // Запускаем интервалы обновления
-            updateInterval = setInterval(loadRoom, 5000); // Обновление участников каждые 5 секунд
-            messagesInterval = setInterval(loadMessages, 1500); // Обновление чата каждые 1.5 секунды
+            // Пока WebSocket не подключен, обновляем данные опросом
+            startPolling();
+            connectEvents();
             
         } catch (error) {
             console.error('Ошибка инициализации:', error);
@@ -64,10 +86,180 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
     
+    // Периодическое подтверждение присутствия в комнате
+    function startHeartbeat(intervalSeconds = 15) {
+        if (!heartbeatInterval) {
+            heartbeatInterval = setInterval(async () => {
+                try {
+                    await api.heartbeat(roomId);
+                } catch (error) {
+                    console.error('Ошибка heartbeat:', error);
+                }
+            }, intervalSeconds * 1000);
+        }
+    }
+    
+    // Остановка подтверждения присутствия
+    function stopHeartbeat() {
+        if (heartbeatInterval) clearInterval(heartbeatInterval);
+        heartbeatInterval = null;
+    }
+    
+    // Запуск опроса сервера (резервный режим без WebSocket)
+    function startPolling() {
+        if (!updateInterval) {
+            updateInterval = setInterval(loadRoom, 5000); // Обновление участников каждые 5 секунд
+        }
+        if (!messagesPolling) {
+            messagesPolling = true;
+            pollMessages(++messagesPollId);
+        }
+    }
+    
+    // Цикл длинного опроса; после остановки опроса незавершенный
+    // запрос дожидается ответа, но новый не отправляется
+    async function pollMessages(pollId) {
+        while (messagesPolling && pollId === messagesPollId) {
+            const ok = await loadMessages(MESSAGES_WAIT_SECONDS);
+            if (!ok) {
+                await new Promise(resolve => setTimeout(resolve, MESSAGES_RETRY_DELAY));
+            }
+        }
+    }
+    
+    // Остановка опроса сервера
+    function stopPolling() {
+        if (updateInterval) clearInterval(updateInterval);
+        updateInterval = null;
+        messagesPolling = false;
+    }
+    
+    // Подключение к потоку событий комнаты
+    function connectEvents() {
+        if (!('WebSocket' in window)) {
+            connectEventStream();
+            return;
+        }
+        
+        let isOpened = false;
+        eventsSocket = new WebSocket(api.getRoomEventsUrl(roomId));
+        
+        eventsSocket.onopen = async () => {
+            isOpened = true;
+            failedSocketAttempts = 0;
+            reconnectDelay = 1000;
+            stopPolling();
+            
+            // Догружаем то, что могло прийти до подключения
+            await loadRoom();
+            await loadMessages();
+        };
+        
+        eventsSocket.onmessage = (event) => {
+            try {
+                handleRoomEvent(JSON.parse(event.data));
+            } catch (error) {
+                console.error('Ошибка обработки события:', error);
+            }
+        };
+        
+        eventsSocket.onclose = () => {
+            eventsSocket = null;
+            if (isLeaving) {
+                return;
+            }
+            
+            // WebSocket блокируется прокси - используем SSE
+            if (!isOpened && ++failedSocketAttempts >= MAX_FAILED_SOCKET_ATTEMPTS) {
+                connectEventStream();
+                return;
+            }
+            
+            // Возвращаемся к опросу и переподключаемся с нарастающей задержкой
+            startPolling();
+            reconnectTimeout = setTimeout(connectEvents, reconnectDelay);
+            reconnectDelay = Math.min(reconnectDelay * 2, MAX_RECONNECT_DELAY);
+        };
+    }
+    
+    // Подключение к потоку событий через Server-Sent Events.
+    // EventSource сам переподключается и передает Last-Event-ID,
+    // поэтому пропущенные события досылаются сервером
+    function connectEventStream() {
+        if (!('EventSource' in window)) {
+            return;
+        }
+        
+        let isLoaded = false;
+        eventSource = new EventSource(api.getRoomEventStreamUrl(roomId));
+        
+        eventSource.onopen = async () => {
+            stopPolling();
+            
+            if (!isLoaded) {
+                isLoaded = true;
+                await loadRoom();
+                await loadMessages();
+            }
+        };
+        
+        eventSource.onmessage = (event) => {
+            try {
+                handleRoomEvent(JSON.parse(event.data));
+            } catch (error) {
+                console.error('Ошибка обработки события:', error);
+            }
+        };
+        
+        eventSource.onerror = () => {
+            // Пока поток переподключается, данные обновляются опросом
+            startPolling();
+        };
+    }
+    
+    // Закрытие потока событий
+    function disconnectEvents() {
+        isLeaving = true;
+        stopHeartbeat();
+        if (reconnectTimeout) clearTimeout(reconnectTimeout);
+        if (eventsSocket) eventsSocket.close();
+        if (eventSource) eventSource.close();
+    }
+    
+    // Обработка события комнаты
+    function handleRoomEvent(event) {
+        switch (event.type) {
+            case 'message':
+                addMessages([event.data]);
+                break;
+            case 'participant_joined':
+            case 'participant_left':
+                loadRoom();
+                break;
+            case 'resync':
+                // Часть событий потеряна - перезагружаем данные целиком
+                loadRoom();
+                loadMessages();
+                break;
+            case 'room_closed':
+                alert('Комната закрыта владельцем');
+                disconnectEvents();
+                stopPolling();
+                window.location.href = '/rooms.html';
+                break;
+        }
+    }
+    
     // Загрузка данных комнаты
     async function loadRoom() {
         try {
-            roomData = await api.getRoom(roomId);
+            const data = await api.getRoom(roomId);
+            
+            // 304: комната не изменилась с прошлого опроса
+            if (data === roomData) {
+                return;
+            }
+            roomData = data;
             
             roomNameEl.textContent = roomData.name;
             document.title = `${roomData.name} - CloudMeet Lite`;
@@ -106,14 +298,42 @@ document.addEventListener('DOMContentLoaded', () => {
         `).join('');
     }
     
-    // Загрузка сообщений
-    async function loadMessages() {
+    // Загрузка сообщений: сначала последняя страница,
+    // затем только сообщения новее последнего полученного
+    // (с wait - ожидая их на сервере). Возвращает false при ошибке
+    async function loadMessages(wait = 0) {
         try {
-            const response = await api.getMessages(roomId);
-            renderMessages(response.messages);
+            if (!messagesLoaded) {
+                const response = await api.getMessages(roomId);
+                messages = response.messages;
+                messagesLoaded = true;
+                renderMessages(messages);
+                return true;
+            }
+            
+            const lastMessage = messages[messages.length - 1];
+            const afterId = lastMessage ? lastMessage.id : 0;
+            const response = await api.getMessages(roomId, { afterId, wait });
+            addMessages(response.messages);
+            return true;
         } catch (error) {
             console.error('Ошибка загрузки сообщений:', error);
+            return false;
+        }
+    }
+    
+    // Добавление новых сообщений (из событий, опроса или после отправки)
+    function addMessages(newMessages) {
+        const knownIds = new Set(messages.map(msg => msg.id));
+        const added = newMessages.filter(msg => !knownIds.has(msg.id));
+        
+        if (added.length === 0) {
+            return;
         }
+        
+        // События могут прийти не по порядку - сортируем по ID
+        messages = messages.concat(added).sort((a, b) => a.id - b.id);
+        renderMessages(messages);
     }
     
     // Отрисовка сообщений
@@ -152,12 +372,12 @@ document.addEventListener('DOMContentLoaded', () => {
         try {
             sendMessageBtn.disabled = true;
             
-            await api.sendMessage(roomId, content);
+            const message = await api.sendMessage(roomId, content);
             
             messageInput.value = '';
             
-            // Сразу обновляем сообщения
-            await loadMessages();
+            // Сразу показываем отправленное сообщение
+            addMessages([message]);
             
             // Прокручиваем вниз
             chatMessages.scrollTop = chatMessages.scrollHeight;
@@ -184,9 +404,9 @@ document.addEventListener('DOMContentLoaded', () => {
     // Выход из комнаты
     leaveRoomBtn.addEventListener('click', async () => {
         try {
-            // Останавливаем интервалы
-            if (updateInterval) clearInterval(updateInterval);
-            if (messagesInterval) clearInterval(messagesInterval);
+            // Останавливаем обновления
+            disconnectEvents();
+            stopPolling();
             
             await api.leaveRoom(roomId);
             window.location.href = '/rooms.html';
@@ -200,8 +420,8 @@ document.addEventListener('DOMContentLoaded', () => {
     // Выход из системы
     logoutBtn.addEventListener('click', async () => {
         try {
-            if (updateInterval) clearInterval(updateInterval);
-            if (messagesInterval) clearInterval(messagesInterval);
+            disconnectEvents();
+            stopPolling();
             
             await api.leaveRoom(roomId);
         } catch (error) {
@@ -213,8 +433,8 @@ document.addEventListener('DOMContentLoaded', () => {
     
     // Обработка закрытия страницы
     window.addEventListener('beforeunload', () => {
-        if (updateInterval) clearInterval(updateInterval);
-        if (messagesInterval) clearInterval(messagesInterval);
+        disconnectEvents();
+        stopPolling();
         
         // Пытаемся выйти из комнаты
         navigator.sendBeacon(`${api.baseUrl}/rooms/${roomId}/leave`, JSON.stringify({}));